@@ -1,13 +1,14 @@
 import os
+import time
+import click
 from flask import Flask
-from flask_sqlalchemy import SQLAlchemy
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
 from flask_migrate import Migrate
 from config import config
+from models import db
 
 # Initialize extensions
-db = SQLAlchemy()
 jwt = JWTManager()
 migrate = Migrate()
 
@@ -22,11 +23,15 @@ def create_app(config_name=None):
     # Initialize extensions
     db.init_app(app)
     jwt.init_app(app)
-    migrate.init_app(app, db)
+    migrate.init_app(app, db, render_as_batch=True)  # SQLite needs batch mode for ALTER
     
     # Configure CORS
     CORS(app, origins=app.config['CORS_ORIGINS'])
     
+    # Compress large and streamed responses (gzip, plus br/zstd when installed)
+    from services.compression import init_compression
+    init_compression(app)
+    
     # Register blueprints
     from routes.auth import auth_bp
     from routes.files import files_bp
@@ -43,6 +48,200 @@ def create_app(config_name=None):
     def health_check():
         return {'status': 'healthy', 'message': 'Blockchain File Security API is running'}
     
+    # Chain event indexer (run as its own process: flask index-chain --follow)
+    @app.cli.command('index-chain')
+    @click.option('--follow', is_flag=True, help='Keep polling for new blocks.')
+    def index_chain(follow):
+        """Index FileRegistry events into the database."""
+        from services.chain import get_chain
+        from services.indexer import get_indexer
+        
+        while True:
+            try:
+                result = get_indexer().run_once()
+                print(f"Indexed blocks up to {result['to_block']}: "
+                      f"{result['new_files']} new files, {result['updated_files']} updated, "
+                      f"{result['new_verifications']} verifications")
+            except Exception as e:
+                print(f"Indexer error: {e}")
+                get_chain().reset()
+                if not follow:
+                    raise
+            
+            if not follow:
+                break
+            time.sleep(app.config['INDEXER_POLL_INTERVAL'])
+    
+    # Statistics rollups reconciliation (run from cron or: flask reconcile-stats --follow)
+    @app.cli.command('reconcile-stats')
+    @click.option('--follow', is_flag=True, help='Keep reconciling on an interval.')
+    def reconcile_stats_command(follow):
+        """Recompute SystemStats rollups from the source tables."""
+        from services.stats import reconcile_stats
+        
+        while True:
+            try:
+                values = reconcile_stats()
+                print(f"Reconciled {len(values)} statistics counters")
+            except Exception as e:
+                print(f"Stats reconciliation error: {e}")
+                if not follow:
+                    raise
+            
+            if not follow:
+                break
+            time.sleep(app.config['STATS_RECONCILE_INTERVAL'])
+    
+    # Trend bucket compaction (run from cron or: flask compact-trends --follow)
+    @app.cli.command('compact-trends')
+    @click.option('--rebuild', is_flag=True, help='Recompute the last 90 days of buckets first.')
+    @click.option('--follow', is_flag=True, help='Keep compacting on an interval.')
+    def compact_trends_command(rebuild, follow):
+        """Prune expired and emptied trend buckets."""
+        from services.trends import rebuild_trends, compact_trends
+        
+        if rebuild:
+            hours, days = rebuild_trends()
+            print(f"Rebuilt {hours} hourly and {days} daily trend buckets")
+        
+        while True:
+            try:
+                removed = compact_trends(
+                    hourly_retention_days=app.config['TREND_HOURLY_RETENTION_DAYS'],
+                    daily_retention_days=app.config['TREND_DAILY_RETENTION_DAYS']
+                )
+                print(f"Removed {removed} trend buckets")
+            except Exception as e:
+                print(f"Trend compaction error: {e}")
+                if not follow:
+                    raise
+            
+            if not follow:
+                break
+            time.sleep(app.config['TREND_COMPACT_INTERVAL'])
+    
+    # File search index (run once on existing databases: flask build-search-index)
+    @app.cli.command('build-search-index')
+    def build_search_index_command():
+        """Create the file name search index and fill it from existing rows."""
+        from services.search import rebuild_search_index
+        
+        dialect = rebuild_search_index()
+        print(f"Search index ready ({dialect})")
+    
+    # Audit log search indexes (run once on existing databases: flask build-audit-search-index)
+    @app.cli.command('build-audit-search-index')
+    def build_audit_search_index_command():
+        """Store audit details as JSON and create their search indexes."""
+        from services.audit_search import rebuild_audit_search_index
+        
+        dialect = rebuild_audit_search_index()
+        print(f"Audit search index ready ({dialect})")
+    
+    # Native JSON columns (run once on existing PostgreSQL databases: flask convert-json-columns)
+    @app.cli.command('convert-json-columns')
+    def convert_json_columns_command():
+        """Convert metadata columns stored as JSON text to jsonb."""
+        from services.json_columns import convert_json_columns
+        
+        with db.engine.begin() as connection:
+            converted = convert_json_columns(connection)
+        print(f"Converted {', '.join(converted)}" if converted else "No columns to convert")
+    
+    # Verify-by-hash filter (rebuild after bulk imports or when over capacity)
+    @app.cli.command('build-verify-filter')
+    def build_verify_filter_command():
+        """Rebuild the shared file hash Bloom filter from the database."""
+        from services.verify_cache import get_verify_cache
+        
+        items = get_verify_cache().rebuild()
+        print(f"Hash filter rebuilt with {items} file hashes")
+    
+    @app.cli.command('replay-audit-spool')
+    def replay_audit_spool_command():
+        """Write audit entries spooled by workers that exited before flushing."""
+        from services.audit import get_audit_writer
+        
+        if get_audit_writer().close():
+            print("Audit spool replayed")
+        else:
+            print("Audit spool replay failed, entries kept on disk")
+    
+    # Audit log partitions and retention (run as its own process: flask maintain-audit-logs --follow)
+    @app.cli.command('maintain-audit-logs')
+    @click.option('--convert', is_flag=True, help='First move an unpartitioned audit_logs table into partitions.')
+    @click.option('--follow', is_flag=True, help='Keep maintaining on an interval.')
+    def maintain_audit_logs_command(convert, follow):
+        """Create upcoming audit log partitions and archive months past retention."""
+        from services.audit_partitions import maintain_audit_logs, partition_existing_audit_logs
+        
+        if convert:
+            moved = partition_existing_audit_logs()
+            print("audit_logs is already partitioned" if moved is None else f"Partitioned {moved} audit logs")
+        
+        while True:
+            try:
+                archived = maintain_audit_logs(
+                    retention_months=app.config['AUDIT_LOG_RETENTION_MONTHS'],
+                    premake_months=app.config['AUDIT_PARTITION_PREMAKE_MONTHS'],
+                    archive_dir=app.config['AUDIT_ARCHIVE_DIR']
+                )
+                for month, rows in archived.items():
+                    print(f"Archived {rows} audit logs from {month:%Y-%m}")
+            except Exception as e:
+                print(f"Audit maintenance error: {e}")
+                if not follow:
+                    raise
+            
+            if not follow:
+                break
+            time.sleep(app.config['AUDIT_MAINTENANCE_INTERVAL'])
+    
+    @app.cli.command('query-audit-archive')
+    @click.option('--from', 'date_from', help='ISO date or datetime (inclusive).')
+    @click.option('--to', 'date_to', help='ISO date or datetime (inclusive).')
+    @click.option('--action')
+    @click.option('--resource-type')
+    @click.option('--user-id', type=int)
+    def query_audit_archive_command(date_from, date_to, action, resource_type, user_id):
+        """Print archived audit logs as JSON lines."""
+        import json
+        from datetime import datetime
+        from services.audit_partitions import iter_archived_audit_logs
+        
+        logs = iter_archived_audit_logs(
+            app.config['AUDIT_ARCHIVE_DIR'],
+            date_from=datetime.fromisoformat(date_from) if date_from else None,
+            date_to=datetime.fromisoformat(date_to) if date_to else None,
+            action=action,
+            resource_type=resource_type,
+            user_id=user_id
+        )
+        for log in logs:
+            print(json.dumps(log))
+    
+    # Data export runner (run as its own process when EXPORT_IN_PROCESS=false: flask run-exports --follow)
+    @app.cli.command('run-exports')
+    @click.option('--follow', is_flag=True, help='Keep polling for new export jobs.')
+    def run_exports_command(follow):
+        """Run pending (or abandoned) export jobs and purge expired artifacts."""
+        from services.exports import run_pending_exports, purge_expired_exports
+        
+        while True:
+            try:
+                ran = run_pending_exports()
+                purged = purge_expired_exports(app.config['EXPORT_RETENTION_HOURS'])
+                if ran or purged:
+                    print(f"Ran {ran} exports, purged {purged} expired")
+            except Exception as e:
+                print(f"Export runner error: {e}")
+                if not follow:
+                    raise
+            
+            if not follow:
+                break
+            time.sleep(app.config['EXPORT_POLL_INTERVAL'])
+    
     # Error handlers
     @app.errorhandler(404)
     def not_found(error):
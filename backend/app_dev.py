@@ -1,7 +1,9 @@
 # Simple Flask app for development without Docker dependencies
 import os
+import time
 import hashlib
 import json
+import tempfile
 from datetime import datetime, timedelta
 from flask import Flask, request, jsonify, send_from_directory
 from flask_cors import CORS
@@ -24,6 +26,14 @@ CORS(app,
 UPLOAD_DIR = Path('uploads')
 UPLOAD_DIR.mkdir(exist_ok=True)
 
+# Uploads are stored once per content: uploads/blobs/<h[:2]>/<h[2:4]>/<sha256>
+BLOB_DIR = UPLOAD_DIR / 'blobs'
+BLOB_TMP_DIR = UPLOAD_DIR / 'tmp'
+BLOB_CHUNK_SIZE = 64 * 1024
+BLOB_GC_GRACE_SECONDS = 3600  # unreferenced blobs younger than this may belong to an upload in flight
+BLOB_DIR.mkdir(exist_ok=True)
+BLOB_TMP_DIR.mkdir(exist_ok=True)
+
 # Simple SQLite database for development
 DB_PATH = 'development.db'
 
@@ -121,13 +131,67 @@ def verify_jwt_token(token):
         print(f"Invalid token error: {e}")
         return None
 
-def calculate_file_hash(file_path):
-    """Calculate SHA-256 hash of file"""
+def blob_path(file_hash):
+    """Get the sharded path of the blob holding content with this SHA-256"""
+    return BLOB_DIR / file_hash[:2] / file_hash[2:4] / file_hash
+
+def store_blob(stream):
+    """Write an upload stream to the blob store, hashing it on the way in.
+
+    The bytes go to a temp file that is renamed into place only once
+    complete, so a blob is never seen half-written. Content that is
+    already stored is not written twice. Returns (file_hash, file_size).
+    """
     sha256_hash = hashlib.sha256()
-    with open(file_path, 'rb') as f:
-        for chunk in iter(lambda: f.read(4096), b""):
-            sha256_hash.update(chunk)
-    return sha256_hash.hexdigest()
+    file_size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=BLOB_TMP_DIR)
+    try:
+        with os.fdopen(fd, 'wb') as tmp:
+            for chunk in iter(lambda: stream.read(BLOB_CHUNK_SIZE), b""):
+                sha256_hash.update(chunk)
+                file_size += len(chunk)
+                tmp.write(chunk)
+            tmp.flush()
+            os.fsync(tmp.fileno())
+        
+        file_hash = sha256_hash.hexdigest()
+        path = blob_path(file_hash)
+        if path.exists():
+            # Deduplicated; refresh its age so garbage collection leaves it alone
+            os.utime(path)
+            os.remove(tmp_path)
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(tmp_path, path)
+        return file_hash, file_size
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def collect_blob_garbage(grace_seconds=BLOB_GC_GRACE_SECONDS):
+    """Delete blobs no file record references and abandoned temp files; returns how many were removed"""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute('SELECT DISTINCT file_hash FROM files')
+    referenced = {row[0] for row in cursor.fetchall()}
+    conn.close()
+    
+    cutoff = time.time() - grace_seconds
+    removed = 0
+    for path in list(BLOB_DIR.glob('*/*/*')) + list(BLOB_TMP_DIR.iterdir()):
+        try:
+            if (path.parent == BLOB_TMP_DIR or path.name not in referenced) and path.stat().st_mtime < cutoff:
+                path.unlink()
+                removed += 1
+        except FileNotFoundError:
+            continue
+    return removed
+
+@app.cli.command('gc-blobs')
+def gc_blobs_command():
+    """Remove unreferenced upload blobs"""
+    print(f"Removed {collect_blob_garbage()} unreferenced blobs")
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
@@ -400,14 +464,9 @@ def upload_file():
         if file.filename == '':
             return jsonify({'error': 'No file selected'}), 400
         
-        # Save file temporarily
+        # Store by content (hashed while it is written, no second read)
         filename = file.filename
-        file_path = UPLOAD_DIR / filename
-        file.save(file_path)
-        
-        # Calculate file hash
-        file_hash = calculate_file_hash(file_path)
-        file_size = file_path.stat().st_size
+        file_hash, file_size = store_blob(file.stream)
         
         # Mock IPFS hash (for development)
         ipfs_hash = f"Qm{file_hash[:40]}"
@@ -838,6 +897,7 @@ if __name__ == '__main__':
     # Initialize database
     init_db()
     create_test_user()
+    collect_blob_garbage()
     
     print("🔧 Starting Blockchain File Security System - Development Mode")
     print("📱 Frontend: Start with 'cd frontend && npm start'")
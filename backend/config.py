@@ -16,20 +16,101 @@ class Config:
     # IPFS Configuration
     IPFS_API_HOST = os.environ.get('IPFS_API_HOST') or 'localhost'
     IPFS_API_PORT = int(os.environ.get('IPFS_API_PORT') or 5001)
+    IPFS_POOL_SIZE = int(os.environ.get('IPFS_POOL_SIZE') or 4)  # idle keep-alive clients per worker
+    IPFS_HEALTH_CHECK_INTERVAL = int(os.environ.get('IPFS_HEALTH_CHECK_INTERVAL') or 30)  # seconds
+    IPFS_RECONNECT_MAX_BACKOFF = int(os.environ.get('IPFS_RECONNECT_MAX_BACKOFF') or 30)  # seconds
     
     # Blockchain Configuration
     WEB3_PROVIDER_URI = os.environ.get('WEB3_PROVIDER_URI') or 'http://localhost:8545'
     CONTRACT_ADDRESS = os.environ.get('CONTRACT_ADDRESS') or '0x742d35Cc6634C0532925a3b8D404d77443Ebe1d5'
+    WEB3_REQUEST_TIMEOUT = int(os.environ.get('WEB3_REQUEST_TIMEOUT') or 10)  # seconds
+    WEB3_POOL_SIZE = int(os.environ.get('WEB3_POOL_SIZE') or 10)  # keep-alive RPC connections per worker
+    CHAIN_HEAD_CACHE_TTL = float(os.environ.get('CHAIN_HEAD_CACHE_TTL') or 12)  # ~one block time, seconds
+    
+    # Chain event indexer
+    INDEXER_START_BLOCK = int(os.environ.get('INDEXER_START_BLOCK') or 0)  # contract deployment block
+    INDEXER_BATCH_SIZE = int(os.environ.get('INDEXER_BATCH_SIZE') or 2000)  # blocks per eth_getLogs page
+    INDEXER_CONFIRMATIONS = int(os.environ.get('INDEXER_CONFIRMATIONS') or 6)  # blocks behind head / reorg rewind depth
+    INDEXER_POLL_INTERVAL = int(os.environ.get('INDEXER_POLL_INTERVAL') or 15)  # seconds between passes
+    
+    # Cache (shared across workers when Redis is reachable)
+    REDIS_URL = os.environ.get('REDIS_URL')
+    
+    # Verify-by-hash cache (per-worker LRU over a Bloom filter file shared by all workers)
+    # Must be the same file for every process that writes FileRecords (workers and flask index-chain)
+    VERIFY_FILTER_PATH = os.environ.get('VERIFY_FILTER_PATH') or '/tmp/file-hash-filter.bin'
+    VERIFY_FILTER_CAPACITY = int(os.environ.get('VERIFY_FILTER_CAPACITY') or 1000000)  # planned file count
+    VERIFY_FILTER_ERROR_RATE = float(os.environ.get('VERIFY_FILTER_ERROR_RATE') or 0.01)
+    # Answer unknown hashes from the filter alone; only for a single host whose every writer shares the filter
+    VERIFY_FILTER_TRUST_MISSES = os.environ.get('VERIFY_FILTER_TRUST_MISSES', 'false').lower() == 'true'
+    VERIFY_CACHE_SIZE = int(os.environ.get('VERIFY_CACHE_SIZE') or 10000)  # LRU entries per worker
+    VERIFY_BATCH_MAX_HASHES = int(os.environ.get('VERIFY_BATCH_MAX_HASHES') or 10000)  # per /verify-batch request
+    VERIFY_BATCH_CHUNK_SIZE = int(os.environ.get('VERIFY_BATCH_CHUNK_SIZE') or 500)  # hashes looked up per query
+    
+    # Verification log write-behind (at most the queued rows are lost if a worker is killed)
+    VERIFICATION_LOG_WRITE_BEHIND = os.environ.get('VERIFICATION_LOG_WRITE_BEHIND', 'true').lower() == 'true'
+    VERIFICATION_LOG_BATCH_SIZE = int(os.environ.get('VERIFICATION_LOG_BATCH_SIZE') or 500)
+    VERIFICATION_LOG_FLUSH_INTERVAL = float(os.environ.get('VERIFICATION_LOG_FLUSH_INTERVAL') or 1.0)  # seconds
+    VERIFICATION_LOG_QUEUE_SIZE = int(os.environ.get('VERIFICATION_LOG_QUEUE_SIZE') or 10000)
+    
+    # Audit log writer (entries are spooled to a local file until they reach the database)
+    AUDIT_LOG_WRITE_BEHIND = os.environ.get('AUDIT_LOG_WRITE_BEHIND', 'true').lower() == 'true'
+    AUDIT_LOG_BATCH_SIZE = int(os.environ.get('AUDIT_LOG_BATCH_SIZE') or 1000)
+    AUDIT_LOG_FLUSH_INTERVAL = float(os.environ.get('AUDIT_LOG_FLUSH_INTERVAL') or 1.0)  # seconds
+    AUDIT_LOG_QUEUE_SIZE = int(os.environ.get('AUDIT_LOG_QUEUE_SIZE') or 10000)
+    AUDIT_LOG_SPOOL_DIR = os.environ.get('AUDIT_LOG_SPOOL_DIR', '/tmp/audit-spool')  # empty disables spooling
+    AUDIT_LOG_SPOOL_FSYNC = os.environ.get('AUDIT_LOG_SPOOL_FSYNC', 'false').lower() == 'true'  # survive power loss
+    
+    # Audit log retention (monthly partitions on PostgreSQL; older months move to gzip CSV archives)
+    AUDIT_LOG_RETENTION_MONTHS = int(os.environ.get('AUDIT_LOG_RETENTION_MONTHS') or 12)
+    AUDIT_PARTITION_PREMAKE_MONTHS = int(os.environ.get('AUDIT_PARTITION_PREMAKE_MONTHS') or 3)
+    AUDIT_ARCHIVE_DIR = os.environ.get('AUDIT_ARCHIVE_DIR') or 'audit-archive'
+    AUDIT_MAINTENANCE_INTERVAL = int(os.environ.get('AUDIT_MAINTENANCE_INTERVAL') or 86400)  # seconds
+    
+    # Data exports (zip archives of CSV/NDJSON/Parquet written by a background job)
+    EXPORT_DIR = os.path.abspath(os.environ.get('EXPORT_DIR') or '/tmp/exports')  # shared by every replica serving downloads
+    EXPORT_IN_PROCESS = os.environ.get('EXPORT_IN_PROCESS', 'true').lower() == 'true'  # else: flask run-exports
+    EXPORT_MAX_CONCURRENT = int(os.environ.get('EXPORT_MAX_CONCURRENT') or 2)  # per worker
+    EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE') or 5000)  # rows in memory per export
+    EXPORT_STALE_AFTER = int(os.environ.get('EXPORT_STALE_AFTER') or 300)  # seconds without progress
+    EXPORT_RETENTION_HOURS = int(os.environ.get('EXPORT_RETENTION_HOURS') or 24)
+    EXPORT_POLL_INTERVAL = int(os.environ.get('EXPORT_POLL_INTERVAL') or 5)  # seconds
+    INVENTORY_STREAM_BATCH_SIZE = int(os.environ.get('INVENTORY_STREAM_BATCH_SIZE') or 1000)  # rows per cursor fetch
     
     # File Upload Configuration
     MAX_CONTENT_LENGTH = 100 * 1024 * 1024  # 100MB max file size
     UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER') or 'uploads'
+    UPLOAD_CHUNK_SIZE = int(os.environ.get('UPLOAD_CHUNK_SIZE') or 64 * 1024)  # 64KB streaming chunks
+    
+    # Response compression (br/zstd only when brotli/zstandard are installed)
+    COMPRESS_ENABLED = os.environ.get('COMPRESS_ENABLED', 'true').lower() == 'true'
+    COMPRESS_ALGORITHMS = (os.environ.get('COMPRESS_ALGORITHMS') or 'zstd,br,gzip').split(',')  # preference order
+    COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE') or 1024)  # bytes; smaller bodies go out as is
+    # Never compressed: responses mixing secrets (tokens) with request input are open to BREACH
+    COMPRESS_EXCLUDED_PATHS = (os.environ.get('COMPRESS_EXCLUDED_PATHS') or '/api/auth').split(',')
+    COMPRESS_GZIP_LEVEL = int(os.environ.get('COMPRESS_GZIP_LEVEL') or 6)
+    COMPRESS_BROTLI_QUALITY = int(os.environ.get('COMPRESS_BROTLI_QUALITY') or 5)
+    COMPRESS_ZSTD_LEVEL = int(os.environ.get('COMPRESS_ZSTD_LEVEL') or 3)
+    COMPRESS_STREAM_FLUSH_SIZE = int(os.environ.get('COMPRESS_STREAM_FLUSH_SIZE') or 16 * 1024)  # streamed input per flush
+    COMPRESS_CACHE_ENTRIES = int(os.environ.get('COMPRESS_CACHE_ENTRIES') or 256)  # compressed bodies per worker
+    COMPRESS_CACHE_MAX_SIZE = int(os.environ.get('COMPRESS_CACHE_MAX_SIZE') or 1024 * 1024)  # largest body cached
+    COMPRESS_CACHE_TTL = int(os.environ.get('COMPRESS_CACHE_TTL') or 300)  # seconds
     
     # Security
     CORS_ORIGINS = os.environ.get('CORS_ORIGINS', '*').split(',')
     
+    # Statistics rollups
+    STATS_RECONCILE_INTERVAL = int(os.environ.get('STATS_RECONCILE_INTERVAL') or 3600)  # seconds
+    STATS_COUNTER_SHARDS = int(os.environ.get('STATS_COUNTER_SHARDS') or 8)  # rows per counter; reconcile after lowering
+    TREND_COMPACT_INTERVAL = int(os.environ.get('TREND_COMPACT_INTERVAL') or 3600)  # seconds
+    TREND_HOURLY_RETENTION_DAYS = int(os.environ.get('TREND_HOURLY_RETENTION_DAYS') or 90)  # heatmap needs 90
+    TREND_DAILY_RETENTION_DAYS = int(os.environ.get('TREND_DAILY_RETENTION_DAYS') or 400)
+    
     # Pagination
     ITEMS_PER_PAGE = int(os.environ.get('ITEMS_PER_PAGE') or 20)
+    MAX_PER_PAGE = int(os.environ.get('MAX_PER_PAGE') or 100)
+    PAGINATION_COUNT_CACHE_TTL = int(os.environ.get('PAGINATION_COUNT_CACHE_TTL') or 60)  # seconds
+    MAX_RANKED_RESULTS = int(os.environ.get('MAX_RANKED_RESULTS') or 1000)  # deepest relevance-ordered search row
 
 class DevelopmentConfig(Config):
     """Development configuration."""
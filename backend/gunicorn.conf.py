@@ -0,0 +1,16 @@
+import os
+
+bind = os.environ.get('GUNICORN_BIND') or '0.0.0.0:5000'
+workers = int(os.environ.get('GUNICORN_WORKERS') or 4)
+# Threads keep streamed responses (inventory, batch verification, exports) from tying up a whole worker
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS') or 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS') or 4)
+# Leaves the write-behind queues time to drain on restart
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT') or 30)
+
+def worker_exit(server, worker):
+    """Write out queued verification and audit log rows before the worker goes away."""
+    from services.write_behind import close_write_behind_queues
+
+    if not close_write_behind_queues():
+        server.log.warning("Worker %s exited with write-behind rows it could not persist", worker.pid)
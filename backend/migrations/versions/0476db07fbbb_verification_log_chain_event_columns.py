@@ -0,0 +1,34 @@
+"""verification log chain event columns
+
+FileVerified events indexed by flask index-chain are stored once per (transaction, log index).
+
+Revision ID: 0476db07fbbb
+Revises: 672f04ea7e7c
+Create Date: 2026-10-17 08:15:52.981529
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0476db07fbbb'
+down_revision = '672f04ea7e7c'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('verification_logs') as batch_op:
+        batch_op.add_column(sa.Column('transaction_hash', sa.String(length=66), nullable=True))
+        batch_op.add_column(sa.Column('block_number', sa.BigInteger(), nullable=True))
+        batch_op.add_column(sa.Column('log_index', sa.Integer(), nullable=True))
+        batch_op.create_index('idx_verification_tx_log', ['transaction_hash', 'log_index'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('verification_logs') as batch_op:
+        batch_op.drop_index('idx_verification_tx_log')
+        batch_op.drop_column('log_index')
+        batch_op.drop_column('block_number')
+        batch_op.drop_column('transaction_hash')
@@ -0,0 +1,30 @@
+"""keyset pagination indexes
+
+(sort column, id) indexes for the cursor-paginated user, file and audit log lists.
+
+Revision ID: 0f6e9c799250
+Revises: 306c212bb78a
+Create Date: 2026-10-17 08:18:04.467662
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0f6e9c799250'
+down_revision = '306c212bb78a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('idx_users_created_id', 'users', ['created_at', 'id'])
+    op.create_index('idx_user_created_id', 'file_records', ['user_id', 'created_at', 'id'])
+    op.create_index('idx_timestamp_id', 'audit_logs', ['timestamp', 'id'])
+
+
+def downgrade():
+    op.drop_index('idx_timestamp_id', table_name='audit_logs')
+    op.drop_index('idx_user_created_id', table_name='file_records')
+    op.drop_index('idx_users_created_id', table_name='users')
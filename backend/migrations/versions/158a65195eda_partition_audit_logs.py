@@ -0,0 +1,124 @@
+"""partition audit logs
+
+audit_logs gets a NOT NULL timestamp and a (id, timestamp) primary key. On
+PostgreSQL the table is rebuilt as monthly range partitions covering the
+existing rows and the next months; flask maintain-audit-logs creates later
+partitions and archives expired ones.
+
+Revision ID: 158a65195eda
+Revises: b7430fc0fe23
+Create Date: 2026-10-17 08:19:40.696821
+
+"""
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '158a65195eda'
+down_revision = 'b7430fc0fe23'
+branch_labels = None
+depends_on = None
+
+LEGACY = 'audit_logs_unpartitioned'
+INDEXES = {
+    'idx_action_timestamp': 'action, timestamp',
+    'idx_timestamp_id': 'timestamp, id',
+    'idx_user_timestamp': 'user_id, timestamp',
+    'idx_resource_timestamp': 'resource_type, resource_id, timestamp'
+}
+COLUMNS = 'id, action, resource_type, resource_id, user_id, ip_address, user_agent, details, timestamp'
+# Months created past the current one (AUDIT_PARTITION_PREMAKE_MONTHS default)
+PREMAKE_MONTHS = 3
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def create_table(partitioned):
+    op.execute(
+        "CREATE TABLE audit_logs ("
+        "id INTEGER NOT NULL DEFAULT nextval('audit_logs_id_seq'), "
+        "action VARCHAR(50) NOT NULL, "
+        "resource_type VARCHAR(50) NOT NULL, "
+        "resource_id VARCHAR(100), "
+        "user_id INTEGER REFERENCES users (id), "
+        "ip_address VARCHAR(45), "
+        "user_agent VARCHAR(255), "
+        "details TEXT, "
+        "timestamp TIMESTAMP WITHOUT TIME ZONE NOT NULL, "
+        + ("PRIMARY KEY (id, timestamp)) PARTITION BY RANGE (timestamp)" if partitioned else "PRIMARY KEY (id))")
+    )
+    op.execute("ALTER SEQUENCE audit_logs_id_seq OWNED BY audit_logs.id")
+    for name, columns in INDEXES.items():
+        op.execute(f"CREATE INDEX {name} ON audit_logs ({columns})")
+
+
+def rename_legacy():
+    op.execute(f"ALTER TABLE audit_logs RENAME TO {LEGACY}")
+    op.execute(f"ALTER TABLE {LEGACY} RENAME CONSTRAINT audit_logs_pkey TO {LEGACY}_pkey")
+    op.execute(f"ALTER SEQUENCE audit_logs_id_seq RENAME TO {LEGACY}_id_seq")
+    for name in INDEXES:
+        op.execute(f"ALTER INDEX IF EXISTS {name} RENAME TO {LEGACY}_{name}")
+    op.execute("CREATE SEQUENCE audit_logs_id_seq")
+
+
+def copy_legacy():
+    op.execute(f"INSERT INTO audit_logs ({COLUMNS}) SELECT {COLUMNS} FROM {LEGACY}")
+    op.execute(f"SELECT setval('audit_logs_id_seq', (SELECT coalesce(max(id), 0) + 1 FROM {LEGACY}), false)")
+    op.execute(f"DROP TABLE {LEGACY}")
+
+
+def upgrade():
+    connection = op.get_bind()
+    if connection.dialect.name != 'postgresql':
+        op.execute("UPDATE audit_logs SET timestamp = CURRENT_TIMESTAMP WHERE timestamp IS NULL")
+        with op.batch_alter_table('audit_logs', recreate='always', reflect_args=[
+            sa.Column('timestamp', sa.DateTime(), primary_key=True, nullable=False)
+        ]) as batch_op:
+            batch_op.alter_column('timestamp', existing_type=sa.DateTime(), nullable=False)
+        return
+
+    op.execute("UPDATE audit_logs SET timestamp = now() AT TIME ZONE 'utc' WHERE timestamp IS NULL")
+    rename_legacy()
+    create_table(partitioned=True)
+
+    current = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    first = connection.execute(sa.text(f"SELECT min(timestamp) FROM {LEGACY}")).scalar() or current
+    month = first.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    while month <= add_months(current, PREMAKE_MONTHS):
+        op.execute(
+            f"CREATE TABLE audit_logs_p{month:%Y%m} PARTITION OF audit_logs "
+            f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{add_months(month, 1):%Y-%m-%d}')"
+        )
+        month = add_months(month, 1)
+
+    copy_legacy()
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        previous = sa.Table(
+            'audit_logs', sa.MetaData(),
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('action', sa.String(length=50), nullable=False),
+            sa.Column('resource_type', sa.String(length=50), nullable=False),
+            sa.Column('resource_id', sa.String(length=100)),
+            sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id')),
+            sa.Column('ip_address', sa.String(length=45)),
+            sa.Column('user_agent', sa.String(length=255)),
+            sa.Column('details', sa.Text()),
+            sa.Column('timestamp', sa.DateTime()),
+            *(sa.Index(name, *columns.split(', ')) for name, columns in INDEXES.items())
+        )
+        with op.batch_alter_table('audit_logs', recreate='always', copy_from=previous):
+            pass
+        return
+
+    # Partitions archived by flask maintain-audit-logs are not restored
+    rename_legacy()
+    create_table(partitioned=False)
+    copy_legacy()
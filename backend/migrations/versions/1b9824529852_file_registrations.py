@@ -0,0 +1,46 @@
+"""file registrations
+
+One row per on-chain FileUploaded event, filled by flask index-chain. Registrations
+of blocks indexed before this revision need one re-index: delete the
+indexer_last_block system_stats row.
+
+Revision ID: 1b9824529852
+Revises: 0476db07fbbb
+Create Date: 2026-10-17 08:16:59.271770
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1b9824529852'
+down_revision = '0476db07fbbb'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'file_registrations',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('file_hash', sa.String(length=64), nullable=False),
+        sa.Column('file_name', sa.String(length=255), nullable=False),
+        sa.Column('uploader_address', sa.String(length=42), nullable=False),
+        sa.Column('block_timestamp', sa.DateTime(), nullable=False),
+        sa.Column('block_number', sa.BigInteger(), nullable=False),
+        sa.Column('transaction_hash', sa.String(length=66), nullable=False),
+        sa.Column('log_index', sa.Integer(), nullable=False),
+        sa.Column('file_record_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['file_record_id'], ['file_records.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('file_hash')
+    )
+    op.create_index('idx_registration_time', 'file_registrations', ['block_timestamp', 'id'])
+    op.create_index('idx_registration_uploader_time', 'file_registrations',
+                    ['uploader_address', 'block_timestamp', 'id'])
+    op.create_index('idx_registration_block', 'file_registrations', ['block_number'])
+
+
+def downgrade():
+    op.drop_table('file_registrations')
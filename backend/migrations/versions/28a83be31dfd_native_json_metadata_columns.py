@@ -0,0 +1,77 @@
+"""native json metadata columns
+
+file_records.file_metadata, verification_logs.blockchain_data and
+system_stats.stat_data become native JSON columns (jsonb on PostgreSQL);
+empty strings left by the old text columns become NULL.
+
+Revision ID: 28a83be31dfd
+Revises: 35716a3ae5b1
+Create Date: 2026-10-17 08:21:02.980152
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '28a83be31dfd'
+down_revision = '35716a3ae5b1'
+branch_labels = None
+depends_on = None
+
+JSON_COLUMNS = [
+    ('file_records', 'file_metadata'),
+    ('verification_logs', 'blockchain_data'),
+    ('system_stats', 'stat_data')
+]
+
+# SQLite drops a table's triggers when batch mode recreates it; these keep the
+# file name search table (revision b7430fc0fe23) in sync with file_records
+FILE_SEARCH_TRIGGERS = [
+    "CREATE TRIGGER IF NOT EXISTS file_records_fts_insert AFTER INSERT ON file_records BEGIN "
+    "INSERT INTO file_records_fts(rowid, file_name) VALUES (new.id, new.file_name); END",
+    "CREATE TRIGGER IF NOT EXISTS file_records_fts_delete AFTER DELETE ON file_records BEGIN "
+    "INSERT INTO file_records_fts(file_records_fts, rowid, file_name) "
+    "VALUES ('delete', old.id, old.file_name); END",
+    "CREATE TRIGGER IF NOT EXISTS file_records_fts_update AFTER UPDATE OF file_name ON file_records BEGIN "
+    "INSERT INTO file_records_fts(file_records_fts, rowid, file_name) "
+    "VALUES ('delete', old.id, old.file_name); "
+    "INSERT INTO file_records_fts(rowid, file_name) VALUES (new.id, new.file_name); END"
+]
+
+
+def alter_sqlite_column(table, column, type_, existing_type):
+    with op.batch_alter_table(table) as batch_op:
+        batch_op.alter_column(column, type_=type_, existing_type=existing_type, existing_nullable=True)
+
+    if table == 'file_records' and sa.inspect(op.get_bind()).has_table('file_records_fts'):
+        for statement in FILE_SEARCH_TRIGGERS:
+            op.execute(statement)
+
+
+def upgrade():
+    postgres = op.get_bind().dialect.name == 'postgresql'
+    for table, column in JSON_COLUMNS:
+        if postgres:
+            op.alter_column(
+                table, column, type_=postgresql.JSONB(), existing_nullable=True,
+                postgresql_using=f"nullif({column}::text, '')::jsonb"
+            )
+            continue
+
+        op.execute(f"UPDATE {table} SET {column} = NULL WHERE {column} = ''")
+        alter_sqlite_column(table, column, sa.JSON(), sa.Text())
+
+
+def downgrade():
+    postgres = op.get_bind().dialect.name == 'postgresql'
+    for table, column in JSON_COLUMNS:
+        if postgres:
+            op.alter_column(
+                table, column, type_=sa.Text(), existing_nullable=True,
+                postgresql_using=f"{column}::text"
+            )
+            continue
+
+        alter_sqlite_column(table, column, sa.Text(), sa.JSON())
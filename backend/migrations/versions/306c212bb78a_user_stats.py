@@ -0,0 +1,37 @@
+"""user stats
+
+Per-user counters behind /files/stats and /analytics/user-stats; a user's row
+is computed from the source tables on first read.
+
+Revision ID: 306c212bb78a
+Revises: 59c880dd1ccf
+
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '306c212bb78a'
+down_revision = '59c880dd1ccf'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'user_stats',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('total_files', sa.Integer(), nullable=False),
+        sa.Column('total_size', sa.BigInteger(), nullable=False),
+        sa.Column('total_verifications', sa.Integer(), nullable=False),
+        sa.Column('successful_verifications', sa.Integer(), nullable=False),
+        sa.Column('last_updated', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id')
+    )
+
+
+def downgrade():
+    op.drop_table('user_stats')
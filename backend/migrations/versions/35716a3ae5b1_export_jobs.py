@@ -0,0 +1,48 @@
+"""export jobs
+
+Background data exports requested through /analytics/export.
+
+Revision ID: 35716a3ae5b1
+Revises: d43dad0ad60e
+Create Date: 2026-10-17 08:20:50.093032
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '35716a3ae5b1'
+down_revision = 'd43dad0ad60e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'export_jobs',
+        sa.Column('id', sa.String(length=36), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('export_format', sa.String(length=20), nullable=False),
+        sa.Column('date_range', sa.String(length=10), nullable=False),
+        sa.Column('datasets', sa.String(length=100), nullable=False),
+        sa.Column('all_users', sa.Boolean(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('rows_written', sa.BigInteger(), nullable=False),
+        sa.Column('total_rows', sa.BigInteger(), nullable=True),
+        sa.Column('file_path', sa.String(length=500), nullable=True),
+        sa.Column('file_size', sa.BigInteger(), nullable=True),
+        sa.Column('error_message', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('heartbeat_at', sa.DateTime(), nullable=True),
+        sa.Column('completed_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_export_jobs_user_id', 'export_jobs', ['user_id'])
+    op.create_index('idx_export_status_created', 'export_jobs', ['status', 'created_at'])
+
+
+def downgrade():
+    op.drop_table('export_jobs')
@@ -0,0 +1,74 @@
+"""seed statistics counters
+
+The overview reads system_stats counters that writes keep up to date; requests
+no longer recompute them when they are missing, so fill them here from the
+source tables (flask reconcile-stats does the same and also covers the user rows).
+
+Revision ID: 532e8e15dcdf
+Revises: 1b9824529852
+Create Date: 2026-10-17 08:17:17.924873
+
+"""
+from collections import Counter
+from datetime import datetime, timedelta
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '532e8e15dcdf'
+down_revision = '1b9824529852'
+branch_labels = None
+depends_on = None
+
+# Two 30 day growth windows of daily upload counters (services/stats.py)
+DAILY_COUNTER_DAYS = 60
+
+users = sa.table('users', sa.column('is_active', sa.Boolean))
+file_records = sa.table('file_records', sa.column('file_size', sa.BigInteger), sa.column('created_at', sa.DateTime))
+verification_logs = sa.table('verification_logs', sa.column('verification_result', sa.Boolean))
+system_stats = sa.table(
+    'system_stats',
+    sa.column('stat_name', sa.String),
+    sa.column('stat_value', sa.BigInteger),
+    sa.column('last_updated', sa.DateTime)
+)
+
+
+def upgrade():
+    connection = op.get_bind()
+    now = datetime.utcnow()
+    count = sa.func.count()
+
+    values = {
+        'total_files': connection.execute(sa.select(count).select_from(file_records)).scalar(),
+        'total_size': connection.execute(
+            sa.select(sa.func.coalesce(sa.func.sum(file_records.c.file_size), 0))
+        ).scalar(),
+        'total_verifications': connection.execute(sa.select(count).select_from(verification_logs)).scalar(),
+        'successful_verifications': connection.execute(
+            sa.select(count).select_from(verification_logs).where(verification_logs.c.verification_result.is_(True))
+        ).scalar(),
+        'active_users': connection.execute(
+            sa.select(count).select_from(users).where(users.c.is_active.is_(True))
+        ).scalar()
+    }
+
+    window_start = (now - timedelta(days=DAILY_COUNTER_DAYS)).date()
+    days = Counter(
+        created_at.date() for created_at, in connection.execute(
+            sa.select(file_records.c.created_at).where(
+                file_records.c.created_at >= datetime.combine(window_start, datetime.min.time())
+            )
+        )
+    )
+    values.update({f'files_on:{day.isoformat()}': uploads for day, uploads in days.items()})
+
+    connection.execute(system_stats.delete().where(system_stats.c.stat_name.in_(values)))
+    connection.execute(system_stats.insert(), [
+        {'stat_name': name, 'stat_value': value, 'last_updated': now} for name, value in values.items()
+    ])
+
+
+def downgrade():
+    pass
@@ -0,0 +1,62 @@
+"""trend buckets
+
+Hourly and daily upload/verification buckets behind /analytics/trends. The
+buckets are filled from the source tables on the first trends request, or
+ahead of time with flask compact-trends --rebuild.
+
+Revision ID: 59c880dd1ccf
+Revises: 532e8e15dcdf
+Create Date: 2026-10-17 08:17:40.811386
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '59c880dd1ccf'
+down_revision = '532e8e15dcdf'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'trend_hourly',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('bucket_start', sa.DateTime(), nullable=False),
+        sa.Column('hour_of_day', sa.Integer(), nullable=False),
+        sa.Column('uploads', sa.Integer(), nullable=False),
+        sa.Column('verifications', sa.Integer(), nullable=False),
+        sa.Column('successful_verifications', sa.Integer(), nullable=False),
+        sa.Column('last_updated', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('bucket_start')
+    )
+    op.create_table(
+        'trend_daily',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('bucket_start', sa.DateTime(), nullable=False),
+        sa.Column('uploads', sa.Integer(), nullable=False),
+        sa.Column('verifications', sa.Integer(), nullable=False),
+        sa.Column('successful_verifications', sa.Integer(), nullable=False),
+        sa.Column('last_updated', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('bucket_start')
+    )
+    op.create_table(
+        'trend_daily_file_types',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('bucket_start', sa.DateTime(), nullable=False),
+        sa.Column('file_type', sa.String(length=100), nullable=False),
+        sa.Column('uploads', sa.Integer(), nullable=False),
+        sa.Column('last_updated', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_trend_file_type_bucket', 'trend_daily_file_types', ['bucket_start', 'file_type'], unique=True)
+
+
+def downgrade():
+    op.drop_table('trend_daily_file_types')
+    op.drop_table('trend_daily')
+    op.drop_table('trend_hourly')
@@ -0,0 +1,122 @@
+"""baseline schema
+
+Tables as db.create_all() made them before migrations were added; stamp existing
+databases at this revision (flask db stamp 672f04ea7e7c) and upgrade from there.
+
+Revision ID: 672f04ea7e7c
+Revises: 
+Create Date: 2026-10-17 08:15:50.003853
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '672f04ea7e7c'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'users',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('email', sa.String(length=120), nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('password_hash', sa.String(length=255), nullable=False),
+        sa.Column('wallet_address', sa.String(length=42), nullable=True),
+        sa.Column('is_active', sa.Boolean(), nullable=True),
+        sa.Column('is_admin', sa.Boolean(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_users_email', 'users', ['email'], unique=True)
+    op.create_index('ix_users_wallet_address', 'users', ['wallet_address'], unique=True)
+
+    op.create_table(
+        'file_records',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('file_name', sa.String(length=255), nullable=False),
+        sa.Column('file_hash', sa.String(length=64), nullable=False),
+        sa.Column('file_size', sa.BigInteger(), nullable=False),
+        sa.Column('file_type', sa.String(length=100), nullable=True),
+        sa.Column('ipfs_hash', sa.String(length=100), nullable=True),
+        sa.Column('transaction_hash', sa.String(length=66), nullable=True),
+        sa.Column('block_number', sa.BigInteger(), nullable=True),
+        sa.Column('gas_used', sa.BigInteger(), nullable=True),
+        sa.Column('wallet_address', sa.String(length=42), nullable=False),
+        sa.Column('upload_status', sa.String(length=20), nullable=True),
+        sa.Column('file_metadata', sa.Text(), nullable=True),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('uploaded_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_file_records_file_hash', 'file_records', ['file_hash'], unique=True)
+    op.create_index('ix_file_records_transaction_hash', 'file_records', ['transaction_hash'])
+    op.create_index('ix_file_records_wallet_address', 'file_records', ['wallet_address'])
+    op.create_index('idx_file_hash_status', 'file_records', ['file_hash', 'upload_status'])
+    op.create_index('idx_wallet_created', 'file_records', ['wallet_address', 'created_at'])
+
+    op.create_table(
+        'verification_logs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('file_hash', sa.String(length=64), nullable=False),
+        sa.Column('verification_result', sa.Boolean(), nullable=False),
+        sa.Column('verifier_address', sa.String(length=42), nullable=True),
+        sa.Column('verification_method', sa.String(length=20), nullable=False),
+        sa.Column('original_file_name', sa.String(length=255), nullable=True),
+        sa.Column('blockchain_data', sa.Text(), nullable=True),
+        sa.Column('error_message', sa.Text(), nullable=True),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('file_record_id', sa.Integer(), nullable=True),
+        sa.Column('verified_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['file_record_id'], ['file_records.id']),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_verification_logs_file_hash', 'verification_logs', ['file_hash'])
+    op.create_index('idx_hash_verified', 'verification_logs', ['file_hash', 'verified_at'])
+    op.create_index('idx_verifier_result', 'verification_logs', ['verifier_address', 'verification_result'])
+
+    op.create_table(
+        'system_stats',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('stat_name', sa.String(length=50), nullable=False),
+        sa.Column('stat_value', sa.BigInteger(), nullable=True),
+        sa.Column('stat_data', sa.Text(), nullable=True),
+        sa.Column('last_updated', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('stat_name')
+    )
+
+    op.create_table(
+        'audit_logs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('action', sa.String(length=50), nullable=False),
+        sa.Column('resource_type', sa.String(length=50), nullable=False),
+        sa.Column('resource_id', sa.String(length=100), nullable=True),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('ip_address', sa.String(length=45), nullable=True),
+        sa.Column('user_agent', sa.String(length=255), nullable=True),
+        sa.Column('details', sa.Text(), nullable=True),
+        sa.Column('timestamp', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_action_timestamp', 'audit_logs', ['action', 'timestamp'])
+    op.create_index('idx_user_timestamp', 'audit_logs', ['user_id', 'timestamp'])
+    op.create_index('idx_resource_timestamp', 'audit_logs', ['resource_type', 'resource_id', 'timestamp'])
+
+
+def downgrade():
+    op.drop_table('audit_logs')
+    op.drop_table('system_stats')
+    op.drop_table('verification_logs')
+    op.drop_table('file_records')
+    op.drop_table('users')
@@ -0,0 +1,68 @@
+"""file search indexes
+
+(user_id, file_hash) for hash prefix searches, plus the file name search index:
+a pg_trgm GIN index on PostgreSQL, or a trigram FTS5 table kept in sync by
+triggers on SQLite 3.34+ (older SQLite searches names with LIKE).
+
+Revision ID: b7430fc0fe23
+Revises: 0f6e9c799250
+Create Date: 2026-10-17 08:19:11.014362
+
+"""
+import sqlite3
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7430fc0fe23'
+down_revision = '0f6e9c799250'
+branch_labels = None
+depends_on = None
+
+SQLITE_TRIGRAM = sqlite3.sqlite_version_info >= (3, 34, 0)
+
+
+def upgrade():
+    op.create_index('idx_user_file_hash', 'file_records', ['user_id', 'file_hash'])
+
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.execute(
+            "CREATE INDEX IF NOT EXISTS idx_file_name_trgm ON file_records "
+            "USING gin (lower(file_name) gin_trgm_ops)"
+        )
+    elif dialect == 'sqlite' and SQLITE_TRIGRAM:
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS file_records_fts USING fts5("
+            "file_name, content='file_records', content_rowid='id', tokenize='trigram')"
+        )
+        op.execute(
+            "CREATE TRIGGER IF NOT EXISTS file_records_fts_insert AFTER INSERT ON file_records BEGIN "
+            "INSERT INTO file_records_fts(rowid, file_name) VALUES (new.id, new.file_name); END"
+        )
+        op.execute(
+            "CREATE TRIGGER IF NOT EXISTS file_records_fts_delete AFTER DELETE ON file_records BEGIN "
+            "INSERT INTO file_records_fts(file_records_fts, rowid, file_name) "
+            "VALUES ('delete', old.id, old.file_name); END"
+        )
+        op.execute(
+            "CREATE TRIGGER IF NOT EXISTS file_records_fts_update AFTER UPDATE OF file_name ON file_records BEGIN "
+            "INSERT INTO file_records_fts(file_records_fts, rowid, file_name) "
+            "VALUES ('delete', old.id, old.file_name); "
+            "INSERT INTO file_records_fts(rowid, file_name) VALUES (new.id, new.file_name); END"
+        )
+        op.execute("INSERT INTO file_records_fts(file_records_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS idx_file_name_trgm")
+    elif dialect == 'sqlite':
+        for trigger in ('file_records_fts_insert', 'file_records_fts_delete', 'file_records_fts_update'):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS file_records_fts")
+
+    op.drop_index('idx_user_file_hash', table_name='file_records')
@@ -0,0 +1,81 @@
+"""audit details search
+
+audit_logs.details becomes a native JSON column (jsonb on PostgreSQL) with
+indexes for the audit log search: exact detail values (jsonb_path_ops GIN, or
+json_extract expression indexes on SQLite) and full text (a tsvector GIN
+expression index, or an FTS5 table kept in sync by triggers on SQLite).
+
+Revision ID: d43dad0ad60e
+Revises: 158a65195eda
+Create Date: 2026-10-17 08:20:26.760654
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'd43dad0ad60e'
+down_revision = '158a65195eda'
+branch_labels = None
+depends_on = None
+
+# Detail fields looked up by exact value (services/audit_search.py KEY_FIELDS)
+KEY_FIELDS = ('file_hash', 'email', 'transaction_hash')
+SQLITE_TRIGGERS = ('audit_logs_fts_insert', 'audit_logs_fts_delete')
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.alter_column(
+            'audit_logs', 'details', type_=postgresql.JSONB(), existing_nullable=True,
+            postgresql_using="nullif(details::text, '')::jsonb"
+        )
+        op.execute("CREATE INDEX IF NOT EXISTS idx_audit_details_gin ON audit_logs USING gin (details jsonb_path_ops)")
+        op.execute(
+            "CREATE INDEX IF NOT EXISTS idx_audit_fulltext ON audit_logs USING gin (("
+            "to_tsvector('simple', action || ' ' || coalesce(resource_id, '')) || "
+            "jsonb_to_tsvector('simple', coalesce(details, '{}'), '[\"string\"]')))"
+        )
+        return
+
+    op.execute("UPDATE audit_logs SET details = NULL WHERE details = ''")
+    with op.batch_alter_table('audit_logs') as batch_op:
+        batch_op.alter_column('details', type_=sa.JSON(), existing_type=sa.Text(), existing_nullable=True)
+    for field in KEY_FIELDS:
+        op.execute(f"CREATE INDEX IF NOT EXISTS idx_audit_{field} ON audit_logs (json_extract(details, '$.{field}'))")
+    op.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS audit_logs_fts USING fts5("
+        "action, resource_id, details, content='audit_logs', content_rowid='id')"
+    )
+    op.execute(
+        "CREATE TRIGGER IF NOT EXISTS audit_logs_fts_insert AFTER INSERT ON audit_logs BEGIN "
+        "INSERT INTO audit_logs_fts(rowid, action, resource_id, details) "
+        "VALUES (new.id, new.action, new.resource_id, new.details); END"
+    )
+    op.execute(
+        "CREATE TRIGGER IF NOT EXISTS audit_logs_fts_delete AFTER DELETE ON audit_logs BEGIN "
+        "INSERT INTO audit_logs_fts(audit_logs_fts, rowid, action, resource_id, details) "
+        "VALUES ('delete', old.id, old.action, old.resource_id, old.details); END"
+    )
+    op.execute("INSERT INTO audit_logs_fts(audit_logs_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS idx_audit_fulltext")
+        op.execute("DROP INDEX IF EXISTS idx_audit_details_gin")
+        op.alter_column(
+            'audit_logs', 'details', type_=sa.Text(), existing_nullable=True,
+            postgresql_using="details::text"
+        )
+        return
+
+    for trigger in SQLITE_TRIGGERS:
+        op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    op.execute("DROP TABLE IF EXISTS audit_logs_fts")
+    for field in KEY_FIELDS:
+        op.execute(f"DROP INDEX IF EXISTS idx_audit_{field}")
+    with op.batch_alter_table('audit_logs') as batch_op:
+        batch_op.alter_column('details', type_=sa.Text(), existing_type=sa.JSON(), existing_nullable=True)
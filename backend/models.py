@@ -1,10 +1,15 @@
 from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
 from werkzeug.security import generate_password_hash, check_password_hash
-import json
 
 db = SQLAlchemy()
 
+# Native JSON (JSONB on PostgreSQL); values are dicts in Python and SQL NULL when unset
+JSONData = db.JSON(none_as_null=True).with_variant(JSONB(none_as_null=True), 'postgresql')
+
 class User(db.Model):
     """User model for authentication and authorization."""
     __tablename__ = 'users'
@@ -23,6 +28,11 @@ class User(db.Model):
     files = db.relationship('FileRecord', backref='user', lazy='dynamic', cascade='all, delete-orphan')
     verifications = db.relationship('VerificationLog', backref='user', lazy='dynamic')
     
+    # Indexes (keyset order for the admin user list)
+    __table_args__ = (
+        db.Index('idx_users_created_id', 'created_at', 'id'),
+    )
+    
     def set_password(self, password):
         """Set password hash."""
         self.password_hash = generate_password_hash(password)
@@ -63,7 +73,7 @@ class FileRecord(db.Model):
     
     # File metadata
     upload_status = db.Column(db.String(20), default='pending')  # pending, uploaded, verified, failed
-    file_metadata = db.Column(db.Text, nullable=True)  # JSON string for additional metadata
+    file_metadata = db.Column(JSONData, nullable=True)  # additional metadata
     
     # Relationships
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
@@ -77,19 +87,21 @@ class FileRecord(db.Model):
     __table_args__ = (
         db.Index('idx_file_hash_status', 'file_hash', 'upload_status'),
         db.Index('idx_wallet_created', 'wallet_address', 'created_at'),
+        db.Index('idx_user_created_id', 'user_id', 'created_at', 'id'),
+        db.Index('idx_user_file_hash', 'user_id', 'file_hash'),  # hash prefix ranges in search
     )
     
     def set_metadata(self, metadata_dict):
-        """Set metadata as JSON string."""
-        self.file_metadata = json.dumps(metadata_dict) if metadata_dict else None
+        """Set metadata."""
+        self.file_metadata = metadata_dict or None
     
     def get_metadata(self):
         """Get metadata as dictionary."""
-        return json.loads(self.file_metadata) if self.file_metadata else {}
+        return self.file_metadata or {}
     
-    def to_dict(self):
-        """Convert file record to dictionary."""
-        return {
+    def to_dict(self, include_metadata=True):
+        """Convert file record to dictionary (list views may leave out metadata)."""
+        data = {
             'id': self.id,
             'file_name': self.file_name,
             'file_hash': self.file_hash,
@@ -101,12 +113,14 @@ class FileRecord(db.Model):
             'gas_used': self.gas_used,
             'wallet_address': self.wallet_address,
             'upload_status': self.upload_status,
-            'metadata': self.get_metadata(),
             'user_id': self.user_id,
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat(),
             'uploaded_at': self.uploaded_at.isoformat() if self.uploaded_at else None
         }
+        if include_metadata:
+            data['metadata'] = self.get_metadata()
+        return data
 
 class VerificationLog(db.Model):
     """Verification log model for tracking file verifications."""
@@ -120,9 +134,14 @@ class VerificationLog(db.Model):
     
     # Verification details
     original_file_name = db.Column(db.String(255), nullable=True)
-    blockchain_data = db.Column(db.Text, nullable=True)  # JSON string of blockchain response
+    blockchain_data = db.Column(JSONData, nullable=True)  # blockchain response
     error_message = db.Column(db.Text, nullable=True)
     
+    # On-chain FileVerified event (set by the chain indexer)
+    transaction_hash = db.Column(db.String(66), nullable=True)
+    block_number = db.Column(db.BigInteger, nullable=True)
+    log_index = db.Column(db.Integer, nullable=True)
+    
     # Relationships
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
     file_record_id = db.Column(db.Integer, db.ForeignKey('file_records.id'), nullable=True)
@@ -134,31 +153,72 @@ class VerificationLog(db.Model):
     __table_args__ = (
         db.Index('idx_hash_verified', 'file_hash', 'verified_at'),
         db.Index('idx_verifier_result', 'verifier_address', 'verification_result'),
+        db.Index('idx_verification_tx_log', 'transaction_hash', 'log_index', unique=True),
     )
     
     def set_blockchain_data(self, data_dict):
-        """Set blockchain data as JSON string."""
-        self.blockchain_data = json.dumps(data_dict) if data_dict else None
+        """Set blockchain data."""
+        self.blockchain_data = data_dict or None
     
     def get_blockchain_data(self):
         """Get blockchain data as dictionary."""
-        return json.loads(self.blockchain_data) if self.blockchain_data else {}
+        return self.blockchain_data or {}
     
-    def to_dict(self):
-        """Convert verification log to dictionary."""
-        return {
+    def to_dict(self, include_blockchain_data=True):
+        """Convert verification log to dictionary (list views may leave out blockchain data)."""
+        data = {
             'id': self.id,
             'file_hash': self.file_hash,
             'verification_result': self.verification_result,
             'verifier_address': self.verifier_address,
             'verification_method': self.verification_method,
             'original_file_name': self.original_file_name,
-            'blockchain_data': self.get_blockchain_data(),
             'error_message': self.error_message,
             'user_id': self.user_id,
             'file_record_id': self.file_record_id,
+            'transaction_hash': self.transaction_hash,
+            'block_number': self.block_number,
             'verified_at': self.verified_at.isoformat()
         }
+        if include_blockchain_data:
+            data['blockchain_data'] = self.get_blockchain_data()
+        return data
+
+class FileRegistration(db.Model):
+    """On-chain FileUploaded events ordered by block timestamp for range queries."""
+    __tablename__ = 'file_registrations'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    file_hash = db.Column(db.String(64), nullable=False, unique=True)
+    file_name = db.Column(db.String(255), nullable=False)
+    uploader_address = db.Column(db.String(42), nullable=False)  # lowercased
+    block_timestamp = db.Column(db.DateTime, nullable=False)
+    block_number = db.Column(db.BigInteger, nullable=False)
+    transaction_hash = db.Column(db.String(66), nullable=False)
+    log_index = db.Column(db.Integer, nullable=False)
+    
+    # Relationships
+    file_record_id = db.Column(db.Integer, db.ForeignKey('file_records.id', ondelete='SET NULL'), nullable=True)
+    
+    # Indexes (keyset order is (block_timestamp, id))
+    __table_args__ = (
+        db.Index('idx_registration_time', 'block_timestamp', 'id'),
+        db.Index('idx_registration_uploader_time', 'uploader_address', 'block_timestamp', 'id'),
+        db.Index('idx_registration_block', 'block_number'),
+    )
+    
+    def to_dict(self):
+        """Convert file registration to dictionary."""
+        return {
+            'id': self.id,
+            'file_hash': self.file_hash,
+            'file_name': self.file_name,
+            'uploader_address': self.uploader_address,
+            'block_timestamp': self.block_timestamp.isoformat(),
+            'block_number': self.block_number,
+            'transaction_hash': self.transaction_hash,
+            'file_record_id': self.file_record_id
+        }
 
 class SystemStats(db.Model):
     """System statistics model for analytics."""
@@ -167,16 +227,16 @@ class SystemStats(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     stat_name = db.Column(db.String(50), nullable=False, unique=True)
     stat_value = db.Column(db.BigInteger, default=0)
-    stat_data = db.Column(db.Text, nullable=True)  # JSON string for complex data
+    stat_data = db.Column(JSONData, nullable=True)  # complex data
     last_updated = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     def set_data(self, data_dict):
-        """Set stat data as JSON string."""
-        self.stat_data = json.dumps(data_dict) if data_dict else None
+        """Set stat data."""
+        self.stat_data = data_dict or None
     
     def get_data(self):
         """Get stat data as dictionary."""
-        return json.loads(self.stat_data) if self.stat_data else {}
+        return self.stat_data or {}
     
     def to_dict(self):
         """Convert system stats to dictionary."""
@@ -188,38 +248,117 @@ class SystemStats(db.Model):
             'last_updated': self.last_updated.isoformat()
         }
 
+class UserStats(db.Model):
+    """Per-user file and verification counters kept current on writes."""
+    __tablename__ = 'user_stats'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    total_files = db.Column(db.Integer, nullable=False, default=0)
+    total_size = db.Column(db.BigInteger, nullable=False, default=0)
+    total_verifications = db.Column(db.Integer, nullable=False, default=0)
+    successful_verifications = db.Column(db.Integer, nullable=False, default=0)
+    last_updated = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        """Convert user stats to dictionary."""
+        return {
+            'user_id': self.user_id,
+            'total_files': self.total_files,
+            'total_size': self.total_size,
+            'total_verifications': self.total_verifications,
+            'successful_verifications': self.successful_verifications,
+            'last_updated': self.last_updated.isoformat() if self.last_updated else None
+        }
+
+class HourlyTrend(db.Model):
+    """Per-hour upload and verification counts behind the 24h trend and activity heatmap."""
+    __tablename__ = 'trend_hourly'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    bucket_start = db.Column(db.DateTime, nullable=False, unique=True)
+    hour_of_day = db.Column(db.Integer, nullable=False)  # stored so the heatmap needs no extract()
+    uploads = db.Column(db.Integer, nullable=False, default=0)
+    verifications = db.Column(db.Integer, nullable=False, default=0)
+    successful_verifications = db.Column(db.Integer, nullable=False, default=0)
+    last_updated = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class DailyTrend(db.Model):
+    """Per-day upload and verification counts behind the 7d/30d/90d trends."""
+    __tablename__ = 'trend_daily'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    bucket_start = db.Column(db.DateTime, nullable=False, unique=True)
+    uploads = db.Column(db.Integer, nullable=False, default=0)
+    verifications = db.Column(db.Integer, nullable=False, default=0)
+    successful_verifications = db.Column(db.Integer, nullable=False, default=0)
+    last_updated = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class DailyFileTypeTrend(db.Model):
+    """Per-day upload counts by file type behind the file type distribution."""
+    __tablename__ = 'trend_daily_file_types'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    bucket_start = db.Column(db.DateTime, nullable=False)
+    file_type = db.Column(db.String(100), nullable=False, default='')  # '' for unknown types
+    uploads = db.Column(db.Integer, nullable=False, default=0)
+    last_updated = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Indexes
+    __table_args__ = (
+        db.Index('idx_trend_file_type_bucket', 'bucket_start', 'file_type', unique=True),
+    )
+
+# Audit log ids come from a sequence on PostgreSQL; audit_logs has a composite primary key
+# (id, timestamp) there because it is range partitioned, so the id cannot be a SERIAL
+AUDIT_LOG_ID_SEQUENCE = db.Sequence('audit_logs_id_seq', metadata=db.metadata)
+
+class next_audit_log_id(FunctionElement):
+    """SQL default for AuditLog.id: nextval of the sequence, or max(id) + 1 without sequences."""
+    type = db.Integer()
+    inherit_cache = True
+
+@compiles(next_audit_log_id)
+def _next_audit_log_id(element, compiler, **kwargs):
+    return "(SELECT coalesce(max(id), 0) + 1 FROM audit_logs)"
+
+@compiles(next_audit_log_id, 'postgresql')
+def _next_audit_log_id_postgresql(element, compiler, **kwargs):
+    return f"nextval('{AUDIT_LOG_ID_SEQUENCE.name}')"
+
 class AuditLog(db.Model):
     """Audit log model for tracking system activities."""
     __tablename__ = 'audit_logs'
     
-    id = db.Column(db.Integer, primary_key=True)
+    id = db.Column(db.Integer, primary_key=True, default=next_audit_log_id())
     action = db.Column(db.String(50), nullable=False)
     resource_type = db.Column(db.String(50), nullable=False)
     resource_id = db.Column(db.String(100), nullable=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
     ip_address = db.Column(db.String(45), nullable=True)
     user_agent = db.Column(db.String(255), nullable=True)
-    details = db.Column(db.Text, nullable=True)  # JSON string for additional details
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    details = db.Column(JSONData, nullable=True)  # search: services/audit_search.py
+    timestamp = db.Column(db.DateTime, primary_key=True, default=datetime.utcnow)
     
-    # Indexes
+    # Indexes (monthly range partitions on PostgreSQL, see services/audit_partitions.py)
     __table_args__ = (
         db.Index('idx_action_timestamp', 'action', 'timestamp'),
+        db.Index('idx_timestamp_id', 'timestamp', 'id'),
         db.Index('idx_user_timestamp', 'user_id', 'timestamp'),
         db.Index('idx_resource_timestamp', 'resource_type', 'resource_id', 'timestamp'),
+        {'postgresql_partition_by': 'RANGE (timestamp)'},
     )
     
     def set_details(self, details_dict):
-        """Set details as JSON string."""
-        self.details = json.dumps(details_dict) if details_dict else None
+        """Set details (stored as native JSON)."""
+        self.details = details_dict or None
     
     def get_details(self):
         """Get details as dictionary."""
-        return json.loads(self.details) if self.details else {}
+        return self.details or {}
     
-    def to_dict(self):
-        """Convert audit log to dictionary."""
-        return {
+    def to_dict(self, include_details=True):
+        """Convert audit log to dictionary (list views may leave out details)."""
+        data = {
             'id': self.id,
             'action': self.action,
             'resource_type': self.resource_type,
@@ -227,6 +366,56 @@ class AuditLog(db.Model):
             'user_id': self.user_id,
             'ip_address': self.ip_address,
             'user_agent': self.user_agent,
-            'details': self.get_details(),
             'timestamp': self.timestamp.isoformat()
         }
+        if include_details:
+            data['details'] = self.get_details()
+        return data
+
+class ExportJob(db.Model):
+    """Background data export and the artifact it produced."""
+    __tablename__ = 'export_jobs'
+    
+    id = db.Column(db.String(36), primary_key=True)  # uuid4 hex, also the download token
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
+    export_format = db.Column(db.String(20), nullable=False)  # csv, ndjson, parquet
+    date_range = db.Column(db.String(10), nullable=False)
+    datasets = db.Column(db.String(100), nullable=False)  # comma separated: files,verifications,audit
+    all_users = db.Column(db.Boolean, nullable=False, default=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, running, completed, failed
+    rows_written = db.Column(db.BigInteger, nullable=False, default=0)
+    total_rows = db.Column(db.BigInteger, nullable=True)  # planner estimate on PostgreSQL
+    file_path = db.Column(db.String(500), nullable=True)
+    file_size = db.Column(db.BigInteger, nullable=True)
+    error_message = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    heartbeat_at = db.Column(db.DateTime, nullable=True)
+    completed_at = db.Column(db.DateTime, nullable=True)
+    
+    __table_args__ = (
+        db.Index('idx_export_status_created', 'status', 'created_at'),
+    )
+    
+    def to_dict(self):
+        """Convert export job to dictionary."""
+        progress = None
+        if self.status == 'completed':
+            progress = 100.0
+        elif self.total_rows:
+            progress = round(min(self.rows_written / self.total_rows, 0.99) * 100, 1)
+        
+        return {
+            'export_id': self.id,
+            'type': self.export_format,
+            'date_range': self.date_range,
+            'include': self.datasets.split(','),
+            'status': self.status,
+            'rows_written': self.rows_written,
+            'total_rows': self.total_rows,
+            'progress': progress,
+            'file_size': self.file_size,
+            'error': self.error_message,
+            'generated_at': self.completed_at.isoformat() if self.completed_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
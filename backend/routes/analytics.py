@@ -1,43 +1,42 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app, send_file
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from models import db, FileRecord, VerificationLog, User, AuditLog, SystemStats
+from models import db, FileRecord, VerificationLog, User, AuditLog, SystemStats, ExportJob
 from datetime import datetime, timedelta
-from sqlalchemy import func, and_, or_, desc
+import os
+from sqlalchemy import func, and_, or_, desc, case
+from services.stats import get_overview_stats, get_user_counters
+from services.trends import get_trend_series
+from services.pagination import paginate_request, InvalidCursorError
+from services.serializers import AUDIT_LOG_SCHEMA, InvalidFieldsError, json_response
+from services.etags import conditional_get
+from services.audit_search import search_audit_logs
+from services.exports import create_export, start_export, ExportError
 
 analytics_bp = Blueprint('analytics', __name__)
 
 @analytics_bp.route('/overview', methods=['GET'])
 @jwt_required()
+@conditional_get('global', bucket=3600)
 def get_overview():
     """Get system overview statistics."""
     try:
         current_user_id = get_jwt_identity()
         
-        # Total files count
-        total_files = FileRecord.query.count()
+        # Read precomputed counters (one query over SystemStats rollup rows)
+        stats = get_overview_stats()
         
-        # Total verifications count
-        total_verifications = VerificationLog.query.count()
-        
-        # Total users count
-        total_users = User.query.filter_by(is_active=True).count()
-        
-        # Total storage used
-        total_size_result = db.session.query(func.sum(FileRecord.file_size)).scalar()
-        total_size = total_size_result or 0
+        total_files = stats['total_files']
+        total_verifications = stats['total_verifications']
+        total_users = stats['total_users']
+        total_size = stats['total_size']
         
         # Success rate
-        successful_verifications = VerificationLog.query.filter_by(verification_result=True).count()
+        successful_verifications = stats['successful_verifications']
         success_rate = (successful_verifications / total_verifications * 100) if total_verifications > 0 else 0
         
-        # Recent growth (last 30 days vs previous 30 days)
-        thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-        sixty_days_ago = datetime.utcnow() - timedelta(days=60)
-        
-        recent_files = FileRecord.query.filter(FileRecord.created_at >= thirty_days_ago).count()
-        previous_files = FileRecord.query.filter(
-            and_(FileRecord.created_at >= sixty_days_ago, FileRecord.created_at < thirty_days_ago)
-        ).count()
+        # Recent growth (last 30 days vs previous 30 days, from daily counters)
+        recent_files = stats['recent_files']
+        previous_files = stats['previous_files']
         
         growth_rate = ((recent_files - previous_files) / previous_files * 100) if previous_files > 0 else 0
         
@@ -56,6 +55,7 @@ def get_overview():
 
 @analytics_bp.route('/trends', methods=['GET'])
 @jwt_required()
+@conditional_get('global', bucket=3600)
 def get_trends():
     """Get trend data for charts."""
     try:
@@ -80,82 +80,34 @@ def get_trends():
         
         start_date = datetime.utcnow() - timedelta(days=days)
         
-        # Upload trend
-        if group_by == 'hour':
-            upload_trend = db.session.query(
-                func.date_trunc('hour', FileRecord.created_at).label('date'),
-                func.count(FileRecord.id).label('uploads')
-            ).filter(
-                FileRecord.created_at >= start_date
-            ).group_by(
-                func.date_trunc('hour', FileRecord.created_at)
-            ).order_by('date').all()
-        else:
-            upload_trend = db.session.query(
-                func.date_trunc('day', FileRecord.created_at).label('date'),
-                func.count(FileRecord.id).label('uploads')
-            ).filter(
-                FileRecord.created_at >= start_date
-            ).group_by(
-                func.date_trunc('day', FileRecord.created_at)
-            ).order_by('date').all()
-        
-        # Verification trend
-        verification_trend = db.session.query(
-            func.date_trunc('day', VerificationLog.verified_at).label('date'),
-            func.count(VerificationLog.id).label('verifications'),
-            func.sum(func.cast(VerificationLog.verification_result, db.Integer)).label('successful')
-        ).filter(
-            VerificationLog.verified_at >= start_date
-        ).group_by(
-            func.date_trunc('day', VerificationLog.verified_at)
-        ).order_by('date').all()
-        
-        # File types distribution
-        file_types = db.session.query(
-            FileRecord.file_type,
-            func.count(FileRecord.id).label('count')
-        ).filter(
-            FileRecord.created_at >= start_date
-        ).group_by(
-            FileRecord.file_type
-        ).order_by(desc('count')).limit(10).all()
-        
-        # User activity by hour (for heatmap)
-        user_activity = db.session.query(
-            func.extract('hour', FileRecord.created_at).label('hour'),
-            func.count(FileRecord.id).label('activity')
-        ).filter(
-            FileRecord.created_at >= start_date
-        ).group_by(
-            func.extract('hour', FileRecord.created_at)
-        ).order_by('hour').all()
+        # Series come from pre-aggregated hourly/daily bucket rows
+        series = get_trend_series(start_date, hourly=(group_by == 'hour'))
         
         return jsonify({
             'uploadTrend': [
                 {
-                    'date': trend.date.isoformat(),
-                    'uploads': trend.uploads
-                } for trend in upload_trend
+                    'date': date.isoformat(),
+                    'uploads': uploads
+                } for date, uploads in series['uploads']
             ],
             'verificationTrend': [
                 {
-                    'date': trend.date.isoformat(),
-                    'verifications': trend.verifications,
-                    'successful': trend.successful or 0
-                } for trend in verification_trend
+                    'date': date.isoformat(),
+                    'verifications': verifications,
+                    'successful': successful or 0
+                } for date, verifications, successful in series['verifications']
             ],
             'fileTypes': [
                 {
-                    'name': ft.file_type or 'Unknown',
-                    'count': ft.count
-                } for ft in file_types
+                    'name': file_type or 'Unknown',
+                    'count': count
+                } for file_type, count in series['file_types']
             ],
             'userActivity': [
                 {
-                    'hour': int(activity.hour),
-                    'activity': activity.activity
-                } for activity in user_activity
+                    'hour': int(hour),
+                    'activity': activity
+                } for hour, activity in series['user_activity']
             ]
         }), 200
         
@@ -164,6 +116,7 @@ def get_trends():
 
 @analytics_bp.route('/blockchain-stats', methods=['GET'])
 @jwt_required()
+@conditional_get('global')
 def get_blockchain_stats():
     """Get blockchain-related statistics."""
     try:
@@ -209,43 +162,33 @@ def get_blockchain_stats():
 
 @analytics_bp.route('/user-stats', methods=['GET'])
 @jwt_required()
+@conditional_get('user', bucket=3600)
 def get_user_stats():
     """Get user-specific statistics."""
     try:
         current_user_id = get_jwt_identity()
         
-        # User's file statistics
-        user_files = FileRecord.query.filter_by(user_id=current_user_id).count()
-        user_verifications = VerificationLog.query.filter_by(user_id=current_user_id).count()
+        # User's counters (per-user stats row kept current on writes)
+        stats = get_user_counters(current_user_id)
         
-        # User's storage usage
-        user_storage = db.session.query(
-            func.sum(FileRecord.file_size)
-        ).filter_by(user_id=current_user_id).scalar() or 0
-        
-        # User's recent activity (last 30 days)
+        # User's file types and recent activity (last 30 days) in one pass
         thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-        recent_uploads = FileRecord.query.filter(
-            and_(
-                FileRecord.user_id == current_user_id,
-                FileRecord.created_at >= thirty_days_ago
-            )
-        ).count()
-        
-        # User's file types
         user_file_types = db.session.query(
             FileRecord.file_type,
-            func.count(FileRecord.id).label('count')
+            func.count(FileRecord.id).label('count'),
+            func.sum(case((FileRecord.created_at >= thirty_days_ago, 1), else_=0)).label('recent')
         ).filter_by(
             user_id=current_user_id
         ).group_by(
             FileRecord.file_type
         ).order_by(desc('count')).all()
         
+        recent_uploads = sum(ft.recent or 0 for ft in user_file_types)
+        
         return jsonify({
-            'totalFiles': user_files,
-            'totalVerifications': user_verifications,
-            'storageUsed': user_storage,
+            'totalFiles': stats.total_files,
+            'totalVerifications': stats.total_verifications,
+            'storageUsed': stats.total_size,
             'recentUploads': recent_uploads,
             'fileTypes': [
                 {
@@ -304,13 +247,12 @@ def get_audit_logs():
         current_user_id = get_jwt_identity()
         user = User.query.get(current_user_id)
         
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 20, type=int)
         action = request.args.get('action')
         resource_type = request.args.get('resourceType')
         date_from = request.args.get('dateFrom')
         date_to = request.args.get('dateTo')
         search = request.args.get('search')
+        fields = AUDIT_LOG_SCHEMA.select()
         
         query = AuditLog.query
         
@@ -325,6 +267,7 @@ def get_audit_logs():
         if resource_type:
             query = query.filter_by(resource_type=resource_type)
         
+        # Timestamp bounds (and the keyset cursor) let PostgreSQL skip monthly partitions
         if date_from:
             query = query.filter(AuditLog.timestamp >= datetime.fromisoformat(date_from))
         
@@ -332,29 +275,24 @@ def get_audit_logs():
             query = query.filter(AuditLog.timestamp <= datetime.fromisoformat(date_to))
         
         if search:
-            query = query.filter(
-                or_(
-                    AuditLog.action.ilike(f'%{search}%'),
-                    AuditLog.resource_id.ilike(f'%{search}%'),
-                    AuditLog.details.ilike(f'%{search}%')
-                )
-            )
-        
-        # Paginate results
-        logs = query.order_by(desc(AuditLog.timestamp)).paginate(
-            page=page,
-            per_page=per_page,
-            error_out=False
+            query = search_audit_logs(query, search)
+        
+        # Paginate results (newest first, keyset on (timestamp, id))
+        scope = 'all' if user.is_admin else current_user_id
+        logs, page_fields = paginate_request(
+            AUDIT_LOG_SCHEMA.project(query, fields),
+            AuditLog.timestamp,
+            AuditLog.id,
+            count_key=f'audit-logs:{scope}:{action}:{resource_type}:{date_from}:{date_to}:{search}'
         )
         
-        return jsonify({
-            'logs': [log.to_dict() for log in logs.items],
-            'total': logs.total,
-            'pages': logs.pages,
-            'current_page': page,
-            'per_page': per_page
-        }), 200
+        return json_response({
+            'logs': AUDIT_LOG_SCHEMA.encode(logs, fields),
+            **page_fields
+        })
         
+    except (InvalidCursorError, InvalidFieldsError) as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -366,24 +304,33 @@ def get_audit_stats():
         current_user_id = get_jwt_identity()
         user = User.query.get(current_user_id)
         
-        query = AuditLog.query
+        date_from = request.args.get('dateFrom')
+        date_to = request.args.get('dateTo')
+        
+        # Count by action type in one pass
+        query = db.session.query(
+            func.count(AuditLog.id),
+            func.sum(case((AuditLog.action == 'file_uploaded', 1), else_=0)),
+            func.sum(case((AuditLog.action == 'file_verified', 1), else_=0)),
+            func.sum(case((AuditLog.action.in_(['login_success', 'login_failed']), 1), else_=0))
+        )
         if not user.is_admin:
-            query = query.filter_by(user_id=current_user_id)
+            query = query.filter(AuditLog.user_id == current_user_id)
         
-        total_logs = query.count()
+        # Timestamp bounds let PostgreSQL skip the monthly partitions outside the range
+        if date_from:
+            query = query.filter(AuditLog.timestamp >= datetime.fromisoformat(date_from))
         
-        # Count by action type
-        uploads = query.filter_by(action='file_uploaded').count()
-        verifications = query.filter_by(action='file_verified').count()
-        logins = query.filter(
-            AuditLog.action.in_(['login_success', 'login_failed'])
-        ).count()
+        if date_to:
+            query = query.filter(AuditLog.timestamp <= datetime.fromisoformat(date_to))
+        
+        total_logs, uploads, verifications, logins = query.one()
         
         return jsonify({
             'totalLogs': total_logs,
-            'uploads': uploads,
-            'verifications': verifications,
-            'logins': logins
+            'uploads': uploads or 0,
+            'verifications': verifications or 0,
+            'logins': logins or 0
         }), 200
         
     except Exception as e:
@@ -392,30 +339,75 @@ def get_audit_stats():
 @analytics_bp.route('/export', methods=['POST'])
 @jwt_required()
 def export_analytics():
-    """Export analytics data."""
+    """Start a background export of files, verifications and audit data."""
     try:
         current_user_id = get_jwt_identity()
-        data = request.get_json()
-        
-        export_type = data.get('type', 'csv')  # csv, json
-        date_range = data.get('dateRange', '30d')
-        include_data = data.get('include', ['files', 'verifications', 'audit'])
-        
-        # This would generate and return export data
-        # For now, return a placeholder
+        user = User.query.get(current_user_id)
+        data = request.get_json() or {}
         
-        export_data = {
-            'export_id': f'export_{current_user_id}_{datetime.utcnow().strftime("%Y%m%d_%H%M%S")}',
-            'type': export_type,
-            'date_range': date_range,
-            'generated_at': datetime.utcnow().isoformat(),
-            'status': 'pending'
-        }
+        job = create_export(
+            user,
+            export_format=data.get('type', 'csv'),  # csv, ndjson (or json), parquet
+            date_range=data.get('dateRange', '30d'),
+            include=data.get('include', ['files', 'verifications', 'audit'])
+        )
+        if current_app.config['EXPORT_IN_PROCESS']:
+            start_export(job.id)
         
         return jsonify({
             'message': 'Export initiated',
-            'export': export_data
+            'export': job.to_dict()
         }), 202
         
+    except ExportError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def get_user_export(export_id):
+    """Get an export job owned by the current user, or None."""
+    return ExportJob.query.filter_by(id=export_id, user_id=get_jwt_identity()).first()
+
+@analytics_bp.route('/export/<export_id>', methods=['GET'])
+@jwt_required()
+def get_export(export_id):
+    """Get export job status and progress."""
+    try:
+        job = get_user_export(export_id)
+        if not job:
+            return jsonify({'error': 'Export not found'}), 404
+        
+        return jsonify({'export': job.to_dict()}), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@analytics_bp.route('/export/<export_id>/download', methods=['GET'])
+@jwt_required()
+def download_export(export_id):
+    """Download a finished export (supports Range requests for resuming)."""
+    try:
+        job = get_user_export(export_id)
+        if not job:
+            return jsonify({'error': 'Export not found'}), 404
+        
+        if job.status != 'completed':
+            return jsonify({'error': 'Export is not ready', 'export': job.to_dict()}), 409
+        
+        if not job.file_path or not os.path.exists(job.file_path):
+            return jsonify({'error': 'Export has expired'}), 410
+        
+        response = send_file(
+            job.file_path,
+            mimetype='application/zip',
+            as_attachment=True,
+            download_name=f'export_{job.completed_at.strftime("%Y%m%d_%H%M%S")}_{job.export_format}.zip',
+            conditional=True,
+            etag=job.id,
+            max_age=0
+        )
+        response.headers['Accept-Ranges'] = 'bytes'
+        return response
+        
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -1,6 +1,10 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, create_access_token, get_jwt_identity, create_refresh_token
-from models import db, User, AuditLog
+from models import db, User
+from services.stats import record_user_registered
+from services.pagination import paginate_request, InvalidCursorError
+from services.audit import log_audit
+from services.serializers import USER_SCHEMA, InvalidFieldsError, json_response
 from datetime import datetime
 import re
 
@@ -11,23 +15,6 @@ def is_valid_email(email):
     pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
     return re.match(pattern, email) is not None
 
-def log_audit(action, user_id=None, details=None):
-    """Log audit trail."""
-    try:
-        audit_log = AuditLog(
-            action=action,
-            resource_type='user',
-            user_id=user_id,
-            ip_address=request.remote_addr,
-            user_agent=request.headers.get('User-Agent'),
-            details=details
-        )
-        audit_log.set_details(details)
-        db.session.add(audit_log)
-        db.session.commit()
-    except Exception as e:
-        print(f"Audit log error: {e}")
-
 @auth_bp.route('/register', methods=['POST'])
 def register():
     """Register a new user."""
@@ -70,6 +57,7 @@ def register():
         user.set_password(password)
         
         db.session.add(user)
+        record_user_registered()
         db.session.commit()
         
         # Create tokens
@@ -77,7 +65,7 @@ def register():
         refresh_token = create_refresh_token(identity=user.id)
         
         # Log registration
-        log_audit('user_registered', user.id, {'email': email, 'name': name})
+        log_audit('user_registered', 'user', user_id=user.id, details={'email': email, 'name': name})
         
         return jsonify({
             'message': 'User registered successfully',
@@ -106,11 +94,11 @@ def login():
         user = User.query.filter_by(email=email).first()
         
         if not user or not user.check_password(password):
-            log_audit('login_failed', None, {'email': email, 'reason': 'invalid_credentials'})
+            log_audit('login_failed', 'user', user_id=None, details={'email': email, 'reason': 'invalid_credentials'})
             return jsonify({'error': 'Invalid email or password'}), 401
         
         if not user.is_active:
-            log_audit('login_failed', user.id, {'email': email, 'reason': 'account_inactive'})
+            log_audit('login_failed', 'user', user_id=user.id, details={'email': email, 'reason': 'account_inactive'})
             return jsonify({'error': 'Account is inactive'}), 401
         
         # Create tokens
@@ -122,7 +110,7 @@ def login():
         db.session.commit()
         
         # Log successful login
-        log_audit('login_success', user.id, {'email': email})
+        log_audit('login_success', 'user', user_id=user.id, details={'email': email})
         
         return jsonify({
             'message': 'Login successful',
@@ -204,7 +192,7 @@ def update_profile():
         db.session.commit()
         
         # Log profile update
-        log_audit('profile_updated', user.id, data)
+        log_audit('profile_updated', 'user', user_id=user.id, details=data)
         
         return jsonify({
             'message': 'Profile updated successfully',
@@ -235,7 +223,7 @@ def change_password():
         
         # Verify current password
         if not user.check_password(current_password):
-            log_audit('password_change_failed', user.id, {'reason': 'invalid_current_password'})
+            log_audit('password_change_failed', 'user', user_id=user.id, details={'reason': 'invalid_current_password'})
             return jsonify({'error': 'Current password is incorrect'}), 401
         
         # Validate new password
@@ -248,7 +236,7 @@ def change_password():
         db.session.commit()
         
         # Log password change
-        log_audit('password_changed', user.id, {})
+        log_audit('password_changed', 'user', user_id=user.id, details={})
         
         return jsonify({
             'message': 'Password changed successfully'
@@ -266,7 +254,7 @@ def logout():
         current_user_id = get_jwt_identity()
         
         # Log logout
-        log_audit('logout', current_user_id, {})
+        log_audit('logout', 'user', user_id=current_user_id, details={})
         
         return jsonify({
             'message': 'Logged out successfully'
@@ -286,22 +274,22 @@ def list_users():
         if not current_user or not current_user.is_admin:
             return jsonify({'error': 'Admin access required'}), 403
         
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 20, type=int)
-        
-        users = User.query.paginate(
-            page=page,
-            per_page=per_page,
-            error_out=False
+        # Oldest first, keyset-paginated on (created_at, id)
+        fields = USER_SCHEMA.select()
+        users, page_fields = paginate_request(
+            USER_SCHEMA.project(User.query, fields),
+            User.created_at,
+            User.id,
+            count_key='users',
+            descending=False
         )
         
-        return jsonify({
-            'users': [user.to_dict() for user in users.items],
-            'total': users.total,
-            'pages': users.pages,
-            'current_page': page,
-            'per_page': per_page
-        }), 200
+        return json_response({
+            'users': USER_SCHEMA.encode(users, fields),
+            **page_fields
+        })
         
+    except (InvalidCursorError, InvalidFieldsError) as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': 'Failed to list users', 'details': str(e)}), 500
@@ -1,7 +1,13 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from models import db, FileRecord, VerificationLog, User, AuditLog
+from models import db, FileRecord, VerificationLog, User, FileRegistration
+from services.chain import get_chain, CONNECTION_ERRORS
+from services.cache import get_cache
+from services.indexer import get_indexer
+from services.pagination import keyset_page, InvalidCursorError
+from services.audit import log_audit
 from web3 import Web3
+from web3.exceptions import TransactionNotFound
 import os
 from datetime import datetime, timedelta
 from sqlalchemy import func, and_, or_
@@ -9,38 +15,43 @@ from sqlalchemy import func, and_, or_
 blockchain_bp = Blueprint('blockchain', __name__)
 
 def get_web3_connection():
-    """Get Web3 connection."""
+    """Get the shared Web3 connection for this worker."""
+    return get_chain().w3
+
+def parse_time_param(value):
+    """Parse a unix timestamp or ISO-8601 string into a naive UTC datetime."""
     try:
-        provider_uri = os.environ.get('WEB3_PROVIDER_URI', 'http://localhost:8545')
-        w3 = Web3(Web3.HTTPProvider(provider_uri))
-        return w3 if w3.is_connected() else None
-    except Exception as e:
-        print(f"Web3 connection error: {e}")
-        return None
+        return datetime.utcfromtimestamp(float(value))
+    except ValueError:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).replace(tzinfo=None)
+
+def chain_unavailable():
+    """Drop the shared connection so the next request reconnects."""
+    print("Web3 connection error: node unreachable, resetting connection")
+    get_chain().reset()
+    return jsonify({'error': 'Blockchain not connected'}), 503
 
 @blockchain_bp.route('/status', methods=['GET'])
 def blockchain_status():
     """Get blockchain connection status."""
     try:
-        w3 = get_web3_connection()
+        chain = get_chain()
+        head = chain.head()
         
-        if w3:
-            latest_block = w3.eth.get_block('latest')
-            gas_price = w3.eth.gas_price
-            
-            return jsonify({
-                'connected': True,
-                'network_id': w3.eth.chain_id,
-                'latest_block': latest_block.number,
-                'gas_price': str(gas_price),
-                'accounts': len(w3.eth.accounts) if hasattr(w3.eth, 'accounts') else 0
-            }), 200
-        else:
-            return jsonify({
-                'connected': False,
-                'error': 'Unable to connect to blockchain'
-            }), 503
+        return jsonify({
+            'connected': True,
+            'network_id': chain.chain_id,
+            'latest_block': head['number'],
+            'gas_price': str(head['gas_price']),
+            'accounts': chain.accounts_count
+        }), 200
             
+    except CONNECTION_ERRORS:
+        get_chain().reset()
+        return jsonify({
+            'connected': False,
+            'error': 'Unable to connect to blockchain'
+        }), 503
     except Exception as e:
         return jsonify({
             'connected': False,
@@ -56,24 +67,24 @@ def contract_info():
         if not contract_address:
             return jsonify({'error': 'Contract address not configured'}), 500
         
-        w3 = get_web3_connection()
-        if not w3:
-            return jsonify({'error': 'Blockchain not connected'}), 503
+        chain = get_chain()
         
-        # Check if contract exists
-        code = w3.eth.get_code(contract_address)
+        # Check if contract exists (deployed code is cached)
+        code = chain.get_code(contract_address)
         contract_exists = len(code) > 0
         
         # Get contract balance (if needed)
-        balance = w3.eth.get_balance(contract_address)
+        balance = chain.w3.eth.get_balance(contract_address)
         
         return jsonify({
             'address': contract_address,
             'exists': contract_exists,
             'balance': str(balance),
-            'network_id': w3.eth.chain_id
+            'network_id': chain.chain_id
         }), 200
         
+    except CONNECTION_ERRORS:
+        return chain_unavailable()
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -81,23 +92,17 @@ def contract_info():
 def get_transaction_info(tx_hash):
     """Get transaction information."""
     try:
-        w3 = get_web3_connection()
-        if not w3:
-            return jsonify({'error': 'Blockchain not connected'}), 503
+        # Get transaction, receipt and current block number in one round trip
+        batch = get_chain().batch()
+        batch.get_transaction(tx_hash)
+        batch.get_transaction_receipt(tx_hash)
+        batch.block_number()
+        tx, receipt, current_block = batch.execute()
         
-        # Get transaction
-        tx = w3.eth.get_transaction(tx_hash)
+        if tx is None:
+            raise TransactionNotFound(f"Transaction with hash: '{tx_hash}' not found.")
         
-        # Get transaction receipt
-        try:
-            receipt = w3.eth.get_transaction_receipt(tx_hash)
-            confirmed = True
-        except:
-            receipt = None
-            confirmed = False
-        
-        # Get current block for confirmations
-        current_block = w3.eth.get_block('latest').number
+        confirmed = receipt is not None
         confirmations = current_block - tx.blockNumber if tx.blockNumber else 0
         
         transaction_info = {
@@ -123,6 +128,8 @@ def get_transaction_info(tx_hash):
         
         return jsonify(transaction_info), 200
         
+    except CONNECTION_ERRORS:
+        return chain_unavailable()
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -133,8 +140,6 @@ def estimate_gas():
         data = request.get_json()
         
         w3 = get_web3_connection()
-        if not w3:
-            return jsonify({'error': 'Blockchain not connected'}), 503
         
         # Build transaction for estimation
         transaction = {
@@ -146,9 +151,9 @@ def estimate_gas():
         if data.get('from'):
             transaction['from'] = data['from']
         
-        # Estimate gas
+        # Estimate gas (gas price comes from the cached chain head)
         gas_estimate = w3.eth.estimate_gas(transaction)
-        current_gas_price = w3.eth.gas_price
+        current_gas_price = get_chain().head()['gas_price']
         
         # Add 20% buffer to gas estimate
         gas_limit = int(gas_estimate * 1.2)
@@ -164,6 +169,8 @@ def estimate_gas():
             'estimated_cost_eth': str(w3.from_wei(estimated_cost, 'ether'))
         }), 200
         
+    except CONNECTION_ERRORS:
+        return chain_unavailable()
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -171,29 +178,35 @@ def estimate_gas():
 def network_stats():
     """Get network statistics."""
     try:
-        w3 = get_web3_connection()
-        if not w3:
-            return jsonify({'error': 'Blockchain not connected'}), 503
-        
-        latest_block = w3.eth.get_block('latest')
-        gas_price = w3.eth.gas_price
-        
-        # Calculate average block time (simplified)
-        prev_block = w3.eth.get_block(latest_block.number - 10)
-        avg_block_time = (latest_block.timestamp - prev_block.timestamp) / 10
+        chain = get_chain()
+        w3 = chain.w3
+        head = chain.head()
+        
+        # Calculate average block time (simplified), once per chain head
+        def fetch_avg_block_time():
+            prev_block = w3.eth.get_block(head['number'] - 10)
+            return (head['timestamp'] - prev_block.timestamp) / 10
+        
+        avg_block_time = get_cache().get_or_set(
+            f"chain:{chain.chain_id}:avg-block-time:{head['number']}",
+            chain.head_ttl,
+            fetch_avg_block_time
+        )
         
         return jsonify({
-            'chain_id': w3.eth.chain_id,
-            'latest_block_number': latest_block.number,
-            'latest_block_hash': latest_block.hash.hex(),
-            'gas_price': str(gas_price),
-            'gas_price_gwei': str(w3.from_wei(gas_price, 'gwei')),
+            'chain_id': chain.chain_id,
+            'latest_block_number': head['number'],
+            'latest_block_hash': head['hash'],
+            'gas_price': str(head['gas_price']),
+            'gas_price_gwei': str(w3.from_wei(head['gas_price'], 'gwei')),
             'avg_block_time': avg_block_time,
-            'block_gas_limit': latest_block.gasLimit,
-            'block_gas_used': latest_block.gasUsed,
-            'network_utilization': (latest_block.gasUsed / latest_block.gasLimit) * 100
+            'block_gas_limit': head['gas_limit'],
+            'block_gas_used': head['gas_used'],
+            'network_utilization': (head['gas_used'] / head['gas_limit']) * 100
         }), 200
         
+    except CONNECTION_ERRORS:
+        return chain_unavailable()
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -210,12 +223,10 @@ def verify_contract_deployment():
         if not contract_address:
             return jsonify({'error': 'Contract address required'}), 400
         
-        w3 = get_web3_connection()
-        if not w3:
-            return jsonify({'error': 'Blockchain not connected'}), 503
+        chain = get_chain()
         
-        # Check if contract exists
-        code = w3.eth.get_code(contract_address)
+        # Check if contract exists (deployed code is cached)
+        code = chain.get_code(contract_address)
         
         if len(code) <= 2:  # '0x' or empty
             return jsonify({
@@ -229,27 +240,18 @@ def verify_contract_deployment():
         verification_result = {
             'verified': True,
             'contract_address': contract_address,
-            'network_id': w3.eth.chain_id,
+            'network_id': chain.chain_id,
             'code_size': len(code),
             'verified_at': datetime.utcnow().isoformat()
         }
         
         # Log verification
-        audit_log = AuditLog(
-            action='contract_verified',
-            resource_type='blockchain',
-            resource_id=contract_address,
-            user_id=current_user_id,
-            ip_address=request.remote_addr,
-            user_agent=request.headers.get('User-Agent')
-        )
-        audit_log.set_details(verification_result)
-        
-        db.session.add(audit_log)
-        db.session.commit()
+        log_audit('contract_verified', 'blockchain', contract_address, current_user_id, verification_result)
         
         return jsonify(verification_result), 200
         
+    except CONNECTION_ERRORS:
+        return chain_unavailable()
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -264,60 +266,175 @@ def sync_blockchain_files():
         if not user or not user.is_admin:
             return jsonify({'error': 'Admin access required'}), 403
         
-        w3 = get_web3_connection()
-        if not w3:
-            return jsonify({'error': 'Blockchain not connected'}), 503
-        
-        # This would require contract ABI and event filtering
-        # For now, return a placeholder response
-        
-        sync_result = {
-            'synced_files': 0,
-            'new_files': 0,
-            'updated_files': 0,
-            'sync_time': datetime.utcnow().isoformat()
-        }
+        # Index FileRegistry events from the last checkpoint up to the confirmed head
+        sync_result = get_indexer().run_once()
+        sync_result['sync_time'] = datetime.utcnow().isoformat()
         
         return jsonify(sync_result), 200
         
+    except CONNECTION_ERRORS:
+        return chain_unavailable()
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def indexed_events(event_types, limit):
+    """Get the most recent FileRegistry events from the indexed tables, newest first."""
+    events = []
+    if event_types is None or 'FileUploaded' in event_types:
+        registrations = FileRegistration.query.order_by(
+            FileRegistration.block_number.desc(), FileRegistration.log_index.desc()
+        ).limit(limit)
+        for registration in registrations:
+            events.append({
+                'event_type': 'file_uploaded',
+                'file_hash': registration.file_hash,
+                'address': registration.uploader_address,
+                'block_number': registration.block_number,
+                'transaction_hash': registration.transaction_hash,
+                'log_index': registration.log_index,
+                'timestamp': registration.block_timestamp.isoformat(),
+                'details': {'file_name': registration.file_name}
+            })
+    
+    if event_types is None or 'FileVerified' in event_types:
+        verifications = VerificationLog.query.filter(
+            VerificationLog.verification_method == 'blockchain'
+        ).order_by(
+            VerificationLog.block_number.desc(), VerificationLog.log_index.desc()
+        ).limit(limit)
+        for verification in verifications:
+            events.append({
+                'event_type': 'file_verified',
+                'file_hash': verification.file_hash,
+                'address': verification.verifier_address,
+                'block_number': verification.block_number,
+                'transaction_hash': verification.transaction_hash,
+                'log_index': verification.log_index,
+                'timestamp': verification.verified_at.isoformat(),
+                'details': {'is_valid': verification.verification_result}
+            })
+    
+    events.sort(key=lambda event: (event['block_number'], event['log_index']), reverse=True)
+    return events[:limit]
+
 @blockchain_bp.route('/events', methods=['GET'])
 @jwt_required()
 def get_contract_events():
-    """Get contract events (file uploads, verifications)."""
+    """Get contract events (file uploads, verifications).
+    
+    Without from_block this returns the latest events already indexed by
+    flask index-chain; with a block range it reads the logs from the node.
+    """
     try:
-        from_block = request.args.get('from_block', 'latest')
+        from_block = request.args.get('from_block')
         to_block = request.args.get('to_block', 'latest')
         event_type = request.args.get('event_type', 'all')
+        limit = max(1, min(request.args.get('limit', 50, type=int), 1000))
         
-        w3 = get_web3_connection()
-        if not w3:
-            return jsonify({'error': 'Blockchain not connected'}), 503
+        event_types = {
+            'all': None,
+            'file_uploaded': ['FileUploaded'],
+            'file_verified': ['FileVerified']
+        }
+        if event_type not in event_types:
+            return jsonify({'error': 'event_type must be all, file_uploaded or file_verified'}), 400
+        
+        if from_block is None:
+            events = indexed_events(event_types[event_type], limit)
+            return jsonify({
+                'events': events,
+                'count': len(events),
+                'from_block': events[-1]['block_number'] if events else None,
+                'to_block': events[0]['block_number'] if events else None
+            }), 200
         
-        # This would require contract ABI and event filtering
-        # For now, return database events that correspond to blockchain events
+        indexer = get_indexer()
+        latest_block = indexer.w3.eth.block_number
+        to_block = latest_block if to_block == 'latest' else int(to_block)
+        from_block = to_block if from_block == 'latest' else int(from_block)
         
-        query = AuditLog.query.filter(
-            AuditLog.action.in_(['file_uploaded', 'file_verified']),
-            AuditLog.resource_type == 'file'
-        ).order_by(AuditLog.timestamp.desc()).limit(50)
+        # Keep eth_getLogs bounded to one indexer page
+        max_range = current_app.config['INDEXER_BATCH_SIZE']
+        from_block = max(from_block, to_block - max_range + 1, 0)
+        
+        logs = indexer.fetch_events(from_block, to_block, event_types[event_type])
+        logs.sort(key=lambda log: (log.blockNumber, log.logIndex), reverse=True)
         
         events = []
-        for log in query:
+        for log in logs[:limit]:
+            if log.event == 'FileUploaded':
+                address = log.args.uploader
+                details = {'file_name': log.args.fileName}
+            else:
+                address = log.args.verifier
+                details = {'is_valid': log.args.isValid}
+            
             events.append({
-                'event_type': log.action,
-                'resource_id': log.resource_id,
-                'user_id': log.user_id,
-                'timestamp': log.timestamp.isoformat(),
-                'details': log.get_details()
+                'event_type': 'file_uploaded' if log.event == 'FileUploaded' else 'file_verified',
+                'file_hash': Web3.to_hex(log.args.fileHash)[2:],
+                'address': address,
+                'block_number': log.blockNumber,
+                'transaction_hash': Web3.to_hex(log.transactionHash),
+                'log_index': log.logIndex,
+                'timestamp': datetime.utcfromtimestamp(log.args.timestamp).isoformat(),
+                'details': details
             })
         
         return jsonify({
             'events': events,
-            'count': len(events)
+            'count': len(events),
+            'from_block': from_block,
+            'to_block': to_block
+        }), 200
+        
+    except CONNECTION_ERRORS:
+        return chain_unavailable()
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@blockchain_bp.route('/files-by-time-range', methods=['GET'])
+@jwt_required()
+def get_files_by_time_range():
+    """Get files registered on-chain between two times (indexed off-chain)."""
+    try:
+        start = request.args.get('start')
+        end = request.args.get('end')
+        uploader = request.args.get('uploader')
+        cursor = request.args.get('cursor')
+        limit = max(1, min(request.args.get('limit', 100, type=int), 1000))
+        
+        if not start or not end:
+            return jsonify({'error': 'start and end are required'}), 400
+        
+        try:
+            start_time = parse_time_param(start)
+            end_time = parse_time_param(end)
+        except (ValueError, OverflowError, OSError):
+            return jsonify({'error': 'start and end must be unix timestamps or ISO-8601 dates'}), 400
+        
+        query = FileRegistration.query.filter(
+            FileRegistration.block_timestamp >= start_time,
+            FileRegistration.block_timestamp <= end_time
+        )
+        
+        if uploader:
+            query = query.filter(FileRegistration.uploader_address == uploader.lower())
+        
+        registrations, next_cursor = keyset_page(
+            query,
+            FileRegistration.block_timestamp,
+            FileRegistration.id,
+            cursor=cursor,
+            limit=limit
+        )
+        
+        return jsonify({
+            'files': [registration.to_dict() for registration in registrations],
+            'count': len(registrations),
+            'next_cursor': next_cursor
         }), 200
         
+    except InvalidCursorError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -1,11 +1,25 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from werkzeug.utils import secure_filename
-from models import db, FileRecord, User, VerificationLog, AuditLog
+from werkzeug.exceptions import RequestEntityTooLarge
+from models import db, FileRecord, User, VerificationLog
 import os
+import re
+import json
 import hashlib
-import ipfshttpclient
+from services.ipfs import get_ipfs_pool
+from services.stats import record_file_added, record_file_removed, get_user_counters
+from services.trends import record_upload_trend
+from services.pagination import paginate_request, ranked_page, omitted_fields, InvalidCursorError
+from services.search import search_file_records
+from services.verify_cache import get_verify_cache
+from services.verifications import log_verification, log_verifications, verification_row
+from services.audit import log_audit
+from services.serializers import FILE_SCHEMA, InvalidFieldsError, json_response
+from services.etags import conditional_get
 from datetime import datetime
+from itertools import islice
+from sqlalchemy.orm import defer
 import mimetypes
 
 files_bp = Blueprint('files', __name__)
@@ -23,41 +37,55 @@ def calculate_file_hash(file_data):
     """Calculate SHA-256 hash of file data."""
     return hashlib.sha256(file_data).hexdigest()
 
-def upload_to_ipfs(file_data, filename):
-    """Upload file to IPFS and return hash."""
+FILE_HASH_PATTERN = re.compile(r'^[0-9a-fA-F]{64}$')
+
+def clean_file_hash(file_hash):
+    """Strip a '0x' prefix; returns None unless what is left is a SHA-256 hex digest."""
+    file_hash = file_hash.strip()
+    clean_hash = file_hash[2:] if file_hash.startswith('0x') else file_hash
+    return clean_hash if FILE_HASH_PATTERN.match(clean_hash) else None
+
+class FileTooLargeError(Exception):
+    """Raised when a streamed upload exceeds MAX_CONTENT_LENGTH."""
+
+class HashingStream:
+    """Read-only file wrapper that hashes and counts bytes as they are read."""
+    
+    def __init__(self, stream, max_size=None):
+        self.stream = stream
+        self.max_size = max_size
+        self.size = 0
+        self._sha256 = hashlib.sha256()
+    
+    def read(self, size=-1):
+        """Read a chunk from the wrapped stream and feed it to the digest."""
+        chunk = self.stream.read(size)
+        self.size += len(chunk)
+        if self.max_size is not None and self.size > self.max_size:
+            raise FileTooLargeError('File too large')
+        self._sha256.update(chunk)
+        return chunk
+    
+    def hexdigest(self):
+        """Get SHA-256 hex digest of everything read so far."""
+        return self._sha256.hexdigest()
+
+def upload_to_ipfs(file_stream, filename):
+    """Stream a file-like object to IPFS and return hash."""
     try:
-        # Connect to IPFS
-        client = ipfshttpclient.connect(
-            host=current_app.config['IPFS_API_HOST'],
-            port=current_app.config['IPFS_API_PORT']
-        )
+        # Borrow a pooled keep-alive client and upload file
+        # (the client pulls the stream chunk by chunk)
+        with get_ipfs_pool().client() as client:
+            result = client.add(file_stream)
+        return result['Hash']
         
-        # Upload file
-        result = client.add_bytes(file_data)
-        return result
+    except FileTooLargeError:
+        raise
         
     except Exception as e:
         print(f"IPFS upload error: {e}")
         raise Exception(f"Failed to upload to IPFS: {str(e)}")
 
-def log_audit(action, user_id=None, resource_id=None, details=None):
-    """Log audit trail."""
-    try:
-        audit_log = AuditLog(
-            action=action,
-            resource_type='file',
-            resource_id=resource_id,
-            user_id=user_id,
-            ip_address=request.remote_addr,
-            user_agent=request.headers.get('User-Agent')
-        )
-        if details:
-            audit_log.set_details(details)
-        db.session.add(audit_log)
-        db.session.commit()
-    except Exception as e:
-        print(f"Audit log error: {e}")
-
 @files_bp.route('/upload-ipfs', methods=['POST'])
 @jwt_required()
 def upload_file_to_ipfs():
@@ -65,38 +93,40 @@ def upload_file_to_ipfs():
     try:
         current_user_id = get_jwt_identity()
         
-        if 'file' not in request.files:
-            return jsonify({'error': 'No file provided'}), 400
-        
-        file = request.files['file']
-        if file.filename == '':
+        # Raw bodies are streamed straight from the socket; multipart
+        # uploads come from werkzeug's disk-spooled temporary file
+        if request.mimetype == 'application/octet-stream':
+            filename = request.headers.get('X-File-Name') or request.args.get('filename', '')
+            source = request.stream
+        else:
+            if 'file' not in request.files:
+                return jsonify({'error': 'No file provided'}), 400
+            
+            file = request.files['file']
+            filename = file.filename
+            source = file.stream
+        
+        if filename == '':
             return jsonify({'error': 'No file selected'}), 400
         
-        if not allowed_file(file.filename):
+        if not allowed_file(filename):
             return jsonify({'error': 'File type not allowed'}), 400
         
-        # Read file data
-        file_data = file.read()
-        file_size = len(file_data)
-        
-        # Check file size
-        if file_size > current_app.config['MAX_CONTENT_LENGTH']:
-            return jsonify({'error': 'File too large'}), 413
-        
-        # Upload to IPFS
-        ipfs_hash = upload_to_ipfs(file_data, file.filename)
-        
-        # Calculate file hash
-        file_hash = calculate_file_hash(file_data)
+        # Hash and size the file while its chunks are forwarded to IPFS
+        file_stream = HashingStream(source, current_app.config['MAX_CONTENT_LENGTH'])
+        ipfs_hash = upload_to_ipfs(file_stream, filename)
         
         return jsonify({
             'message': 'File uploaded to IPFS successfully',
             'ipfsHash': ipfs_hash,
-            'fileHash': file_hash,
-            'fileSize': file_size,
-            'fileName': file.filename
+            'fileHash': file_stream.hexdigest(),
+            'fileSize': file_stream.size,
+            'fileName': filename
         }), 200
         
+    except (FileTooLargeError, RequestEntityTooLarge):
+        # werkzeug refuses a declared Content-Length over the limit; HashingStream catches the rest
+        return jsonify({'error': 'File too large'}), 413
     except Exception as e:
         return jsonify({'error': 'IPFS upload failed', 'details': str(e)}), 500
 
@@ -152,10 +182,13 @@ def upload_file_metadata():
         file_record.set_metadata(metadata)
         
         db.session.add(file_record)
+        record_file_added(file_record)
+        record_upload_trend(file_record)
+        get_verify_cache().file_added(file_record.file_hash)
         db.session.commit()
         
         # Log upload
-        log_audit('file_uploaded', current_user_id, str(file_record.id), {
+        log_audit('file_uploaded', 'file', str(file_record.id), current_user_id, {
             'file_name': data['fileName'],
             'file_hash': data['fileHash'],
             'transaction_hash': data['transactionHash']
@@ -174,111 +207,265 @@ def upload_file_metadata():
 def verify_file_by_hash(file_hash):
     """Verify file by hash."""
     try:
-        # Remove '0x' prefix if present
-        clean_hash = file_hash[2:] if file_hash.startswith('0x') else file_hash
+        # Remove '0x' prefix if present; anything but a SHA-256 digest cannot be registered (or logged)
+        clean_hash = clean_file_hash(file_hash)
+        if clean_hash is None:
+            return jsonify({'error': 'Invalid file hash', 'details': 'Expected 64 hex characters'}), 400
         
-        # Find file record
-        file_record = FileRecord.query.filter_by(file_hash=clean_hash).first()
+        # Find file record: cached details first, then the shared hash filter
+        # answers "definitely not registered" without a database lookup
+        cached = get_verify_cache().lookup(clean_hash)
         
         verification_result = {
-            'exists': bool(file_record),
+            'exists': bool(cached),
             'file_hash': clean_hash,
             'verification_time': datetime.utcnow().isoformat()
         }
         
-        if file_record:
-            verification_result.update({
-                'file_name': file_record.file_name,
-                'file_size': file_record.file_size,
-                'upload_time': file_record.uploaded_at.isoformat() if file_record.uploaded_at else None,
-                'uploader_address': file_record.wallet_address,
-                'transaction_hash': file_record.transaction_hash,
-                'block_number': file_record.block_number,
-                'ipfs_hash': file_record.ipfs_hash
-            })
+        if cached:
+            verification_result.update(cached['details'])
         
-        # Log verification
-        verification_log = VerificationLog(
+        # Log verification (write-behind; persisted in bulk off the request path)
+        log_verification(
             file_hash=clean_hash,
-            verification_result=bool(file_record),
+            verification_result=bool(cached),
             verification_method='api',
             user_id=get_jwt_identity() if request.headers.get('Authorization') else None,
-            file_record_id=file_record.id if file_record else None
+            file_record_id=cached['file_record_id'] if cached else None,
+            blockchain_data=verification_result
         )
-        verification_log.set_blockchain_data(verification_result)
-        
-        db.session.add(verification_log)
-        db.session.commit()
         
         return jsonify(verification_result), 200
         
     except Exception as e:
         return jsonify({'error': 'Verification failed', 'details': str(e)}), 500
 
+def _hash_batch_lines():
+    """Yield hash values from a line-oriented (NDJSON/text) body as it is read from the request stream."""
+    for raw_line in request.stream:
+        line = raw_line.decode('utf-8').strip()
+        if not line:
+            continue
+        # NDJSON lines may be JSON strings or {"hash": ...} objects
+        if line[0] in '"{':
+            value = json.loads(line)
+            line = str(value.get('hash', '')) if isinstance(value, dict) else str(value)
+        yield line.strip()
+
+def iter_hash_batch():
+    """Yield clean hashes from a JSON body ({"hashes": [...]} or a list) or one per line (NDJSON/text).
+    
+    Raises ValueError at the first malformed line or invalid hash.
+    """
+    if request.is_json:
+        data = request.get_json(silent=True)
+        if data is None:
+            raise ValueError('Malformed JSON body')
+        hashes = data.get('hashes') if isinstance(data, dict) else data
+        if not isinstance(hashes, list):
+            raise ValueError('Expected a list of hashes')
+        values = (str(file_hash).strip() for file_hash in hashes)
+    else:
+        values = _hash_batch_lines()
+    
+    # Only SHA-256 digests can be registered, and only they fit the verification log
+    for file_hash in values:
+        clean_hash = clean_file_hash(file_hash)
+        if clean_hash is None:
+            raise ValueError(f"Invalid hash (expected 64 hex characters): {file_hash[:80]!r}")
+        yield clean_hash
+
+def verify_hash_chunks(chunks, user_id):
+    """Resolve chunks of clean hashes, logging each chunk; yields verification results in order."""
+    cache = get_verify_cache()
+    for chunk in chunks:
+        found = cache.lookup_many(set(chunk))
+        verification_time = datetime.utcnow().isoformat()
+        log_rows = []
+        for clean_hash in chunk:
+            cached = found.get(clean_hash)
+            verification_result = {
+                'exists': bool(cached),
+                'file_hash': clean_hash,
+                'verification_time': verification_time
+            }
+            if cached:
+                verification_result.update(cached['details'])
+            
+            log_rows.append(verification_row(
+                file_hash=clean_hash,
+                verification_result=bool(cached),
+                verification_method='api_batch',
+                user_id=user_id,
+                file_record_id=cached['file_record_id'] if cached else None,
+                blockchain_data=verification_result
+            ))
+            yield verification_result
+        
+        # Log the chunk's verifications in bulk (write-behind)
+        log_verifications(log_rows)
+
+@files_bp.route('/verify-batch', methods=['POST'])
+@jwt_required()
+def verify_files_batch():
+    """Verify many file hashes in one request, streaming results as the body is read."""
+    try:
+        current_user_id = get_jwt_identity()
+        max_hashes = current_app.config['VERIFY_BATCH_MAX_HASHES']
+        chunk_size = current_app.config['VERIFY_BATCH_CHUNK_SIZE']
+        hashes = iter_hash_batch()
+        
+        # The first chunk is read up front so an obviously bad batch still gets a plain error status
+        try:
+            first_chunk = list(islice(hashes, min(chunk_size, max_hashes + 1)))
+        except ValueError as e:
+            return jsonify({'error': 'Invalid hash batch', 'details': str(e)}), 400
+        if len(first_chunk) > max_hashes:
+            return jsonify({'error': f'At most {max_hashes} hashes per batch'}), 413
+        
+        def chunks():
+            chunk, total = first_chunk, 0
+            while chunk:
+                total += len(chunk)
+                if total > max_hashes:
+                    raise ValueError(f'At most {max_hashes} hashes per batch')
+                yield chunk
+                chunk = list(islice(hashes, chunk_size))
+        
+        # Stream results back: NDJSON for line-oriented clients, one JSON document otherwise
+        ndjson = 'application/x-ndjson' in (request.mimetype, request.accept_mimetypes.best)
+        
+        def generate():
+            count = found_count = 0
+            error = None
+            if not ndjson:
+                yield '{"results":['
+            try:
+                for result in verify_hash_chunks(chunks(), current_user_id):
+                    if ndjson:
+                        yield json.dumps(result) + '\n'
+                    else:
+                        yield (',' if count else '') + json.dumps(result)
+                    count += 1
+                    found_count += result['exists']
+            except ValueError as e:
+                error = {'error': 'Invalid hash batch', 'details': str(e)}
+            except Exception as e:
+                print(f"Batch verification error: {e}")
+                error = {'error': 'Batch verification failed', 'details': str(e)}
+            
+            # The status is already sent, so a failure part way through ends the stream with an error record
+            if ndjson:
+                if error:
+                    yield json.dumps(error) + '\n'
+                return
+            trailer = f'],"count":{count},"found":{found_count}'
+            if error:
+                trailer += ',' + json.dumps(error)[1:-1]
+            yield trailer + '}'
+        
+        mimetype = 'application/x-ndjson' if ndjson else 'application/json'
+        return Response(stream_with_context(generate()), mimetype=mimetype), 200
+        
+    except Exception as e:
+        return jsonify({'error': 'Batch verification failed', 'details': str(e)}), 500
+
 @files_bp.route('/my-files', methods=['GET'])
 @jwt_required()
+@conditional_get('user')
 def get_user_files():
     """Get files uploaded by current user."""
     try:
         current_user_id = get_jwt_identity()
         
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 20, type=int)
         status = request.args.get('status')
+        fields = FILE_SCHEMA.select()
         
         query = FileRecord.query.filter_by(user_id=current_user_id)
         
         if status:
             query = query.filter_by(upload_status=status)
         
-        files = query.order_by(FileRecord.created_at.desc()).paginate(
-            page=page,
-            per_page=per_page,
-            error_out=False
+        # Newest first, keyset-paginated on (created_at, id); only the requested columns are fetched
+        files, page_fields = paginate_request(
+            FILE_SCHEMA.project(query, fields),
+            FileRecord.created_at,
+            FileRecord.id,
+            count_key=f'my-files:{current_user_id}:{status}'
         )
         
-        return jsonify({
-            'files': [file.to_dict() for file in files.items],
-            'total': files.total,
-            'pages': files.pages,
-            'current_page': page,
-            'per_page': per_page
-        }), 200
+        return json_response({
+            'files': FILE_SCHEMA.encode(files, fields),
+            **page_fields
+        })
         
+    except (InvalidCursorError, InvalidFieldsError) as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': 'Failed to get user files', 'details': str(e)}), 500
 
+@files_bp.route('/inventory', methods=['GET'])
+@jwt_required()
+def stream_file_inventory():
+    """Stream a whole file inventory as NDJSON, one file per line."""
+    try:
+        current_user_id = get_jwt_identity()
+        user = User.query.get(current_user_id)
+        
+        wallet = request.args.get('wallet')
+        status = request.args.get('status')
+        fields = FILE_SCHEMA.select()
+        
+        # Admins may read another user's inventory, or a wallet's across all users
+        owner = int(current_user_id)
+        if user and user.is_admin:
+            owner = request.args.get('user_id', type=int) or (None if wallet else owner)
+        
+        query = FileRecord.query
+        if owner is not None:
+            query = query.filter_by(user_id=owner)
+        if wallet:
+            query = query.filter_by(wallet_address=wallet)
+        if status:
+            query = query.filter_by(upload_status=status)
+        
+        # A server-side cursor on PostgreSQL (fetchmany elsewhere) keeps one batch in memory at a time
+        rows = FILE_SCHEMA.project(query, fields).order_by(FileRecord.id).yield_per(
+            current_app.config['INVENTORY_STREAM_BATCH_SIZE']
+        )
+        
+        def generate():
+            try:
+                for line in FILE_SCHEMA.iter_encoded(rows, fields):
+                    yield line + '\n'
+            except Exception as e:
+                # Headers are already sent; end the stream with an error line instead
+                print(f"Inventory stream error: {e}")
+                yield json.dumps({'error': 'Inventory stream failed', 'details': str(e)}) + '\n'
+        
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson'), 200
+        
+    except InvalidFieldsError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': 'Failed to stream inventory', 'details': str(e)}), 500
+
 @files_bp.route('/stats', methods=['GET'])
 @jwt_required()
+@conditional_get('user')
 def get_file_stats():
     """Get file statistics for current user."""
     try:
         current_user_id = get_jwt_identity()
         
-        # Get user file counts
-        total_files = FileRecord.query.filter_by(user_id=current_user_id).count()
-        uploaded_files = FileRecord.query.filter_by(
-            user_id=current_user_id, 
-            upload_status='uploaded'
-        ).count()
-        
-        # Get total file size
-        total_size_result = db.session.query(
-            db.func.sum(FileRecord.file_size)
-        ).filter_by(user_id=current_user_id).scalar()
-        total_size = total_size_result or 0
+        # Counters come from the per-user stats row kept current on writes
+        stats = get_user_counters(current_user_id)
         
         # Get recent files
         recent_files = FileRecord.query.filter_by(
             user_id=current_user_id
         ).order_by(FileRecord.created_at.desc()).limit(5).all()
         
-        # Get verification count
-        verified_count = VerificationLog.query.filter_by(
-            user_id=current_user_id,
-            verification_result=True
-        ).count()
-        
         # Format recent activity
         recent_activity = []
         for file in recent_files:
@@ -290,9 +477,9 @@ def get_file_stats():
             })
         
         return jsonify({
-            'userFiles': total_files,
-            'verifiedFiles': verified_count,
-            'totalSize': total_size,
+            'userFiles': stats.total_files,
+            'verifiedFiles': stats.successful_verifications,
+            'totalSize': stats.total_size,
             'recentActivity': recent_activity
         }), 200
         
@@ -309,18 +496,15 @@ def search_files():
         query_param = request.args.get('q', '').strip()
         file_type = request.args.get('type')
         status = request.args.get('status')
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 20, type=int)
+        sort = request.args.get('sort', 'recent')  # recent or relevance
+        fields = FILE_SCHEMA.select()
         
         query = FileRecord.query.filter_by(user_id=current_user_id)
         
+        # Indexed name search (trigram/FTS5) plus hash prefix ranges
+        rank = None
         if query_param:
-            query = query.filter(
-                db.or_(
-                    FileRecord.file_name.ilike(f'%{query_param}%'),
-                    FileRecord.file_hash.ilike(f'%{query_param}%')
-                )
-            )
+            query, rank = search_file_records(query, query_param)
         
         if file_type:
             query = query.filter(FileRecord.file_type.ilike(f'%{file_type}%'))
@@ -328,21 +512,25 @@ def search_files():
         if status:
             query = query.filter_by(upload_status=status)
         
-        files = query.order_by(FileRecord.created_at.desc()).paginate(
-            page=page,
-            per_page=per_page,
-            error_out=False
-        )
+        query = FILE_SCHEMA.project(query, fields)
+        if sort == 'relevance' and rank is not None:
+            files, page_fields = ranked_page(query, rank, FileRecord.id)
+        else:
+            files, page_fields = paginate_request(
+                query,
+                FileRecord.created_at,
+                FileRecord.id,
+                count_key=f'search:{current_user_id}:{query_param}:{file_type}:{status}'
+            )
         
-        return jsonify({
-            'files': [file.to_dict() for file in files.items],
-            'total': files.total,
-            'pages': files.pages,
-            'current_page': page,
-            'per_page': per_page,
+        return json_response({
+            'files': FILE_SCHEMA.encode(files, fields),
+            **page_fields,
             'query': query_param
-        }), 200
+        })
         
+    except (InvalidCursorError, InvalidFieldsError) as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': 'Search failed', 'details': str(e)}), 500
 
@@ -362,13 +550,15 @@ def get_file_details(file_id):
             return jsonify({'error': 'File not found'}), 404
         
         # Get verification logs for this file
-        verifications = VerificationLog.query.filter_by(
-            file_record_id=file_id
-        ).order_by(VerificationLog.verified_at.desc()).limit(10).all()
+        include_blockchain_data = 'blockchain_data' not in omitted_fields()
+        verifications = VerificationLog.query.filter_by(file_record_id=file_id)
+        if not include_blockchain_data:
+            verifications = verifications.options(defer(VerificationLog.blockchain_data))
+        verifications = verifications.order_by(VerificationLog.verified_at.desc()).limit(10).all()
         
         return jsonify({
             'file': file_record.to_dict(),
-            'verifications': [v.to_dict() for v in verifications]
+            'verifications': [v.to_dict(include_blockchain_data=include_blockchain_data) for v in verifications]
         }), 200
         
     except Exception as e:
@@ -390,13 +580,17 @@ def delete_file_record(file_id):
             return jsonify({'error': 'File not found'}), 404
         
         # Log deletion
-        log_audit('file_deleted', current_user_id, str(file_id), {
+        log_audit('file_deleted', 'file', str(file_id), current_user_id, {
             'file_name': file_record.file_name,
             'file_hash': file_record.file_hash
         })
         
+        record_file_removed(file_record)
+        record_upload_trend(file_record, sign=-1)
+        file_hash = file_record.file_hash
         db.session.delete(file_record)
         db.session.commit()
+        get_verify_cache().file_removed(file_hash)
         
         return jsonify({
             'message': 'File record deleted successfully'
@@ -0,0 +1,281 @@
+import io
+import os
+import csv
+import json
+import glob
+import fcntl
+import uuid
+import threading
+from datetime import datetime
+from flask import current_app, request, has_request_context
+from models import db, AuditLog
+from services.write_behind import WriteBehindQueue, drop_rows
+from services.audit_partitions import ensure_audit_partitions, forget_audit_partitions
+
+AUDIT_COLUMNS = ('action', 'resource_type', 'resource_id', 'user_id', 'ip_address', 'user_agent',
+                 'details', 'timestamp')
+
+_writer = None
+_writer_lock = threading.Lock()
+
+class AuditSpool:
+    """Append-only local journal of audit entries that have not reached the database yet.
+
+    Every entry is appended to the current segment file before it is queued,
+    and a segment is deleted once all of its entries have been persisted.
+    The segment is rotated on every flush, so a crash replays at most the
+    batches that were in flight (entries are delivered at least once).
+    Segments are named audit-<pid>-<token>-<seq>.jsonl, the token keeping a
+    reused pid from colliding with a dead writer's files, and stay flock'ed
+    by their writer until deleted: one whose lock can be taken was left
+    behind by a dead process and is adopted.
+    Entries the database refuses outright (a deleted user, an oversized
+    field) are moved to rejected.jsonl for inspection instead of being
+    replayed forever.
+    """
+
+    def __init__(self, directory, fsync=False):
+        self.directory = directory
+        self.fsync = fsync
+        self.pid = os.getpid()
+        self.token = uuid.uuid4().hex[:8]
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._file = None
+        self._segment = None
+        self._pending = {}
+        # Open (and locked) handle of every segment not deleted yet
+        self._handles = {}
+
+    def _open_segment(self):
+        """Create the next segment; it only appears under its adoptable name once locked."""
+        self._seq += 1
+        path = os.path.join(self.directory, f"audit-{self.pid}-{self.token}-{self._seq}.jsonl")
+        tmp_path = os.path.join(self.directory, f".audit-{self.pid}-{self.token}-{self._seq}.tmp")
+        handle = open(tmp_path, 'a', encoding='utf-8')
+        fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+        os.rename(tmp_path, path)
+        self._handles[path] = handle
+        return path, handle
+
+    def append(self, row):
+        """Journal a row; returns the segment that must be released once it is persisted."""
+        line = json.dumps(row, default=str) + '\n'
+        with self._lock:
+            if self._file is None:
+                self._segment, self._file = self._open_segment()
+            self._file.write(line)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            self._pending[self._segment] = self._pending.get(self._segment, 0) + 1
+            return self._segment
+
+    def rotate(self):
+        """Start a new segment for entries appended from now on."""
+        with self._lock:
+            if self._file is not None:
+                # The handle stays open (and locked) until the segment is deleted
+                self._file = None
+                segment, self._segment = self._segment, None
+                self._delete_if_done(segment)
+
+    def release(self, segments):
+        """Mark entries as persisted and delete closed segments with nothing left pending."""
+        with self._lock:
+            for segment in segments:
+                if segment in self._pending:
+                    self._pending[segment] -= 1
+                    self._delete_if_done(segment)
+
+    def _delete_if_done(self, segment):
+        if segment != self._segment and self._pending.get(segment, 0) <= 0:
+            self._pending.pop(segment, None)
+            try:
+                os.remove(segment)
+            except FileNotFoundError:
+                pass
+            handle = self._handles.pop(segment, None)
+            if handle is not None:
+                handle.close()
+
+    def dead_letter(self, rows, error):
+        """Move rows the database refused to the rejected file, then release them."""
+        lines = ''.join(
+            json.dumps({'error': str(error), 'row': row}, default=str) + '\n'
+            for row in rows
+        )
+        with self._lock:
+            with open(os.path.join(self.directory, 'rejected.jsonl'), 'a', encoding='utf-8') as rejected:
+                rejected.write(lines)
+                rejected.flush()
+                if self.fsync:
+                    os.fsync(rejected.fileno())
+
+    def adopt_orphans(self):
+        """Claim segments no live writer holds; returns [(segment, row)] to persist again."""
+        entries = []
+        for path in sorted(glob.glob(os.path.join(self.directory, 'audit-*-*.jsonl'))):
+            if path in self._handles:
+                continue
+            try:
+                handle = open(path, 'r', encoding='utf-8')
+            except FileNotFoundError:
+                continue
+            try:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                # Another writer may have adopted and deleted it before the lock was ours
+                if os.fstat(handle.fileno()).st_ino != os.stat(path).st_ino:
+                    raise FileNotFoundError(path)
+            except (BlockingIOError, FileNotFoundError):
+                handle.close()
+                continue
+
+            rows = []
+            for line in handle:
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    # torn final line from the crash
+                    continue
+                row['timestamp'] = datetime.fromisoformat(row['timestamp'])
+                rows.append(row)
+
+            with self._lock:
+                self._handles[path] = handle
+                self._pending[path] = len(rows)
+                self._delete_if_done(path)
+            entries.extend((path, row) for row in rows)
+        return entries
+
+def _copy_audit_logs(connection, rows):
+    """Stream rows into audit_logs with COPY (PostgreSQL)."""
+    buffer = io.StringIO()
+    # None is written as an unquoted empty field, which COPY's CSV format reads as NULL
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([
+            row['action'], row['resource_type'], row['resource_id'], row['user_id'], row['ip_address'],
+            row['user_agent'], json.dumps(row['details']) if row['details'] else None,
+            row['timestamp'].isoformat()
+        ])
+    buffer.seek(0)
+
+    cursor = connection.connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {AuditLog.__tablename__} ({', '.join(AUDIT_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+            buffer
+        )
+    finally:
+        cursor.close()
+
+def persist_audit_logs(rows):
+    """Bulk-insert audit rows in one transaction on a connection of their own.
+
+    The caller's session is left alone, so a synchronous write neither
+    commits nor rolls back whatever the request has pending.
+    """
+    try:
+        ensure_audit_partitions(row['timestamp'] for row in rows)
+        with db.engine.begin() as connection:
+            if connection.dialect.name == 'postgresql':
+                _copy_audit_logs(connection, rows)
+            else:
+                connection.execute(AuditLog.__table__.insert(), rows)
+    except Exception:
+        # A retention run may have dropped a partition this worker thought existed
+        forget_audit_partitions()
+        raise
+
+def _entry_persister(spool):
+    """Persist queued (segment, row) entries, then release them from the spool."""
+    def persist(entries):
+        if spool:
+            spool.rotate()
+        persist_audit_logs([row for _, row in entries])
+        if spool:
+            spool.release(segment for segment, _ in entries)
+    return persist
+
+def _entry_rejecter(spool):
+    """Dead-letter (segment, row) entries the database refused, so the rest keep flowing."""
+    drop = drop_rows('audit-log-writer')
+
+    def reject(entries, error):
+        rows = [row for _, row in entries]
+        if not spool:
+            drop(rows, error)
+            return
+        spool.dead_letter(rows, error)
+        print(f"audit-log-writer moved {len(rows)} rows to {spool.directory}/rejected.jsonl: {error}")
+        spool.release(segment for segment, _ in entries)
+    return reject
+
+def get_audit_writer():
+    """Get the audit log queue for this worker process, replaying any orphaned spool first."""
+    global _writer
+
+    if _writer is None or _writer.pid != os.getpid():
+        with _writer_lock:
+            if _writer is None or _writer.pid != os.getpid():
+                config = current_app.config
+                spool = None
+                if config['AUDIT_LOG_SPOOL_DIR']:
+                    spool = AuditSpool(config['AUDIT_LOG_SPOOL_DIR'], fsync=config['AUDIT_LOG_SPOOL_FSYNC'])
+
+                writer = WriteBehindQueue(
+                    current_app._get_current_object(),
+                    _entry_persister(spool),
+                    max_batch=config['AUDIT_LOG_BATCH_SIZE'],
+                    flush_interval=config['AUDIT_LOG_FLUSH_INTERVAL'],
+                    max_queue=config['AUDIT_LOG_QUEUE_SIZE'],
+                    name='audit-log-writer',
+                    reject=_entry_rejecter(spool)
+                )
+                writer.spool = spool
+                if spool:
+                    for entry in spool.adopt_orphans():
+                        writer.submit(entry)
+                _writer = writer
+
+    return _writer
+
+def audit_row(action, resource_type, resource_id=None, user_id=None, details=None):
+    """Build an audit row stamped with the current request's client address and agent."""
+    ip_address = user_agent = None
+    if has_request_context():
+        ip_address = request.remote_addr
+        user_agent = request.headers.get('User-Agent')
+
+    return {
+        'action': action,
+        'resource_type': resource_type,
+        'resource_id': str(resource_id) if resource_id is not None else None,
+        'user_id': int(user_id) if user_id is not None else None,
+        'ip_address': ip_address,
+        'user_agent': user_agent[:255] if user_agent else None,
+        'details': details or None,
+        'timestamp': datetime.utcnow()
+    }
+
+def log_audit(action, resource_type, resource_id=None, user_id=None, details=None):
+    """Record an audit trail entry without waiting for the database.
+
+    Entries are spooled to AUDIT_LOG_SPOOL_DIR and bulk-written within
+    AUDIT_LOG_FLUSH_INTERVAL seconds; with AUDIT_LOG_WRITE_BEHIND=false
+    they are written before returning. Failures are logged, never raised.
+    """
+    try:
+        row = audit_row(action, resource_type, resource_id, user_id, details)
+        if not current_app.config['AUDIT_LOG_WRITE_BEHIND']:
+            persist_audit_logs([row])
+            return
+
+        writer = get_audit_writer()
+        segment = writer.spool.append(row) if writer.spool else None
+        writer.submit((segment, row))
+    except Exception as e:
+        print(f"Audit log error: {e}")
@@ -0,0 +1,269 @@
+import os
+import csv
+import glob
+import gzip
+import json
+import time
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import event, text, func
+from models import db, AuditLog, AUDIT_LOG_ID_SEQUENCE
+
+AUDIT_TABLE = AuditLog.__tablename__
+ARCHIVE_COLUMNS = ('id', 'action', 'resource_type', 'resource_id', 'user_id', 'ip_address', 'user_agent',
+                   'details', 'timestamp')
+
+# Months this process has already created partitions for (None: table not partitioned)
+_known_months = set()
+_partitioned = None
+_known_lock = threading.Lock()
+
+def month_start(timestamp):
+    """Truncate a timestamp to the first day of its month."""
+    return timestamp.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+def add_months(month, count):
+    """Shift a month start by count months."""
+    index = month.year * 12 + month.month - 1 + count
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+def months_between(first, last):
+    """Month starts from first through last inclusive."""
+    months = []
+    month = month_start(first)
+    while month <= last:
+        months.append(month)
+        month = add_months(month, 1)
+    return months
+
+def partition_name(month):
+    return f"{AUDIT_TABLE}_p{month:%Y%m}"
+
+def is_partitioned(connection):
+    """Whether audit_logs is a partitioned table (PostgreSQL)."""
+    if connection.dialect.name != 'postgresql':
+        return False
+    return connection.execute(
+        text("SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:name))"),
+        {'name': AUDIT_TABLE}
+    ).scalar()
+
+def create_partitions(connection, months):
+    """Create the monthly partitions that do not exist yet."""
+    for month in months:
+        connection.exec_driver_sql(
+            f"CREATE TABLE IF NOT EXISTS {partition_name(month)} PARTITION OF {AUDIT_TABLE} "
+            f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{add_months(month, 1):%Y-%m-%d}')"
+        )
+
+@event.listens_for(AuditLog.__table__, 'after_create')
+def _create_initial_partitions(target, connection, **kwargs):
+    if connection.dialect.name == 'postgresql':
+        # Rows written with COPY leave out the id, so the sequence is also the column's server default
+        connection.exec_driver_sql(
+            f"ALTER TABLE {AUDIT_TABLE} ALTER COLUMN id SET DEFAULT nextval('{AUDIT_LOG_ID_SEQUENCE.name}')"
+        )
+        connection.exec_driver_sql(f"ALTER SEQUENCE {AUDIT_LOG_ID_SEQUENCE.name} OWNED BY {AUDIT_TABLE}.id")
+        current = month_start(datetime.utcnow())
+        create_partitions(connection, months_between(
+            current, add_months(current, current_app.config['AUDIT_PARTITION_PREMAKE_MONTHS'])
+        ))
+
+def ensure_audit_partitions(timestamps):
+    """Make sure every month in timestamps has a partition before rows are written to it."""
+    global _partitioned
+
+    months = {month_start(timestamp) for timestamp in timestamps} - _known_months
+    if not months:
+        return
+
+    with _known_lock:
+        with db.engine.begin() as connection:
+            if _partitioned is None:
+                _partitioned = is_partitioned(connection)
+            if _partitioned:
+                create_partitions(connection, sorted(months))
+        _known_months.update(months)
+
+def forget_audit_partitions():
+    """Drop the cached partition state (after a failed write or a retention run)."""
+    global _partitioned
+
+    with _known_lock:
+        _known_months.clear()
+        _partitioned = None
+
+@contextmanager
+def _archive_file(archive_dir, month):
+    """Open a gzip CSV archive for a month; it only appears under its final name once complete."""
+    os.makedirs(archive_dir, exist_ok=True)
+    # A month can be archived more than once when late rows recreate its partition
+    path = os.path.join(archive_dir, f"{AUDIT_TABLE}_{month:%Y%m}_{int(time.time() * 1000)}.csv.gz")
+    tmp_path = path + '.tmp'
+    try:
+        with gzip.open(tmp_path, 'wt', newline='', encoding='utf-8') as archive:
+            yield archive
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def _archive_partition(archive_dir, month):
+    """Detach a month's partition, export it with COPY and drop it (PostgreSQL)."""
+    name = partition_name(month)
+    with db.engine.begin() as connection:
+        attached = connection.execute(
+            text("SELECT EXISTS (SELECT 1 FROM pg_inherits WHERE inhrelid = to_regclass(:name))"),
+            {'name': name}
+        ).scalar()
+        if attached:
+            connection.exec_driver_sql(f"ALTER TABLE {AUDIT_TABLE} DETACH PARTITION {name}")
+
+    # Once detached the rows are invisible to queries; a crash here is finished by the next run
+    with db.engine.begin() as connection:
+        cursor = connection.connection.cursor()
+        try:
+            with _archive_file(archive_dir, month) as archive:
+                cursor.copy_expert(
+                    f"COPY (SELECT {', '.join(ARCHIVE_COLUMNS)} FROM {name} ORDER BY id) "
+                    f"TO STDOUT WITH (FORMAT csv, HEADER)",
+                    archive
+                )
+            rows = cursor.rowcount
+        finally:
+            cursor.close()
+        connection.exec_driver_sql(f"DROP TABLE {name}")
+    return rows
+
+def _archive_rows(archive_dir, month):
+    """Export a month of audit rows and delete them (databases without partitions)."""
+    month_filter = db.and_(AuditLog.timestamp >= month, AuditLog.timestamp < add_months(month, 1))
+    query = db.session.query(*[getattr(AuditLog, column) for column in ARCHIVE_COLUMNS]).filter(
+        month_filter
+    ).order_by(AuditLog.id)
+    if query.first() is None:
+        return 0
+
+    rows = 0
+    with _archive_file(archive_dir, month) as archive:
+        writer = csv.writer(archive)
+        writer.writerow(ARCHIVE_COLUMNS)
+        for row in query.yield_per(1000):
+            details = json.dumps(row.details) if row.details else None
+            writer.writerow(row[:-2] + (details, row.timestamp.isoformat(' ')))
+            rows += 1
+
+    AuditLog.query.filter(month_filter).delete(synchronize_session=False)
+    db.session.commit()
+    return rows
+
+def archive_audit_logs(retention_months, archive_dir):
+    """Move months older than the retention window to gzip CSV archives; returns {month: rows}."""
+    cutoff = add_months(month_start(datetime.utcnow()), -retention_months)
+    archived = {}
+
+    with db.engine.connect() as connection:
+        partitioned = is_partitioned(connection)
+        if partitioned:
+            names = connection.execute(
+                text("SELECT tablename FROM pg_tables WHERE tablename LIKE :pattern"),
+                {'pattern': f'{AUDIT_TABLE}_p%'}
+            ).scalars().all()
+
+    if partitioned:
+        for name in sorted(names):
+            try:
+                month = datetime.strptime(name[len(AUDIT_TABLE) + 2:], '%Y%m')
+            except ValueError:
+                continue
+            if month < cutoff:
+                archived[month] = _archive_partition(archive_dir, month)
+    else:
+        first = db.session.query(func.min(AuditLog.timestamp)).scalar()
+        if first is not None and first < cutoff:
+            for month in months_between(first, add_months(cutoff, -1)):
+                rows = _archive_rows(archive_dir, month)
+                if rows:
+                    archived[month] = rows
+
+    forget_audit_partitions()
+    return archived
+
+def maintain_audit_logs(retention_months, premake_months, archive_dir):
+    """Create upcoming partitions and archive expired ones; returns {month: archived rows}."""
+    with db.engine.begin() as connection:
+        if is_partitioned(connection):
+            current = month_start(datetime.utcnow())
+            create_partitions(connection, months_between(current, add_months(current, premake_months)))
+    return archive_audit_logs(retention_months, archive_dir)
+
+def partition_existing_audit_logs():
+    """Rebuild an unpartitioned PostgreSQL audit_logs table as monthly partitions in one transaction.
+
+    Returns the number of rows moved, or None when there was nothing to convert.
+    """
+    legacy = f"{AUDIT_TABLE}_unpartitioned"
+    with db.engine.begin() as connection:
+        if connection.dialect.name != 'postgresql' or is_partitioned(connection):
+            return None
+
+        connection.exec_driver_sql(f"ALTER TABLE {AUDIT_TABLE} RENAME TO {legacy}")
+        connection.exec_driver_sql(f"ALTER TABLE {legacy} RENAME CONSTRAINT {AUDIT_TABLE}_pkey TO {legacy}_pkey")
+        connection.exec_driver_sql(f"ALTER SEQUENCE {AUDIT_LOG_ID_SEQUENCE.name} RENAME TO {legacy}_id_seq")
+        for index in AuditLog.__table__.indexes:
+            connection.exec_driver_sql(f"ALTER INDEX IF EXISTS {index.name} RENAME TO {legacy}_{index.name}")
+
+        AUDIT_LOG_ID_SEQUENCE.create(connection)
+        AuditLog.__table__.create(connection)
+        first = connection.execute(text(f"SELECT min(timestamp) FROM {legacy}")).scalar()
+        if first is not None:
+            create_partitions(connection, months_between(first, month_start(datetime.utcnow())))
+
+        columns = ', '.join(ARCHIVE_COLUMNS[:-1])
+        moved = connection.exec_driver_sql(
+            f"INSERT INTO {AUDIT_TABLE} ({columns}, timestamp) "
+            f"SELECT {columns}, coalesce(timestamp, now() AT TIME ZONE 'utc') FROM {legacy}"
+        ).rowcount
+        connection.exec_driver_sql(
+            f"SELECT setval('{AUDIT_LOG_ID_SEQUENCE.name}', (SELECT coalesce(max(id), 0) + 1 FROM {legacy}), false)"
+        )
+        connection.exec_driver_sql(f"DROP TABLE {legacy}")
+
+    forget_audit_partitions()
+    return moved
+
+def iter_archived_audit_logs(archive_dir, date_from=None, date_to=None, action=None, resource_type=None,
+                             user_id=None):
+    """Yield archived audit logs (as AuditLog.to_dict) matching the filters, oldest month first."""
+    prefix = f"{AUDIT_TABLE}_"
+    for path in sorted(glob.glob(os.path.join(archive_dir, f'{prefix}*.csv.gz'))):
+        month = datetime.strptime(os.path.basename(path)[len(prefix):len(prefix) + 6], '%Y%m')
+        # Skip whole files outside the range, like partition pruning
+        if (date_from and add_months(month, 1) <= date_from) or (date_to and month > date_to):
+            continue
+
+        with gzip.open(path, 'rt', newline='', encoding='utf-8') as archive:
+            for row in csv.DictReader(archive):
+                row = {column: value or None for column, value in row.items()}
+                timestamp = datetime.fromisoformat(row['timestamp'])
+                if (date_from and timestamp < date_from) or (date_to and timestamp > date_to):
+                    continue
+                if (action and row['action'] != action) or (resource_type and row['resource_type'] != resource_type):
+                    continue
+                if user_id is not None and row['user_id'] != str(user_id):
+                    continue
+
+                yield {
+                    'id': int(row['id']),
+                    'action': row['action'],
+                    'resource_type': row['resource_type'],
+                    'resource_id': row['resource_id'],
+                    'user_id': int(row['user_id']) if row['user_id'] else None,
+                    'ip_address': row['ip_address'],
+                    'user_agent': row['user_agent'],
+                    'details': json.loads(row['details']) if row['details'] else {},
+                    'timestamp': timestamp.isoformat()
+                }
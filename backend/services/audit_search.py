@@ -0,0 +1,111 @@
+import re
+from sqlalchemy import event, text, String, cast, Integer
+from models import db, AuditLog
+from services.json_columns import convert_json_columns
+
+# Detail fields looked up by exact value through the JSON index
+KEY_FIELDS = ('file_hash', 'email', 'transaction_hash')
+EMAIL_PATTERN = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+HASH_PATTERN = re.compile(r'^(0x)?[0-9a-fA-F]{40,64}$')
+
+AUDIT_SEARCH_INDEX_DDL = {
+    'postgresql': [
+        "CREATE INDEX IF NOT EXISTS idx_audit_details_gin ON audit_logs USING gin (details jsonb_path_ops)",
+        "CREATE INDEX IF NOT EXISTS idx_audit_fulltext ON audit_logs USING gin (("
+        "to_tsvector('simple', action || ' ' || coalesce(resource_id, '')) || "
+        "jsonb_to_tsvector('simple', coalesce(details, '{}'), '[\"string\"]')))"
+    ],
+    'sqlite': [
+        *(
+            f"CREATE INDEX IF NOT EXISTS idx_audit_{field} ON audit_logs (json_extract(details, '$.{field}'))"
+            for field in KEY_FIELDS
+        ),
+        "CREATE VIRTUAL TABLE IF NOT EXISTS audit_logs_fts USING fts5("
+        "action, resource_id, details, content='audit_logs', content_rowid='id')",
+        "CREATE TRIGGER IF NOT EXISTS audit_logs_fts_insert AFTER INSERT ON audit_logs BEGIN "
+        "INSERT INTO audit_logs_fts(rowid, action, resource_id, details) "
+        "VALUES (new.id, new.action, new.resource_id, new.details); END",
+        "CREATE TRIGGER IF NOT EXISTS audit_logs_fts_delete AFTER DELETE ON audit_logs BEGIN "
+        "INSERT INTO audit_logs_fts(audit_logs_fts, rowid, action, resource_id, details) "
+        "VALUES ('delete', old.id, old.action, old.resource_id, old.details); END"
+    ]
+}
+
+# Matches the expression of idx_audit_fulltext exactly so the planner can use it
+PG_DOCUMENT = (
+    "to_tsvector('simple', audit_logs.action || ' ' || coalesce(audit_logs.resource_id, '')) || "
+    "jsonb_to_tsvector('simple', coalesce(audit_logs.details, '{}'), '[\"string\"]')"
+)
+
+def create_audit_search_index(connection):
+    """Create the dialect's audit details indexes if they do not exist yet."""
+    for statement in AUDIT_SEARCH_INDEX_DDL.get(connection.dialect.name, []):
+        connection.exec_driver_sql(statement)
+
+def rebuild_audit_search_index():
+    """Convert legacy JSON text columns to JSONB, create the indexes and (re)fill the SQLite FTS table."""
+    with db.engine.begin() as connection:
+        convert_json_columns(connection)
+        create_audit_search_index(connection)
+        if connection.dialect.name == 'sqlite':
+            connection.exec_driver_sql("INSERT INTO audit_logs_fts(audit_logs_fts) VALUES ('rebuild')")
+    return db.engine.dialect.name
+
+@event.listens_for(AuditLog.__table__, 'after_create')
+def _create_audit_search_index(target, connection, **kwargs):
+    create_audit_search_index(connection)
+
+def _key_values(value):
+    """Spellings a hash may have been stored under."""
+    if not HASH_PATTERN.match(value):
+        return [value]
+    digits = value[2:] if value.lower().startswith('0x') else value
+    return sorted({value, digits, digits.lower(), '0x' + digits, '0x' + digits.lower()})
+
+def _key_match(dialect, fields, values):
+    """Exact match on detail fields, served by the JSON index."""
+    if dialect == 'postgresql':
+        # details @> '{"field": "value"}' uses the jsonb_path_ops GIN index
+        return db.or_(*(
+            AuditLog.details.op('@>')(cast({field: value}, AuditLog.details.type))
+            for field in fields for value in values
+        ))
+    if dialect == 'sqlite':
+        return db.or_(*(
+            db.func.json_extract(AuditLog.details, f'$.{field}').in_(values) for field in fields
+        ))
+    return None
+
+def search_audit_logs(query, value):
+    """Narrow an AuditLog query to entries whose action, resource or details match value.
+
+    Emails and hashes are also matched exactly against the indexed detail
+    fields; everything else goes through the full-text index (whole words).
+    """
+    dialect = db.session.get_bind().dialect.name
+    value = value.strip()
+
+    if EMAIL_PATTERN.match(value):
+        key_match = _key_match(dialect, ('email',), [value, value.lower()])
+    elif HASH_PATTERN.match(value):
+        key_match = _key_match(dialect, ('file_hash', 'transaction_hash'), _key_values(value))
+    else:
+        key_match = None
+
+    if dialect == 'postgresql':
+        text_match = text(f"({PG_DOCUMENT}) @@ websearch_to_tsquery('simple', :audit_search)").bindparams(
+            audit_search=value
+        )
+    elif dialect == 'sqlite':
+        fts = text(
+            "SELECT rowid AS id FROM audit_logs_fts WHERE audit_logs_fts MATCH :phrase"
+        ).bindparams(phrase='"' + value.replace('"', '""') + '"').columns(id=Integer)
+        text_match = AuditLog.id.in_(fts)
+    else:
+        text_match = db.or_(
+            AuditLog.action.ilike(f'%{value}%'),
+            AuditLog.resource_id.ilike(f'%{value}%'),
+            cast(AuditLog.details, String).ilike(f'%{value}%')
+        )
+
+    return query.filter(db.or_(key_match, text_match) if key_match is not None else text_match)
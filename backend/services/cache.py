@@ -0,0 +1,167 @@
+import os
+import json
+import time
+import uuid
+import threading
+from flask import current_app
+
+try:
+    import redis
+except ImportError:  # Redis is optional; fall back to the in-process cache
+    redis = None
+
+_cache = None
+_cache_lock = threading.Lock()
+
+class MemoryCache:
+    """In-process TTL cache with per-key single-flight loading."""
+
+    def __init__(self, max_entries=10000, lock_stripes=64):
+        self.max_entries = max_entries
+        self.pid = os.getpid()
+        self._data = {}
+        self._locks = [threading.Lock() for _ in range(lock_stripes)]
+
+    def _lock_for(self, key):
+        return self._locks[hash(key) % len(self._locks)]
+
+    def get(self, key):
+        """Get a cached value, or None if missing or expired."""
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if time.monotonic() >= expires_at:
+            self._data.pop(key, None)
+            return None
+        return value
+
+    def set(self, key, value, ttl):
+        """Store a value for ttl seconds."""
+        if len(self._data) >= self.max_entries:
+            self._prune()
+        self._data[key] = (time.monotonic() + ttl, value)
+
+    def delete(self, key):
+        """Remove a cached value."""
+        self._data.pop(key, None)
+
+    def _prune(self):
+        """Drop expired entries, then the oldest ones if still over capacity."""
+        now = time.monotonic()
+        for key, (expires_at, _) in list(self._data.items()):
+            if expires_at <= now:
+                self._data.pop(key, None)
+        overflow = len(self._data) - self.max_entries + 1
+        if overflow > 0:
+            for key in list(self._data)[:overflow]:
+                self._data.pop(key, None)
+
+    def _fill(self, key, ttl, compute):
+        value = compute()
+        self.set(key, value, ttl)
+        return value
+
+    def get_or_set(self, key, ttl, compute):
+        """Get a cached value, running compute() once for all concurrent misses."""
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        with self._lock_for(key):
+            # Another caller may have filled the key while we waited
+            value = self.get(key)
+            if value is None:
+                value = self._fill(key, ttl, compute)
+            return value
+
+# Delete a fill lock only if it still holds our token (it may have expired and been taken over)
+RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+class RedisCache(MemoryCache):
+    """Redis-backed TTL cache shared by every gunicorn worker."""
+
+    def __init__(self, client, lock_timeout=5):
+        super().__init__()
+        self.client = client
+        self.lock_timeout = lock_timeout
+        self._release_lock = client.register_script(RELEASE_LOCK_SCRIPT)
+
+    def get(self, key):
+        """Get a cached JSON value from Redis."""
+        try:
+            raw = self.client.get(key)
+        except redis.RedisError as e:
+            print(f"Redis cache error: {e}")
+            return None
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key, value, ttl):
+        """Store a JSON value in Redis for ttl seconds."""
+        try:
+            self.client.set(key, json.dumps(value), px=max(int(ttl * 1000), 1))
+        except redis.RedisError as e:
+            print(f"Redis cache error: {e}")
+
+    def delete(self, key):
+        """Remove a value from Redis."""
+        try:
+            self.client.delete(key)
+        except redis.RedisError as e:
+            print(f"Redis cache error: {e}")
+
+    def _fill(self, key, ttl, compute):
+        """Compute under a cross-worker lock, or wait for the worker holding it."""
+        lock_key = f'{key}:lock'
+        token = uuid.uuid4().hex
+        try:
+            acquired = self.client.set(lock_key, token, nx=True, px=int(self.lock_timeout * 1000))
+        except redis.RedisError as e:
+            print(f"Redis cache error: {e}")
+            return compute()
+
+        if acquired:
+            try:
+                return super()._fill(key, ttl, compute)
+            finally:
+                try:
+                    self._release_lock(keys=[lock_key], args=[token])
+                except redis.RedisError as e:
+                    print(f"Redis cache error: {e}")
+
+        deadline = time.monotonic() + self.lock_timeout
+        while time.monotonic() < deadline:
+            time.sleep(0.02)
+            value = self.get(key)
+            if value is not None:
+                return value
+
+        # The lock holder died or is too slow; compute it ourselves
+        return super()._fill(key, ttl, compute)
+
+def get_cache():
+    """Get the cache for this worker: Redis when reachable, memory otherwise."""
+    global _cache
+
+    if _cache is None or _cache.pid != os.getpid():
+        with _cache_lock:
+            if _cache is None or _cache.pid != os.getpid():
+                cache = MemoryCache()
+
+                redis_url = current_app.config.get('REDIS_URL')
+                if redis_url and redis is not None:
+                    try:
+                        client = redis.Redis.from_url(redis_url, socket_timeout=1)
+                        client.ping()
+                        cache = RedisCache(client)
+                    except redis.RedisError as e:
+                        print(f"Redis unavailable, using in-process cache: {e}")
+
+                _cache = cache
+
+    return _cache
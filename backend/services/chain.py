@@ -0,0 +1,246 @@
+import os
+import threading
+import requests
+from flask import current_app
+from web3 import Web3
+from web3.datastructures import AttributeDict
+# web3 has no public per-method result formatters; private path, so web3 stays pinned (tests/test_chain.py)
+from web3._utils.method_formatters import PYTHONIC_RESULT_FORMATTERS
+from services.cache import get_cache
+
+# Errors that mean the node is unreachable rather than the call being invalid
+CONNECTION_ERRORS = (requests.exceptions.ConnectionError, requests.exceptions.Timeout)
+
+_chain = None
+_chain_lock = threading.Lock()
+
+class SessionHTTPProvider(Web3.HTTPProvider):
+    """HTTP provider that sends every RPC over one shared keep-alive session."""
+
+    def __init__(self, endpoint_uri, session, request_kwargs=None):
+        super().__init__(endpoint_uri, request_kwargs=request_kwargs)
+        self.session = session
+
+    def make_request(self, method, params):
+        """Send a single JSON-RPC request over the shared session."""
+        request_data = self.encode_rpc_request(method, params)
+        response = self.session.post(
+            self.endpoint_uri,
+            data=request_data,
+            **self.get_request_kwargs()
+        )
+        response.raise_for_status()
+        return self.decode_rpc_response(response.content)
+
+class RPCBatchError(Exception):
+    """Raised when a call inside a JSON-RPC batch returns an error."""
+
+class RPCBatch:
+    """Collects JSON-RPC calls and sends them in a single HTTP round trip."""
+
+    def __init__(self, chain):
+        self.chain = chain
+        self._calls = []
+
+    def add(self, method, *params):
+        """Queue a raw RPC call; results keep the order calls were added in."""
+        self._calls.append((method, list(params)))
+        return self
+
+    def get_block(self, block_identifier='latest', full_transactions=False):
+        """Queue eth_getBlockByNumber."""
+        if isinstance(block_identifier, int):
+            block_identifier = hex(block_identifier)
+        return self.add('eth_getBlockByNumber', block_identifier, full_transactions)
+
+    def block_number(self):
+        """Queue eth_blockNumber."""
+        return self.add('eth_blockNumber')
+
+    def gas_price(self):
+        """Queue eth_gasPrice."""
+        return self.add('eth_gasPrice')
+
+    def get_balance(self, address, block_identifier='latest'):
+        """Queue eth_getBalance."""
+        return self.add('eth_getBalance', address, block_identifier)
+
+    def get_transaction(self, tx_hash):
+        """Queue eth_getTransactionByHash."""
+        return self.add('eth_getTransactionByHash', tx_hash)
+
+    def get_transaction_receipt(self, tx_hash):
+        """Queue eth_getTransactionReceipt."""
+        return self.add('eth_getTransactionReceipt', tx_hash)
+
+    def estimate_gas(self, transaction):
+        """Queue eth_estimateGas for a transaction dict."""
+        params = {
+            key: hex(value) if isinstance(value, int) else value
+            for key, value in transaction.items() if value is not None
+        }
+        return self.add('eth_estimateGas', params)
+
+    def execute(self):
+        """Send all queued calls as one batch and return their formatted results."""
+        if not self._calls:
+            return []
+
+        payload = [
+            {'jsonrpc': '2.0', 'id': request_id, 'method': method, 'params': params}
+            for request_id, (method, params) in enumerate(self._calls)
+        ]
+        responses = self.chain.post(payload)
+        if isinstance(responses, dict):
+            # A malformed or rejected batch is answered with a single error object
+            error = responses.get('error') or {}
+            raise RPCBatchError(f"Batch failed: {error.get('message', responses)}")
+
+        # Nodes may answer a batch in any order; match responses back by id
+        by_id = {response.get('id'): response for response in responses}
+
+        results = []
+        for request_id, (method, params) in enumerate(self._calls):
+            response = by_id.get(request_id)
+            if response is None:
+                raise RPCBatchError(f'No response for {method} in batch')
+            if 'error' in response:
+                raise RPCBatchError(f"{method} failed: {response['error'].get('message')}")
+
+            result = response.get('result')
+            formatter = PYTHONIC_RESULT_FORMATTERS.get(method)
+            if formatter is not None and result is not None:
+                result = formatter(result)
+            if isinstance(result, dict):
+                result = AttributeDict.recursive(result)
+            results.append(result)
+
+        self._calls = []
+        return results
+
+class ChainClient:
+    """Worker-scoped Web3 connection with cached immutable chain facts."""
+
+    def __init__(self, provider_uri, timeout=10, pool_size=10, head_ttl=12):
+        self.provider_uri = provider_uri
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.head_ttl = head_ttl
+        self.pid = os.getpid()
+
+        self._lock = threading.Lock()
+        self._w3 = None
+        self._session = None
+        self._facts = {}
+        self._code = {}
+
+    def _build(self):
+        """Create the Web3 instance and its pooled HTTP session."""
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+
+        provider = SessionHTTPProvider(
+            self.provider_uri,
+            session,
+            request_kwargs={'timeout': self.timeout}
+        )
+        self._session = session
+        return Web3(provider)
+
+    @property
+    def w3(self):
+        """Get the shared Web3 instance, connecting lazily on first use."""
+        if self._w3 is None:
+            with self._lock:
+                if self._w3 is None:
+                    self._w3 = self._build()
+        return self._w3
+
+    def _fact(self, name, fetch):
+        """Fetch a value once per connection and serve it from memory after."""
+        if name not in self._facts:
+            self._facts[name] = fetch()
+        return self._facts[name]
+
+    @property
+    def chain_id(self):
+        """Get the chain id, which never changes for a given node."""
+        return self._fact('chain_id', lambda: self.w3.eth.chain_id)
+
+    @property
+    def accounts_count(self):
+        """Get the number of node-managed accounts, fixed when the node starts."""
+        return self._fact('accounts_count', lambda: len(self.w3.eth.accounts))
+
+    def get_code(self, address):
+        """Get contract bytecode; deployed code is immutable so it is cached."""
+        key = address.lower()
+        if key in self._code:
+            return self._code[key]
+
+        code = self.w3.eth.get_code(address)
+        if len(code) > 0:
+            self._code[key] = code
+        return code
+
+    def head(self):
+        """Get the latest block summary and gas price, cached for about one block."""
+        def fetch():
+            batch = self.batch()
+            batch.get_block('latest')
+            batch.gas_price()
+            block, gas_price = batch.execute()
+            return {
+                'number': block.number,
+                'hash': block.hash.hex(),
+                'timestamp': block.timestamp,
+                'gas_limit': block.gasLimit,
+                'gas_used': block.gasUsed,
+                'gas_price': gas_price
+            }
+
+        return get_cache().get_or_set(f'chain:{self.chain_id}:head', self.head_ttl, fetch)
+
+    def post(self, payload):
+        """POST a raw JSON-RPC payload over the shared session."""
+        provider = self.w3.provider
+        response = provider.session.post(
+            provider.endpoint_uri,
+            json=payload,
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+        return response.json()
+
+    def batch(self):
+        """Start a JSON-RPC batch that runs over this connection."""
+        return RPCBatch(self)
+
+    def reset(self):
+        """Drop the connection and cached facts; the next call reconnects."""
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+            self._w3 = None
+            self._session = None
+            self._facts = {}
+            self._code = {}
+
+def get_chain():
+    """Get the chain client for this worker process, creating it on first use."""
+    global _chain
+
+    if _chain is None or _chain.pid != os.getpid():
+        with _chain_lock:
+            if _chain is None or _chain.pid != os.getpid():
+                config = current_app.config
+                _chain = ChainClient(
+                    provider_uri=config['WEB3_PROVIDER_URI'],
+                    timeout=config['WEB3_REQUEST_TIMEOUT'],
+                    pool_size=config['WEB3_POOL_SIZE'],
+                    head_ttl=config['CHAIN_HEAD_CACHE_TTL']
+                )
+
+    return _chain
@@ -0,0 +1,174 @@
+import os
+import zlib
+import hashlib
+import threading
+from flask import current_app, request
+from services.cache import MemoryCache
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; without it only zstd/gzip are offered
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # zstandard is optional; without it only br/gzip are offered
+    zstandard = None
+
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'application/javascript', 'application/xml')
+
+_cache = None
+_cache_lock = threading.Lock()
+
+class _GzipCompressor:
+    def __init__(self, config):
+        self._compressor = zlib.compressobj(config['COMPRESS_GZIP_LEVEL'], zlib.DEFLATED, 31)
+
+    def compress(self, data, flush=False):
+        out = self._compressor.compress(data)
+        return out + self._compressor.flush(zlib.Z_SYNC_FLUSH) if flush else out
+
+    def finish(self):
+        return self._compressor.flush()
+
+class _BrotliCompressor:
+    def __init__(self, config):
+        self._compressor = brotli.Compressor(quality=config['COMPRESS_BROTLI_QUALITY'])
+
+    def compress(self, data, flush=False):
+        out = self._compressor.process(data)
+        return out + self._compressor.flush() if flush else out
+
+    def finish(self):
+        return self._compressor.finish()
+
+class _ZstdCompressor:
+    def __init__(self, config):
+        self._compressor = zstandard.ZstdCompressor(level=config['COMPRESS_ZSTD_LEVEL']).compressobj()
+
+    def compress(self, data, flush=False):
+        out = self._compressor.compress(data)
+        return out + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK) if flush else out
+
+    def finish(self):
+        return self._compressor.flush()
+
+CODECS = {
+    'zstd': _ZstdCompressor if zstandard is not None else None,
+    'br': _BrotliCompressor if brotli is not None else None,
+    'gzip': _GzipCompressor
+}
+
+def get_compression_cache():
+    """Get this worker's cache of compressed bodies, keyed by encoding and body digest."""
+    global _cache
+
+    if _cache is None or _cache.pid != os.getpid():
+        with _cache_lock:
+            if _cache is None or _cache.pid != os.getpid():
+                _cache = MemoryCache(max_entries=current_app.config['COMPRESS_CACHE_ENTRIES'])
+
+    return _cache
+
+def choose_encoding(algorithms):
+    """Pick the client's highest-quality encoding among ours; ties go to the earlier algorithm."""
+    best, best_quality = None, 0
+    for name in algorithms:
+        if CODECS.get(name) is None:
+            continue
+        quality = request.accept_encodings[name]
+        if quality > best_quality:
+            best, best_quality = name, quality
+    return best
+
+def _excluded(path, prefixes):
+    """Whether path is one of prefixes or below one of them."""
+    return any(path == prefix or path.startswith(prefix.rstrip('/') + '/') for prefix in prefixes if prefix)
+
+def _compressible(response):
+    mimetype = response.mimetype or ''
+    return mimetype.startswith('text/') or mimetype in COMPRESSIBLE_TYPES
+
+def _stream(iterable, compressor, flush_size):
+    """Compress a streamed body chunk by chunk, flushing often enough to keep it flowing."""
+    pending = 0
+    first = True
+    try:
+        for chunk in iterable:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            pending += len(chunk)
+            # The first chunk goes out at once; after that, flush every flush_size input bytes
+            flush = first or pending >= flush_size
+            out = compressor.compress(chunk, flush=flush)
+            if flush:
+                first = False
+                pending = 0
+            if out:
+                yield out
+        yield compressor.finish()
+    finally:
+        if hasattr(iterable, 'close'):
+            iterable.close()
+
+def _compress_body(encoding, data, config):
+    """Compress a whole body, reusing the result for bodies already compressed recently."""
+    cacheable = len(data) <= config['COMPRESS_CACHE_MAX_SIZE']
+    if cacheable:
+        key = f"{encoding}:{hashlib.blake2b(data, digest_size=16).hexdigest()}"
+        cache = get_compression_cache()
+        compressed = cache.get(key)
+        if compressed is not None:
+            return compressed
+
+    compressor = CODECS[encoding](config)
+    compressed = compressor.compress(data) + compressor.finish()
+    if cacheable:
+        cache.set(key, compressed, config['COMPRESS_CACHE_TTL'])
+    return compressed
+
+def compress_response(response):
+    """Encode a response with the best encoding the client accepts (after_request hook)."""
+    config = current_app.config
+    if (
+        not config['COMPRESS_ENABLED']
+        or request.method == 'HEAD'
+        or _excluded(request.path, config['COMPRESS_EXCLUDED_PATHS'])
+        or response.status_code != 200
+        or response.direct_passthrough
+        or 'Content-Encoding' in response.headers
+        or 'Content-Range' in response.headers
+        or not _compressible(response)
+    ):
+        return response
+
+    # The body depends on Accept-Encoding whether or not this one gets compressed
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding(config['COMPRESS_ALGORITHMS'])
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = _stream(
+            response.response, CODECS[encoding](config), config['COMPRESS_STREAM_FLUSH_SIZE']
+        )
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < config['COMPRESS_MIN_SIZE']:
+            return response
+        compressed = _compress_body(encoding, data, config)
+        if len(compressed) >= len(data):
+            return response
+        response.set_data(compressed)
+
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        # A strong ETag names exact bytes, so the encoded body needs its own
+        response.set_etag(f'{etag}-{encoding}')
+    return response
+
+def init_compression(app):
+    """Compress responses of this app according to its COMPRESS_* settings."""
+    app.after_request(compress_response)
@@ -0,0 +1,61 @@
+import time
+import hashlib
+from functools import wraps
+from flask import request, make_response
+from flask_jwt_extended import get_jwt_identity
+from services.stats import DATA_VERSION, DATA_EPOCH, user_version_stat, read_counters
+
+def data_versions(user_id=None):
+    """Read the global change counters (and a user's) in one query; missing counters read as 0."""
+    names = [DATA_VERSION, DATA_EPOCH]
+    if user_id is not None:
+        names.append(user_version_stat(user_id))
+
+    values = read_counters(names)
+    return [values.get(name, 0) for name in names]
+
+def data_etag(scope, bucket=None):
+    """ETag for the current request's response, derived from change counters rather than the body.
+
+    scope='user' follows the caller's own counter (plus the reconcile epoch);
+    scope='global' follows every counted write. bucket (seconds) additionally
+    rolls the tag over for responses whose windows move with the clock.
+    """
+    user_id = get_jwt_identity()
+    if scope == 'user':
+        _, epoch, version = data_versions(user_id)
+        versions = (epoch, version)
+    else:
+        versions = tuple(data_versions())
+
+    parts = [scope, str(user_id), request.full_path, *map(str, versions)]
+    if bucket:
+        parts.append(str(int(time.time() // bucket)))
+    return hashlib.sha1('|'.join(parts).encode()).hexdigest()
+
+def conditional_get(scope, bucket=None):
+    """Answer If-None-Match with 304 before the view runs; tag 200 responses otherwise.
+
+    Must be applied below @jwt_required(), which provides the caller's identity.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                tag = data_etag(scope, bucket)
+            except Exception as e:
+                print(f"ETag error: {e}")
+                return view(*args, **kwargs)
+
+            if request.if_none_match.contains_weak(tag):
+                response = make_response('', 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(tag, weak=True)
+            # Clients may keep the body but must revalidate before every use
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,317 @@
+import io
+import os
+import csv
+import json
+import uuid
+import zipfile
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import update, Integer, BigInteger, Boolean, DateTime
+from models import db, ExportJob, FileRecord, VerificationLog, AuditLog
+from services.pagination import estimated_count
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # pyarrow is optional; without it only csv and ndjson exports are offered
+    pyarrow = None
+
+EXPORT_FORMATS = ('csv', 'ndjson', 'parquet')
+# Earlier clients asked for 'json'; it is served as newline-delimited JSON
+EXPORT_FORMAT_ALIASES = {'json': 'ndjson'}
+DATE_RANGES = {'7d': 7, '30d': 30, '90d': 90, '1y': 365, 'all': None}
+
+# dataset -> (model, time column, exported columns)
+DATASETS = {
+    'files': (FileRecord, 'created_at', (
+        'id', 'file_name', 'file_hash', 'file_size', 'file_type', 'ipfs_hash', 'transaction_hash',
+        'block_number', 'wallet_address', 'upload_status', 'user_id', 'created_at', 'uploaded_at'
+    )),
+    'verifications': (VerificationLog, 'verified_at', (
+        'id', 'file_hash', 'verification_result', 'verification_method', 'verifier_address',
+        'transaction_hash', 'block_number', 'user_id', 'file_record_id', 'verified_at'
+    )),
+    'audit': (AuditLog, 'timestamp', (
+        'id', 'action', 'resource_type', 'resource_id', 'user_id', 'ip_address', 'user_agent',
+        'details', 'timestamp'
+    ))
+}
+
+_slots = None
+_slots_lock = threading.Lock()
+
+class ExportError(ValueError):
+    """Raised for export requests that cannot be run."""
+
+def create_export(user, export_format, date_range, include):
+    """Validate an export request and queue it as a pending job."""
+    export_format = EXPORT_FORMAT_ALIASES.get(export_format, export_format)
+    if export_format not in EXPORT_FORMATS:
+        raise ExportError(f"Unsupported export type: {export_format}")
+    if export_format == 'parquet' and pyarrow is None:
+        raise ExportError("Parquet exports require pyarrow to be installed")
+    if date_range not in DATE_RANGES:
+        raise ExportError(f"Unsupported date range: {date_range}")
+
+    datasets = [name for name in DATASETS if name in (include or [])]
+    if not datasets:
+        raise ExportError(f"Nothing to export; include any of: {', '.join(DATASETS)}")
+
+    job = ExportJob(
+        id=uuid.uuid4().hex,
+        user_id=user.id,
+        export_format=export_format,
+        date_range=date_range,
+        datasets=','.join(datasets),
+        # Admins export everyone's rows, like they see everyone's audit logs
+        all_users=bool(user.is_admin)
+    )
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+def _dataset_query(job, name):
+    model, time_column, columns = DATASETS[name]
+    query = db.session.query(*[getattr(model, column) for column in columns])
+
+    days = DATE_RANGES[job.date_range]
+    if days is not None:
+        start = job.created_at - timedelta(days=days)
+        query = query.filter(getattr(model, time_column) >= start)
+    if not job.all_users:
+        query = query.filter(model.user_id == job.user_id)
+    # Everything included must exist when the job was requested
+    return query.filter(getattr(model, time_column) <= job.created_at)
+
+def _iter_batches(query, model, batch_size):
+    """Yield lists of rows while holding at most batch_size of them in memory.
+
+    PostgreSQL streams one snapshot through a server-side cursor on its own
+    connection; other databases walk the primary key in batches, which
+    keeps SQLite's read locks short enough for progress writes.
+    """
+    if db.session.get_bind().dialect.name == 'postgresql':
+        with db.engine.connect() as connection:
+            connection = connection.execution_options(isolation_level='REPEATABLE READ')
+            with connection.begin():
+                result = connection.execution_options(yield_per=batch_size).execute(
+                    query.order_by(model.id).statement
+                )
+                for rows in result.partitions():
+                    yield rows
+        return
+
+    last_id = None
+    while True:
+        batch = query.order_by(model.id)
+        if last_id is not None:
+            batch = batch.filter(model.id > last_id)
+        rows = batch.limit(batch_size).all()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1].id
+
+def _plain(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return value
+
+def _arrow_type(column):
+    column_type = column.type
+    if isinstance(column_type, (Integer, BigInteger)):
+        return pyarrow.int64()
+    if isinstance(column_type, Boolean):
+        return pyarrow.bool_()
+    if isinstance(column_type, DateTime):
+        return pyarrow.timestamp('us')
+    return pyarrow.string()
+
+class _CsvWriter:
+    def __init__(self, archive, name, columns):
+        self.stream = io.TextIOWrapper(archive.open(f'{name}.csv', 'w', force_zip64=True),
+                                       encoding='utf-8', newline='')
+        self.writer = csv.writer(self.stream)
+        self.writer.writerow(columns)
+
+    def write(self, rows):
+        self.writer.writerows([_plain(value) for value in row] for row in rows)
+
+    def close(self):
+        self.stream.close()
+
+class _NdjsonWriter:
+    def __init__(self, archive, name, columns):
+        self.stream = io.TextIOWrapper(archive.open(f'{name}.ndjson', 'w', force_zip64=True), encoding='utf-8')
+        self.columns = columns
+
+    def write(self, rows):
+        self.stream.writelines(
+            json.dumps({column: _plain(value) for column, value in zip(self.columns, row)}) + '\n'
+            for row in rows
+        )
+
+    def close(self):
+        self.stream.close()
+
+class _ParquetWriter:
+    """Writes one row group per batch to a temp file, then stores it in the archive."""
+
+    def __init__(self, archive, name, columns, model):
+        self.archive = archive
+        self.name = name
+        self.columns = columns
+        self.schema = pyarrow.schema([
+            (column, _arrow_type(model.__table__.c[column])) for column in columns
+        ])
+        descriptor, self.tmp_path = tempfile.mkstemp(suffix='.parquet')
+        os.close(descriptor)
+        self.writer = pyarrow.parquet.ParquetWriter(self.tmp_path, self.schema, compression='zstd')
+
+    def write(self, rows):
+        arrays = []
+        for index, field in enumerate(self.schema):
+            values = [row[index] for row in rows]
+            if pyarrow.types.is_string(field.type):
+                values = [json.dumps(value) if isinstance(value, (dict, list)) else value for value in values]
+            arrays.append(pyarrow.array(values, type=field.type))
+        self.writer.write_table(pyarrow.Table.from_arrays(arrays, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+        try:
+            # Parquet pages are already compressed
+            self.archive.write(self.tmp_path, f'{self.name}.parquet', compress_type=zipfile.ZIP_STORED)
+        finally:
+            os.remove(self.tmp_path)
+
+def _open_writer(archive, job, name):
+    model, _, columns = DATASETS[name]
+    if job.export_format == 'parquet':
+        return _ParquetWriter(archive, name, columns, model)
+    if job.export_format == 'ndjson':
+        return _NdjsonWriter(archive, name, columns)
+    return _CsvWriter(archive, name, columns)
+
+def _update_job(job_id, **values):
+    db.session.execute(update(ExportJob).where(ExportJob.id == job_id).values(**values))
+    db.session.commit()
+
+def _claimable():
+    stale = datetime.utcnow() - timedelta(seconds=current_app.config['EXPORT_STALE_AFTER'])
+    return db.or_(
+        ExportJob.status == 'pending',
+        # A job whose runner stopped sending heartbeats (worker killed) is picked up again
+        db.and_(ExportJob.status == 'running', ExportJob.heartbeat_at < stale)
+    )
+
+def claim_export(job_id=None):
+    """Atomically mark a pending (or abandoned) job as running; returns its id or None."""
+    candidates = db.session.query(ExportJob.id).filter(_claimable())
+    if job_id is not None:
+        candidates = candidates.filter(ExportJob.id == job_id)
+
+    for (candidate,) in candidates.order_by(ExportJob.created_at).limit(10).all():
+        now = datetime.utcnow()
+        claimed = db.session.execute(
+            update(ExportJob).where(ExportJob.id == candidate, _claimable()).values(
+                status='running', started_at=now, heartbeat_at=now, rows_written=0, error_message=None
+            )
+        ).rowcount
+        db.session.commit()
+        if claimed:
+            return candidate
+    return None
+
+def run_export(job_id):
+    """Stream a claimed job's datasets into a zip archive in EXPORT_DIR, reporting progress."""
+    config = current_app.config
+    job = db.session.get(ExportJob, job_id)
+    export_dir = config['EXPORT_DIR']
+    os.makedirs(export_dir, exist_ok=True)
+    path = os.path.abspath(os.path.join(export_dir, f'{job.id}.zip'))
+    tmp_path = path + '.tmp'
+
+    try:
+        datasets = job.datasets.split(',')
+        queries = {name: _dataset_query(job, name) for name in datasets}
+        estimates = [estimated_count(query) for query in queries.values()]
+        total = sum(estimates) if None not in estimates else sum(query.count() for query in queries.values())
+        _update_job(job_id, total_rows=total)
+
+        written = 0
+        with zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_DEFLATED, allowZip64=True) as archive:
+            for name in datasets:
+                writer = _open_writer(archive, job, name)
+                try:
+                    for rows in _iter_batches(queries[name], DATASETS[name][0], config['EXPORT_BATCH_SIZE']):
+                        writer.write(rows)
+                        written += len(rows)
+                        _update_job(job_id, rows_written=written, heartbeat_at=datetime.utcnow())
+                finally:
+                    writer.close()
+
+        os.replace(tmp_path, path)
+        _update_job(
+            job_id,
+            status='completed',
+            rows_written=written,
+            total_rows=written,
+            file_path=path,
+            file_size=os.path.getsize(path),
+            completed_at=datetime.utcnow()
+        )
+    except Exception as e:
+        print(f"Export {job_id} error: {e}")
+        db.session.rollback()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        _update_job(job_id, status='failed', error_message=str(e), completed_at=datetime.utcnow())
+
+def run_pending_exports():
+    """Run claimable jobs until none are left; returns how many ran."""
+    ran = 0
+    while True:
+        job_id = claim_export()
+        if job_id is None:
+            return ran
+        run_export(job_id)
+        ran += 1
+
+def start_export(job_id):
+    """Run a job on a background thread of this worker, at most EXPORT_MAX_CONCURRENT at a time."""
+    global _slots
+
+    if _slots is None:
+        with _slots_lock:
+            if _slots is None:
+                _slots = threading.BoundedSemaphore(current_app.config['EXPORT_MAX_CONCURRENT'])
+
+    app = current_app._get_current_object()
+
+    def run():
+        with _slots, app.app_context():
+            # Another worker (or flask run-exports) may have claimed it first
+            if claim_export(job_id) == job_id:
+                run_export(job_id)
+            purge_expired_exports(app.config['EXPORT_RETENTION_HOURS'])
+
+    threading.Thread(target=run, name=f'export-{job_id}', daemon=True).start()
+
+def purge_expired_exports(retention_hours):
+    """Delete artifacts and jobs older than retention_hours; returns how many were removed."""
+    cutoff = datetime.utcnow() - timedelta(hours=retention_hours)
+    expired = ExportJob.query.filter(
+        ExportJob.status.in_(['completed', 'failed']),
+        ExportJob.completed_at < cutoff
+    ).all()
+    for job in expired:
+        if job.file_path and os.path.exists(job.file_path):
+            os.remove(job.file_path)
+        db.session.delete(job)
+    db.session.commit()
+    return len(expired)
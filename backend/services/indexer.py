@@ -0,0 +1,427 @@
+import mimetypes
+from datetime import datetime
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from web3 import Web3
+from models import db, FileRecord, VerificationLog, User, SystemStats, FileRegistration
+from services.chain import get_chain
+from services.stats import (
+    increment_many, file_added_deltas, verification_deltas,
+    increment_users, user_file_deltas, user_verification_deltas, bump_versions
+)
+from services.trends import TrendDeltas
+from services.verify_cache import get_verify_cache
+
+# Events and views of blockchain/contracts/FileRegistry.sol used by the indexer
+FILE_REGISTRY_ABI = [
+    {
+        "anonymous": False,
+        "inputs": [
+            {"indexed": True, "name": "fileHash", "type": "bytes32"},
+            {"indexed": True, "name": "uploader", "type": "address"},
+            {"indexed": False, "name": "fileName", "type": "string"},
+            {"indexed": False, "name": "timestamp", "type": "uint256"}
+        ],
+        "name": "FileUploaded",
+        "type": "event"
+    },
+    {
+        "anonymous": False,
+        "inputs": [
+            {"indexed": True, "name": "fileHash", "type": "bytes32"},
+            {"indexed": True, "name": "verifier", "type": "address"},
+            {"indexed": False, "name": "isValid", "type": "bool"},
+            {"indexed": False, "name": "timestamp", "type": "uint256"}
+        ],
+        "name": "FileVerified",
+        "type": "event"
+    },
+    {
+        "inputs": [{"name": "_fileHash", "type": "bytes32"}],
+        "name": "getFileInfo",
+        "outputs": [
+            {
+                "components": [
+                    {"name": "fileHash", "type": "bytes32"},
+                    {"name": "fileName", "type": "string"},
+                    {"name": "fileSize", "type": "uint256"},
+                    {"name": "ipfsHash", "type": "string"},
+                    {"name": "uploader", "type": "address"},
+                    {"name": "timestamp", "type": "uint256"},
+                    {"name": "exists", "type": "bool"}
+                ],
+                "name": "",
+                "type": "tuple"
+            }
+        ],
+        "stateMutability": "view",
+        "type": "function"
+    }
+]
+
+FILE_INFO_OUTPUT_TYPES = ['(bytes32,string,uint256,string,address,uint256,bool)']
+
+FILE_UPLOADED_TOPIC = Web3.to_hex(Web3.keccak(text='FileUploaded(bytes32,address,string,uint256)'))
+FILE_VERIFIED_TOPIC = Web3.to_hex(Web3.keccak(text='FileVerified(bytes32,address,bool,uint256)'))
+
+EVENT_TOPICS = {
+    'FileUploaded': FILE_UPLOADED_TOPIC,
+    'FileVerified': FILE_VERIFIED_TOPIC
+}
+
+CHECKPOINT_STAT = 'indexer_last_block'
+
+# upload_method in the metadata of file records created from chain events
+INDEXER_UPLOAD_METHOD = 'chain_indexer'
+
+def _file_hash(event):
+    """Get an event's bytes32 file hash as the 64-char hex used by FileRecord."""
+    return Web3.to_hex(event.args.fileHash)[2:]
+
+class ChainIndexer:
+    """Pages FileRegistry logs into FileRecord and VerificationLog rows."""
+
+    def __init__(self, chain, contract_address, batch_size=2000, confirmations=6, start_block=0):
+        self.chain = chain
+        self.w3 = chain.w3
+        self.contract = self.w3.eth.contract(
+            address=Web3.to_checksum_address(contract_address),
+            abi=FILE_REGISTRY_ABI
+        )
+        self.batch_size = batch_size
+        self.confirmations = confirmations
+        self.start_block = start_block
+
+    def fetch_events(self, from_block, to_block, event_types=None):
+        """Fetch and decode FileRegistry logs in an inclusive block range."""
+        topics = [EVENT_TOPICS[name] for name in (event_types or EVENT_TOPICS)]
+        logs = self.w3.eth.get_logs({
+            'address': self.contract.address,
+            'fromBlock': from_block,
+            'toBlock': to_block,
+            'topics': [topics]
+        })
+
+        events = []
+        for log in logs:
+            topic = Web3.to_hex(log['topics'][0])
+            if topic == FILE_UPLOADED_TOPIC:
+                events.append(self.contract.events.FileUploaded().process_log(log))
+            elif topic == FILE_VERIFIED_TOPIC:
+                events.append(self.contract.events.FileVerified().process_log(log))
+        return events
+
+    def _lock_checkpoint(self):
+        """Load the checkpoint row locked FOR UPDATE, so one runner at a time advances it.
+
+        flask index-chain and /sync-files both index through run_once; the
+        lock is held until the page (or rewind) that read it commits.
+        """
+        query = SystemStats.query.filter_by(stat_name=CHECKPOINT_STAT).with_for_update().populate_existing()
+        checkpoint = query.first()
+        if checkpoint is None:
+            try:
+                with db.session.begin_nested():
+                    db.session.add(SystemStats(stat_name=CHECKPOINT_STAT, stat_value=self.start_block - 1))
+            except IntegrityError:
+                # Another runner created it first
+                pass
+            checkpoint = query.first()
+        return checkpoint
+
+    def _rewind_if_reorged(self, checkpoint):
+        """Rewind the checkpoint when its block is no longer on the canonical chain.
+
+        Everything indexed from blocks past the rewind point is rolled back in
+        the caller's transaction: verifications, registrations and the file
+        records the indexer created, with their counters and trend buckets.
+        The rescan re-inserts whatever is still canonical. Returns the hashes
+        of removed files, to drop from the verify filter once committed.
+        """
+        indexed_hash = checkpoint.get_data().get('block_hash')
+        if not indexed_hash or checkpoint.stat_value < self.start_block:
+            return None
+
+        block = self.w3.eth.get_block(checkpoint.stat_value)
+        if Web3.to_hex(block.hash) == indexed_hash:
+            return None
+
+        rewind_to = max(checkpoint.stat_value - self.confirmations, self.start_block - 1)
+        stat_deltas = {}
+        trend_deltas = TrendDeltas()
+        user_deltas = {}
+
+        # Verifications indexed from blocks that may have been orphaned
+        orphaned = VerificationLog.query.filter(
+            VerificationLog.verification_method == 'blockchain',
+            VerificationLog.block_number > rewind_to
+        )
+        for verified_at, verification_result, user_id in orphaned.with_entities(
+            VerificationLog.verified_at, VerificationLog.verification_result, VerificationLog.user_id
+        ):
+            for name, delta in verification_deltas(verification_result).items():
+                stat_deltas[name] = stat_deltas.get(name, 0) - delta
+            trend_deltas.add_verification(verified_at, verification_result, sign=-1)
+            user_verification_deltas(user_id, verification_result, user_deltas, sign=-1)
+        orphaned.delete(synchronize_session=False)
+        FileRegistration.query.filter(
+            FileRegistration.block_number > rewind_to
+        ).delete(synchronize_session=False)
+
+        # Files the indexer created from those blocks (uploads through the API are kept)
+        orphaned_files = FileRecord.query.filter(
+            FileRecord.block_number > rewind_to,
+            FileRecord.file_metadata['upload_method'].as_string() == INDEXER_UPLOAD_METHOD
+        ).all()
+        removed_hashes = []
+        for record in orphaned_files:
+            for name, delta in file_added_deltas(record).items():
+                stat_deltas[name] = stat_deltas.get(name, 0) - delta
+            trend_deltas.add_file(record.created_at, record.file_type, sign=-1)
+            user_file_deltas(record, user_deltas, sign=-1)
+            removed_hashes.append(record.file_hash)
+        if orphaned_files:
+            record_ids = [record.id for record in orphaned_files]
+            VerificationLog.query.filter(VerificationLog.file_record_id.in_(record_ids)).update(
+                {VerificationLog.file_record_id: None}, synchronize_session=False
+            )
+            FileRecord.query.filter(FileRecord.id.in_(record_ids)).delete(synchronize_session=False)
+
+        increment_many(stat_deltas)
+        trend_deltas.apply()
+        increment_users(user_deltas)
+
+        checkpoint.stat_value = rewind_to
+        checkpoint.set_data(None)
+        return removed_hashes
+
+    def _fetch_file_info(self, file_hashes):
+        """Read size and IPFS hash for new files with one batched eth_call."""
+        if not file_hashes:
+            return {}
+
+        batch = self.chain.batch()
+        for file_hash in file_hashes:
+            batch.add('eth_call', {
+                'to': self.contract.address,
+                'data': self.contract.encodeABI(fn_name='getFileInfo', args=[bytes.fromhex(file_hash)])
+            }, 'latest')
+
+        info = {}
+        for file_hash, raw in zip(file_hashes, batch.execute()):
+            record, = self.w3.codec.decode(FILE_INFO_OUTPUT_TYPES, raw)
+            info[file_hash] = {'file_size': record[2], 'ipfs_hash': record[3] or None}
+        return info
+
+    def _users_by_wallet(self, addresses):
+        lowered = {address.lower() for address in addresses}
+        if not lowered:
+            return {}
+        users = User.query.filter(db.func.lower(User.wallet_address).in_(lowered)).all()
+        return {user.wallet_address.lower(): user.id for user in users}
+
+    def _apply(self, events):
+        """Bulk-upsert one page of decoded events; returns (new, updated, verifications)."""
+        uploads = [event for event in events if event.event == 'FileUploaded']
+        verifications = [event for event in events if event.event == 'FileVerified']
+
+        file_hashes = {_file_hash(event) for event in events}
+        existing = {
+            record.file_hash: record
+            for record in FileRecord.query.filter(FileRecord.file_hash.in_(file_hashes)).all()
+        } if file_hashes else {}
+
+        wallets = self._users_by_wallet(
+            [event.args.uploader for event in uploads] + [event.args.verifier for event in verifications]
+        )
+
+        new_hashes = []
+        for event in uploads:
+            file_hash = _file_hash(event)
+            if file_hash not in existing and file_hash not in new_hashes:
+                new_hashes.append(file_hash)
+        file_info = self._fetch_file_info(new_hashes)
+
+        new_files = 0
+        updated_files = 0
+        updated_owners = set()
+        stat_deltas = {}
+        trend_deltas = TrendDeltas()
+        user_deltas = {}
+        for event in uploads:
+            file_hash = _file_hash(event)
+            transaction_hash = Web3.to_hex(event.transactionHash)
+            record = existing.get(file_hash)
+
+            if record is None:
+                info = file_info.get(file_hash, {})
+                record = FileRecord(
+                    file_name=event.args.fileName,
+                    file_hash=file_hash,
+                    file_size=info.get('file_size', 0),
+                    file_type=mimetypes.guess_type(event.args.fileName)[0] or 'application/octet-stream',
+                    ipfs_hash=info.get('ipfs_hash'),
+                    transaction_hash=transaction_hash,
+                    block_number=event.blockNumber,
+                    wallet_address=event.args.uploader,
+                    upload_status='uploaded',
+                    user_id=wallets.get(event.args.uploader.lower()),
+                    uploaded_at=datetime.utcfromtimestamp(event.args.timestamp)
+                )
+                record.set_metadata({'upload_method': INDEXER_UPLOAD_METHOD})
+                db.session.add(record)
+                existing[file_hash] = record
+                get_verify_cache().file_added(file_hash)
+                file_added_deltas(record, stat_deltas)
+                trend_deltas.add_file(record.created_at, record.file_type)
+                user_file_deltas(record, user_deltas)
+                new_files += 1
+            elif record.transaction_hash != transaction_hash or record.block_number != event.blockNumber:
+                record.transaction_hash = transaction_hash
+                record.block_number = event.blockNumber
+                if record.upload_status == 'pending':
+                    record.upload_status = 'uploaded'
+                updated_owners.add(record.user_id)
+                updated_files += 1
+
+        # Verification events are keyed by (transaction_hash, log_index) so rescans are idempotent
+        seen = set()
+        if verifications:
+            tx_hashes = {Web3.to_hex(event.transactionHash) for event in verifications}
+            seen = set(db.session.query(
+                VerificationLog.transaction_hash, VerificationLog.log_index
+            ).filter(VerificationLog.transaction_hash.in_(tx_hashes)).all())
+
+        db.session.flush()
+
+        verification_rows = []
+        for event in verifications:
+            key = (Web3.to_hex(event.transactionHash), event.logIndex)
+            if key in seen:
+                continue
+            seen.add(key)
+            file_hash = _file_hash(event)
+            record = existing.get(file_hash)
+            verification_rows.append({
+                'file_hash': file_hash,
+                'verification_result': event.args.isValid,
+                'verifier_address': event.args.verifier,
+                'verification_method': 'blockchain',
+                'transaction_hash': key[0],
+                'log_index': key[1],
+                'block_number': event.blockNumber,
+                'user_id': wallets.get(event.args.verifier.lower()),
+                'file_record_id': record.id if record else None,
+                'verified_at': datetime.utcfromtimestamp(event.args.timestamp)
+            })
+            verification_deltas(event.args.isValid, stat_deltas)
+            trend_deltas.add_verification(verification_rows[-1]['verified_at'], event.args.isValid)
+            user_verification_deltas(verification_rows[-1]['user_id'], event.args.isValid, user_deltas)
+
+        if verification_rows:
+            db.session.bulk_insert_mappings(VerificationLog, verification_rows)
+        increment_many(stat_deltas)
+        trend_deltas.apply()
+        increment_users(user_deltas)
+        if updated_owners:
+            # Confirmed records change without touching any counter
+            bump_versions(updated_owners)
+
+        # Feed the block-timestamp-ordered registration index
+        registered = set()
+        if uploads:
+            registered = {
+                row.file_hash for row in db.session.query(FileRegistration.file_hash).filter(
+                    FileRegistration.file_hash.in_({_file_hash(event) for event in uploads})
+                )
+            }
+
+        registration_rows = []
+        for event in uploads:
+            file_hash = _file_hash(event)
+            if file_hash in registered:
+                continue
+            registered.add(file_hash)
+            registration_rows.append({
+                'file_hash': file_hash,
+                'file_name': event.args.fileName,
+                'uploader_address': event.args.uploader.lower(),
+                'block_timestamp': datetime.utcfromtimestamp(event.args.timestamp),
+                'block_number': event.blockNumber,
+                'transaction_hash': Web3.to_hex(event.transactionHash),
+                'log_index': event.logIndex,
+                'file_record_id': existing[file_hash].id
+            })
+
+        if registration_rows:
+            db.session.bulk_insert_mappings(FileRegistration, registration_rows)
+
+        return new_files, updated_files, len(verification_rows)
+
+    def run_once(self):
+        """Index every confirmed block since the checkpoint, one page per commit."""
+        try:
+            checkpoint = self._lock_checkpoint()
+            removed_hashes = self._rewind_if_reorged(checkpoint)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        for file_hash in removed_hashes or ():
+            get_verify_cache().file_removed(file_hash)
+
+        safe_head = self.w3.eth.block_number - self.confirmations
+
+        result = {
+            'synced_files': 0,
+            'new_files': 0,
+            'updated_files': 0,
+            'new_verifications': 0,
+            'from_block': checkpoint.stat_value + 1,
+            'to_block': checkpoint.stat_value,
+            'rewound': removed_hashes is not None
+        }
+
+        while True:
+            try:
+                # Re-read under the lock: another runner may have advanced it since our last page
+                checkpoint = self._lock_checkpoint()
+                from_block = checkpoint.stat_value + 1
+                if from_block > safe_head:
+                    db.session.rollback()
+                    break
+                to_block = min(from_block + self.batch_size - 1, safe_head)
+
+                events = self.fetch_events(from_block, to_block)
+                new_files, updated_files, new_verifications = self._apply(events)
+
+                # Rows and checkpoint commit together so a crash never skips a page
+                checkpoint.stat_value = to_block
+                checkpoint.set_data({'block_hash': Web3.to_hex(self.w3.eth.get_block(to_block).hash)})
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+
+            if updated_files:
+                # Transaction details of cached files changed
+                get_verify_cache().file_changed()
+
+            result['synced_files'] += new_files + updated_files
+            result['new_files'] += new_files
+            result['updated_files'] += updated_files
+            result['new_verifications'] += new_verifications
+            result['to_block'] = to_block
+
+        return result
+
+def get_indexer():
+    """Build an indexer for the configured FileRegistry contract."""
+    config = current_app.config
+    return ChainIndexer(
+        get_chain(),
+        config['CONTRACT_ADDRESS'],
+        batch_size=config['INDEXER_BATCH_SIZE'],
+        confirmations=config['INDEXER_CONFIRMATIONS'],
+        start_block=config['INDEXER_START_BLOCK']
+    )
@@ -0,0 +1,142 @@
+import os
+import time
+import queue
+import threading
+from contextlib import contextmanager
+from flask import current_app
+import ipfshttpclient
+from ipfshttpclient.exceptions import ConnectionError as IPFSConnectionError, TimeoutError as IPFSTimeoutError
+
+# Errors after which a pooled client is considered dead and dropped
+CONNECTION_ERRORS = (IPFSConnectionError, IPFSTimeoutError)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+class IPFSUnavailableError(Exception):
+    """Raised while the pool is backing off after failed reconnects."""
+
+class IPFSPool:
+    """Per-worker pool of long-lived, keep-alive IPFS API clients."""
+
+    def __init__(self, host, port, size=4, chunk_size=64 * 1024,
+                 health_check_interval=30, max_backoff=30, timeout=120):
+        self.addr = f'/dns/{host}/tcp/{port}/http'
+        self.size = size
+        self.chunk_size = chunk_size
+        self.health_check_interval = health_check_interval
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.pid = os.getpid()
+
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._retry_at = 0
+
+    def _connect(self):
+        """Open a new session client, backing off exponentially on failure."""
+        with self._lock:
+            if time.monotonic() < self._retry_at:
+                raise IPFSUnavailableError(
+                    f'IPFS unavailable, retrying in {self._retry_at - time.monotonic():.1f}s'
+                )
+
+        try:
+            client = ipfshttpclient.connect(
+                self.addr,
+                session=True,
+                chunk_size=self.chunk_size,
+                timeout=self.timeout
+            )
+        except CONNECTION_ERRORS:
+            with self._lock:
+                self._failures += 1
+                backoff = min(2 ** (self._failures - 1), self.max_backoff)
+                self._retry_at = time.monotonic() + backoff
+            raise
+
+        with self._lock:
+            self._failures = 0
+            self._retry_at = 0
+        client.last_used = time.monotonic()
+        return client
+
+    def _is_healthy(self, client):
+        """Ping clients that have been idle longer than the check interval."""
+        if time.monotonic() - client.last_used < self.health_check_interval:
+            return True
+        try:
+            client.version()
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, client):
+        """Close a client without returning it to the pool."""
+        try:
+            client.close()
+        except Exception:
+            pass
+
+    def acquire(self):
+        """Take a healthy idle client from the pool or open a new one."""
+        while True:
+            try:
+                client = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+
+            if self._is_healthy(client):
+                return client
+            self._discard(client)
+
+    def release(self, client):
+        """Return a client to the pool, closing it if the pool is full."""
+        client.last_used = time.monotonic()
+        try:
+            self._idle.put_nowait(client)
+        except queue.Full:
+            self._discard(client)
+
+    @contextmanager
+    def client(self):
+        """Borrow a client for the duration of a with-block."""
+        client = self.acquire()
+        try:
+            yield client
+        except CONNECTION_ERRORS:
+            self._discard(client)
+            raise
+        except Exception:
+            self.release(client)
+            raise
+        else:
+            self.release(client)
+
+    def close(self):
+        """Close every idle client."""
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+def get_ipfs_pool():
+    """Get the IPFS pool for this worker process, creating it on first use."""
+    global _pool
+
+    if _pool is None or _pool.pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool.pid != os.getpid():
+                config = current_app.config
+                _pool = IPFSPool(
+                    host=config['IPFS_API_HOST'],
+                    port=config['IPFS_API_PORT'],
+                    size=config['IPFS_POOL_SIZE'],
+                    chunk_size=config['UPLOAD_CHUNK_SIZE'],
+                    health_check_interval=config['IPFS_HEALTH_CHECK_INTERVAL'],
+                    max_backoff=config['IPFS_RECONNECT_MAX_BACKOFF']
+                )
+
+    return _pool
@@ -0,0 +1,29 @@
+from sqlalchemy import text
+from models import db, JSONData
+
+def json_columns():
+    """(table, column) names of every native JSON column in the schema."""
+    return [
+        (table.name, column.name)
+        for table in db.metadata.sorted_tables
+        for column in table.columns
+        if column.type is JSONData
+    ]
+
+def convert_json_columns(connection):
+    """Convert JSON columns still stored as text to jsonb (PostgreSQL); returns those converted."""
+    if connection.dialect.name != 'postgresql':
+        return []
+
+    converted = []
+    for table, column in json_columns():
+        data_type = connection.execute(text(
+            "SELECT data_type FROM information_schema.columns "
+            "WHERE table_name = :table AND column_name = :column"
+        ), {'table': table, 'column': column}).scalar()
+        if data_type in ('text', 'character varying', 'json'):
+            connection.exec_driver_sql(
+                f"ALTER TABLE {table} ALTER COLUMN {column} TYPE jsonb USING nullif({column}::text, '')::jsonb"
+            )
+            converted.append(f'{table}.{column}')
+    return converted
@@ -0,0 +1,134 @@
+import json
+import base64
+from datetime import datetime
+from flask import current_app, request
+from models import db
+from services.cache import get_cache
+
+class InvalidCursorError(ValueError):
+    """Raised when a client sends a cursor this server did not issue."""
+
+def encode_cursor(sort_value, row_id):
+    """Encode a (timestamp, id) keyset position as an opaque URL-safe token."""
+    payload = json.dumps([sort_value.isoformat(), row_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """Decode a cursor back into its (timestamp, id) keyset position."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(sort_value), int(row_id)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursorError('Invalid cursor') from e
+
+def keyset_page(query, sort_column, id_column, cursor=None, limit=20, descending=False):
+    """Fetch one page ordered by (sort_column, id_column); returns (rows, next_cursor)."""
+    if cursor:
+        sort_value, row_id = decode_cursor(cursor)
+        position = db.tuple_(sort_column, id_column)
+        after = db.tuple_(sort_value, row_id)
+        query = query.filter(position < after if descending else position > after)
+
+    if descending:
+        query = query.order_by(sort_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(sort_column.asc(), id_column.asc())
+
+    # Fetch one extra row to learn whether another page exists
+    rows = query.limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, sort_column.key), getattr(last, id_column.key))
+
+    return rows, next_cursor
+
+def estimated_count(query):
+    """Get the planner's row estimate for a query on PostgreSQL, or None elsewhere."""
+    bind = db.session.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return None
+
+    compiled = query.statement.compile(dialect=bind.dialect)
+    try:
+        plan = db.session.connection().exec_driver_sql(
+            'EXPLAIN (FORMAT JSON) ' + str(compiled), compiled.params
+        ).scalar()
+    except Exception as e:
+        print(f"Count estimate error: {e}")
+        return None
+    return int(plan[0]['Plan']['Plan Rows'])
+
+def cached_count(query, cache_key, ttl):
+    """Get an exact COUNT(*), shared across requests for ttl seconds."""
+    return get_cache().get_or_set(f'count:{cache_key}', ttl, query.count)
+
+def paginate_request(query, sort_column, id_column, count_key, descending=True):
+    """Page a list endpoint from its request args; returns (rows, response fields).
+
+    ?cursor= walks the (sort_column, id_column) keyset, so every page costs
+    the same. ?page= is still accepted for older clients and falls back to
+    OFFSET. Totals are only computed when asked for (?total=exact|estimate)
+    or for ?page= clients, and exact counts are cached per filter set.
+    """
+    config = current_app.config
+    per_page = request.args.get('per_page', config['ITEMS_PER_PAGE'], type=int)
+    per_page = max(1, min(per_page, config['MAX_PER_PAGE']))
+    cursor = request.args.get('cursor')
+    page = request.args.get('page', type=int)
+    total_mode = request.args.get('total') or ('exact' if page else None)
+
+    fields = {'per_page': per_page}
+    if page and page > 1 and not cursor:
+        # Legacy offset paging for clients that still jump to page numbers
+        ordering = (sort_column.desc(), id_column.desc()) if descending else (sort_column.asc(), id_column.asc())
+        rows = query.order_by(*ordering).offset((page - 1) * per_page).limit(per_page + 1).all()
+        next_cursor = None
+        if len(rows) > per_page:
+            rows = rows[:per_page]
+            next_cursor = encode_cursor(getattr(rows[-1], sort_column.key), getattr(rows[-1], id_column.key))
+    else:
+        rows, next_cursor = keyset_page(query, sort_column, id_column, cursor, per_page, descending)
+    fields['next_cursor'] = next_cursor
+
+    if page:
+        fields['current_page'] = page
+
+    if total_mode in ('exact', 'estimate'):
+        total = estimated_count(query) if total_mode == 'estimate' else None
+        fields['total_estimated'] = total is not None
+        if total is None:
+            total = cached_count(query, count_key, config['PAGINATION_COUNT_CACHE_TTL'])
+        fields['total'] = total
+        fields['pages'] = (total + per_page - 1) // per_page
+
+    return rows, fields
+
+def ranked_page(query, rank, id_column):
+    """Page a relevance-ordered query by ?page=; returns (rows, response fields).
+
+    Relevance is not a stable keyset, so ranked results use OFFSET paging
+    capped at MAX_RANKED_RESULTS rows deep.
+    """
+    config = current_app.config
+    per_page = request.args.get('per_page', config['ITEMS_PER_PAGE'], type=int)
+    per_page = max(1, min(per_page, config['MAX_PER_PAGE']))
+    page = max(1, request.args.get('page', 1, type=int))
+
+    offset = (page - 1) * per_page
+    limit = max(0, min(per_page + 1, config['MAX_RANKED_RESULTS'] + 1 - offset))
+    rows = query.order_by(rank.desc(), id_column.desc()).offset(offset).limit(limit).all() if limit else []
+
+    has_more = len(rows) > per_page and offset + per_page < config['MAX_RANKED_RESULTS']
+    return rows[:per_page], {
+        'per_page': per_page,
+        'current_page': page,
+        'next_page': page + 1 if has_more else None
+    }
+
+def omitted_fields():
+    """Response fields a list endpoint was asked to leave out (?omit=metadata,details)."""
+    return {field.strip() for field in request.args.get('omit', '').split(',') if field.strip()}
@@ -0,0 +1,104 @@
+import re
+import sqlite3
+from sqlalchemy import event, text, literal, case, Integer, Float
+from models import db, FileRecord
+
+# Queries that look like (part of) a SHA-256 hex digest are also matched as hash prefixes
+HASH_PREFIX_PATTERN = re.compile(r'^(0x)?[0-9a-fA-F]{6,64}$')
+HEX_DIGITS = '0123456789abcdef'
+
+# Trigram indexes only help once the query is at least one trigram long
+MIN_INDEXED_LENGTH = 3
+
+# FTS5's trigram tokenizer needs SQLite 3.34+; older builds search names with LIKE
+SQLITE_TRIGRAM = sqlite3.sqlite_version_info >= (3, 34, 0)
+
+SEARCH_INDEX_DDL = {
+    'postgresql': [
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        "CREATE INDEX IF NOT EXISTS idx_file_name_trgm ON file_records "
+        "USING gin (lower(file_name) gin_trgm_ops)"
+    ],
+    'sqlite': [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS file_records_fts USING fts5("
+        "file_name, content='file_records', content_rowid='id', tokenize='trigram')",
+        "CREATE TRIGGER IF NOT EXISTS file_records_fts_insert AFTER INSERT ON file_records BEGIN "
+        "INSERT INTO file_records_fts(rowid, file_name) VALUES (new.id, new.file_name); END",
+        "CREATE TRIGGER IF NOT EXISTS file_records_fts_delete AFTER DELETE ON file_records BEGIN "
+        "INSERT INTO file_records_fts(file_records_fts, rowid, file_name) "
+        "VALUES ('delete', old.id, old.file_name); END",
+        "CREATE TRIGGER IF NOT EXISTS file_records_fts_update AFTER UPDATE OF file_name ON file_records BEGIN "
+        "INSERT INTO file_records_fts(file_records_fts, rowid, file_name) "
+        "VALUES ('delete', old.id, old.file_name); "
+        "INSERT INTO file_records_fts(rowid, file_name) VALUES (new.id, new.file_name); END"
+    ]
+}
+
+def has_search_index(dialect_name):
+    """Whether file name search uses an index on this database."""
+    return dialect_name == 'postgresql' or (dialect_name == 'sqlite' and SQLITE_TRIGRAM)
+
+def create_search_index(connection):
+    """Create the dialect's file name search index if it does not exist yet."""
+    if not has_search_index(connection.dialect.name):
+        return
+    for statement in SEARCH_INDEX_DDL.get(connection.dialect.name, []):
+        connection.exec_driver_sql(statement)
+
+def rebuild_search_index():
+    """Create the search index and (re)fill it from existing rows."""
+    with db.engine.begin() as connection:
+        create_search_index(connection)
+        if connection.dialect.name == 'sqlite' and SQLITE_TRIGRAM:
+            connection.exec_driver_sql("INSERT INTO file_records_fts(file_records_fts) VALUES ('rebuild')")
+    return db.engine.dialect.name
+
+@event.listens_for(FileRecord.__table__, 'after_create')
+def _create_search_index(target, connection, **kwargs):
+    create_search_index(connection)
+
+def _hash_prefix_filter(value):
+    """Match file hashes starting with value using a range scan on the hash index."""
+    prefix = value[2:] if value.lower().startswith('0x') else value
+    prefix = prefix.lower()
+    if len(prefix) == 64:
+        return FileRecord.file_hash == prefix
+
+    # Hashes are lowercase hex, so the next hex digit bounds the prefix range
+    upper = prefix[:-1] + (HEX_DIGITS + 'g')[HEX_DIGITS.index(prefix[-1]) + 1]
+    return db.and_(FileRecord.file_hash >= prefix, FileRecord.file_hash < upper)
+
+def search_file_records(query, value):
+    """Narrow a FileRecord query to files whose name or hash matches value.
+
+    Returns (query, rank): rank is a relevance expression (higher is better)
+    usable in ORDER BY, or None when the database has no search index.
+    """
+    dialect = db.session.get_bind().dialect.name
+    hash_match = _hash_prefix_filter(value) if HASH_PREFIX_PATTERN.match(value) else None
+    hash_rank = case((hash_match, 1.0), else_=0.0) if hash_match is not None else literal(0.0)
+
+    if dialect == 'postgresql':
+        # lower(file_name) LIKE '%..%' is served by the pg_trgm GIN index
+        name_match = db.func.lower(FileRecord.file_name).contains(value.lower(), autoescape=True)
+        rank = db.func.similarity(db.func.lower(FileRecord.file_name), value.lower()) + hash_rank
+        matches = db.or_(name_match, hash_match) if hash_match is not None else name_match
+        return query.filter(matches), rank
+
+    if dialect == 'sqlite' and SQLITE_TRIGRAM and len(value) >= MIN_INDEXED_LENGTH:
+        # Trigram FTS5 phrase query; bm25() is lower-is-better, so negate it
+        fts = text(
+            "SELECT rowid AS id, bm25(file_records_fts) AS score "
+            "FROM file_records_fts WHERE file_records_fts MATCH :phrase"
+        ).bindparams(phrase='"' + value.replace('"', '""') + '"').columns(
+            id=Integer, score=Float
+        ).subquery('fts')
+        query = query.outerjoin(fts, fts.c.id == FileRecord.id)
+        matches = db.or_(fts.c.id.isnot(None), hash_match) if hash_match is not None else fts.c.id.isnot(None)
+        rank = db.func.coalesce(-fts.c.score, 0.0) + hash_rank
+        return query.filter(matches), rank
+
+    # Escape % and _ so they match literally; lower() keeps the old ilike's case-insensitivity
+    name_match = db.func.lower(FileRecord.file_name).contains(value.lower(), autoescape=True)
+    matches = db.or_(name_match, hash_match) if hash_match is not None else name_match
+    return query.filter(matches), None
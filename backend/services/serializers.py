@@ -0,0 +1,154 @@
+import json
+from json.encoder import encode_basestring_ascii
+from flask import current_app, jsonify, request
+from models import User, FileRecord, AuditLog
+from services.pagination import omitted_fields
+
+class InvalidFieldsError(ValueError):
+    """Raised when ?fields= names a field the resource does not have."""
+
+def _string(value):
+    return 'null' if value is None else encode_basestring_ascii(value)
+
+def _integer(value):
+    return 'null' if value is None else int.__repr__(value)
+
+def _boolean(value):
+    return 'null' if value is None else ('true' if value else 'false')
+
+def _timestamp(value):
+    # isoformat() output is plain ASCII, so it needs no escaping
+    return 'null' if value is None else f'"{value.isoformat()}"'
+
+def _json_object(value):
+    # Same as get_metadata()/get_details(): unset reads as {}
+    return json.dumps(value or {}, sort_keys=True, separators=(',', ':'))
+
+ENCODERS = {
+    'string': _string,
+    'integer': _integer,
+    'boolean': _boolean,
+    'timestamp': _timestamp,
+    'json': _json_object
+}
+
+class RawJSON(str):
+    """Already-encoded JSON spliced into a response as is."""
+
+class Schema:
+    """Projects a model's columns as tuples and encodes them straight to JSON text.
+
+    Fields mirror the model's to_dict() and are emitted in sorted key order
+    with compact separators, so the output is byte-for-byte what jsonify()
+    produces for the to_dict() version of the same rows.
+    """
+
+    def __init__(self, fields, key_columns=()):
+        # fields: {response name: (column, kind)}
+        self.fields = dict(sorted(fields.items()))
+        self.key_columns = key_columns
+
+    def select(self):
+        """Field names for this request: ?fields= picks them, ?omit= drops them."""
+        requested = request_fields()
+        names = list(self.fields)
+        if requested is not None:
+            unknown = requested - set(names)
+            if unknown:
+                raise InvalidFieldsError(f"Unknown fields: {', '.join(sorted(unknown))}")
+            names = [name for name in names if name in requested]
+        omitted = omitted_fields()
+        return [name for name in names if name not in omitted]
+
+    def project(self, query, names):
+        """Narrow an ORM query to the selected columns (plus the keyset columns paging needs)."""
+        columns = [self.fields[name][0] for name in names]
+        extra = [column for column in self.key_columns if not any(column is other for other in columns)]
+        return query.with_entities(*columns, *extra)
+
+    def iter_encoded(self, rows, names):
+        """Encode projected rows one JSON object at a time."""
+        if not names:
+            for _ in rows:
+                yield '{}'
+            return
+
+        template = '{' + ','.join(f'{encode_basestring_ascii(name)}:%s' for name in names) + '}'
+        encoders = [ENCODERS[self.fields[name][1]] for name in names]
+        for row in rows:
+            yield template % tuple([encode(value) for encode, value in zip(encoders, row)])
+
+    def encode(self, rows, names):
+        """Encode projected rows as a JSON array."""
+        return RawJSON('[' + ','.join(self.iter_encoded(rows, names)) + ']')
+
+def request_fields():
+    """Sparse fieldset from ?fields=a,b,c, or None for every field."""
+    fields = request.args.get('fields')
+    if not fields:
+        return None
+    return {field.strip() for field in fields.split(',') if field.strip()}
+
+def json_response(payload, status=200):
+    """jsonify(payload) for payloads holding RawJSON values, without decoding them again."""
+    provider = current_app.json
+    fast = (
+        getattr(provider, 'sort_keys', False) and getattr(provider, 'ensure_ascii', False)
+        and not ((provider.compact is None and current_app.debug) or provider.compact is False)
+    )
+    if not fast:
+        # Pretty-printed or customised output: let jsonify lay it out
+        return jsonify({
+            key: json.loads(value) if isinstance(value, RawJSON) else value
+            for key, value in payload.items()
+        }), status
+
+    body = '{' + ','.join(
+        encode_basestring_ascii(key) + ':' + (
+            value if isinstance(value, RawJSON) else provider.dumps(value, separators=(',', ':'))
+        )
+        for key, value in sorted(payload.items())
+    ) + '}\n'
+    return current_app.response_class(body, mimetype=provider.mimetype), status
+
+FILE_SCHEMA = Schema({
+    'id': (FileRecord.id, 'integer'),
+    'file_name': (FileRecord.file_name, 'string'),
+    'file_hash': (FileRecord.file_hash, 'string'),
+    'file_size': (FileRecord.file_size, 'integer'),
+    'file_type': (FileRecord.file_type, 'string'),
+    'ipfs_hash': (FileRecord.ipfs_hash, 'string'),
+    'transaction_hash': (FileRecord.transaction_hash, 'string'),
+    'block_number': (FileRecord.block_number, 'integer'),
+    'gas_used': (FileRecord.gas_used, 'integer'),
+    'wallet_address': (FileRecord.wallet_address, 'string'),
+    'upload_status': (FileRecord.upload_status, 'string'),
+    'metadata': (FileRecord.file_metadata, 'json'),
+    'user_id': (FileRecord.user_id, 'integer'),
+    'created_at': (FileRecord.created_at, 'timestamp'),
+    'updated_at': (FileRecord.updated_at, 'timestamp'),
+    'uploaded_at': (FileRecord.uploaded_at, 'timestamp')
+}, key_columns=(FileRecord.created_at, FileRecord.id))
+
+AUDIT_LOG_SCHEMA = Schema({
+    'id': (AuditLog.id, 'integer'),
+    'action': (AuditLog.action, 'string'),
+    'resource_type': (AuditLog.resource_type, 'string'),
+    'resource_id': (AuditLog.resource_id, 'string'),
+    'user_id': (AuditLog.user_id, 'integer'),
+    'ip_address': (AuditLog.ip_address, 'string'),
+    'user_agent': (AuditLog.user_agent, 'string'),
+    'details': (AuditLog.details, 'json'),
+    'timestamp': (AuditLog.timestamp, 'timestamp')
+}, key_columns=(AuditLog.timestamp, AuditLog.id))
+
+USER_SCHEMA = Schema({
+    'id': (User.id, 'integer'),
+    'email': (User.email, 'string'),
+    'name': (User.name, 'string'),
+    'wallet_address': (User.wallet_address, 'string'),
+    'is_active': (User.is_active, 'boolean'),
+    'is_admin': (User.is_admin, 'boolean'),
+    'created_at': (User.created_at, 'timestamp'),
+    'updated_at': (User.updated_at, 'timestamp')
+}, key_columns=(User.created_at, User.id))
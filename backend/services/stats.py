@@ -0,0 +1,336 @@
+import random
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import func, and_, case, event
+from sqlalchemy.exc import IntegrityError
+from flask_sqlalchemy.session import Session
+from models import db, FileRecord, VerificationLog, User, SystemStats, UserStats
+
+# Counters kept in SystemStats and updated in the same transaction as the write they count
+TOTAL_FILES = 'total_files'
+TOTAL_SIZE = 'total_size'
+TOTAL_VERIFICATIONS = 'total_verifications'
+SUCCESSFUL_VERIFICATIONS = 'successful_verifications'
+ACTIVE_USERS = 'active_users'
+
+COUNTERS = [TOTAL_FILES, TOTAL_SIZE, TOTAL_VERIFICATIONS, SUCCESSFUL_VERIFICATIONS, ACTIVE_USERS]
+
+# Change counters behind response ETags: bumped by every counted write (and per user by
+# writes to that user's files or verifications); a reconcile bumps the epoch
+DATA_VERSION = 'data_version'
+DATA_EPOCH = 'data_epoch'
+
+# Daily upload counters cover two growth windows (last 30 days vs the 30 before)
+GROWTH_WINDOW_DAYS = 30
+
+def daily_files_stat(day):
+    """Get the SystemStats name of the upload counter for a calendar day."""
+    return f'files_on:{day.isoformat()}'
+
+def user_version_stat(user_id):
+    """Get the SystemStats name of a user's change counter."""
+    return f'{DATA_VERSION}:{int(user_id)}'
+
+def increment_row(model, keys, deltas, values=None):
+    """Add deltas to one row's columns, creating the row on first write (caller commits)."""
+    changes = {getattr(model, column): getattr(model, column) + delta for column, delta in deltas.items()}
+    changes.update({getattr(model, column): value for column, value in (values or {}).items()})
+
+    updated = model.query.filter_by(**keys).update(changes, synchronize_session=False)
+    if not updated:
+        # First write of this row; another request may create it concurrently
+        try:
+            with db.session.begin_nested():
+                db.session.add(model(**keys, **deltas, **(values or {})))
+        except IntegrityError:
+            model.query.filter_by(**keys).update(changes, synchronize_session=False)
+
+def counter_stat_names(name):
+    """Get the SystemStats rows a counter is spread over (the plain name is shard 0)."""
+    return [name] + [f'{name}#{shard}' for shard in range(1, current_app.config['STATS_COUNTER_SHARDS'])]
+
+def counter_shard(name):
+    """Pick the row one write to a counter goes to, so concurrent writers rarely wait on the same row lock."""
+    shard = random.randrange(current_app.config['STATS_COUNTER_SHARDS'])
+    return f'{name}#{shard}' if shard else name
+
+def read_counters(names):
+    """Sum each counter over its shards in one query; counters without rows are left out."""
+    counters = {stat_name: name for name in names for stat_name in counter_stat_names(name)}
+    values = {}
+    rows = db.session.query(SystemStats.stat_name, SystemStats.stat_value).filter(
+        SystemStats.stat_name.in_(counters)
+    )
+    for stat_name, value in rows:
+        name = counters[stat_name]
+        values[name] = values.get(name, 0) + (value or 0)
+    return values
+
+def increment_counters(deltas, now=None):
+    """Add deltas to counter shards in name order, so transactions never lock rows in opposite orders."""
+    now = now or datetime.utcnow()
+    for name, delta in sorted(deltas.items()):
+        if delta:
+            increment_row(SystemStats, {'stat_name': counter_shard(name)}, {'stat_value': delta}, {'last_updated': now})
+
+def increment_many(deltas):
+    """Add deltas to counters inside the caller's transaction (caller commits)."""
+    if any(deltas.values()):
+        increment_counters(deltas)
+        bump_versions()
+
+def bump_versions(user_ids=()):
+    """Mark data as changed for everyone and for each of user_ids (caller commits)."""
+    names = [DATA_VERSION] + [user_version_stat(user_id) for user_id in set(user_ids) if user_id is not None]
+    increment_counters({name: 1 for name in names})
+
+def file_added_deltas(file_record, deltas=None):
+    """Accumulate the counter changes for a new file record."""
+    deltas = deltas if deltas is not None else {}
+    day = (file_record.created_at or datetime.utcnow()).date()
+    deltas[TOTAL_FILES] = deltas.get(TOTAL_FILES, 0) + 1
+    deltas[TOTAL_SIZE] = deltas.get(TOTAL_SIZE, 0) + (file_record.file_size or 0)
+    deltas[daily_files_stat(day)] = deltas.get(daily_files_stat(day), 0) + 1
+    return deltas
+
+def verification_deltas(verification_result, deltas=None):
+    """Accumulate the counter changes for a new verification log."""
+    deltas = deltas if deltas is not None else {}
+    deltas[TOTAL_VERIFICATIONS] = deltas.get(TOTAL_VERIFICATIONS, 0) + 1
+    if verification_result:
+        deltas[SUCCESSFUL_VERIFICATIONS] = deltas.get(SUCCESSFUL_VERIFICATIONS, 0) + 1
+    return deltas
+
+def user_file_deltas(file_record, user_deltas=None, sign=1):
+    """Accumulate the per-user counter changes for an added (or removed) file."""
+    user_deltas = user_deltas if user_deltas is not None else {}
+    if file_record.user_id is not None:
+        deltas = user_deltas.setdefault(int(file_record.user_id), {})
+        deltas['total_files'] = deltas.get('total_files', 0) + sign
+        deltas['total_size'] = deltas.get('total_size', 0) + sign * (file_record.file_size or 0)
+    return user_deltas
+
+def user_verification_deltas(user_id, verification_result, user_deltas=None, sign=1):
+    """Accumulate the per-user counter changes for a verification attempt."""
+    user_deltas = user_deltas if user_deltas is not None else {}
+    if user_id is not None:
+        deltas = user_deltas.setdefault(int(user_id), {})
+        deltas['total_verifications'] = deltas.get('total_verifications', 0) + sign
+        if verification_result:
+            deltas['successful_verifications'] = deltas.get('successful_verifications', 0) + sign
+    return user_deltas
+
+def increment_users(user_deltas):
+    """Apply per-user deltas inside the caller's transaction.
+
+    Only existing rows are updated; a user without a row gets one computed
+    from the source tables on first read, which already includes this write.
+    """
+    now = datetime.utcnow()
+    for user_id, deltas in sorted(user_deltas.items()):
+        changes = {
+            getattr(UserStats, column): getattr(UserStats, column) + delta
+            for column, delta in deltas.items() if delta
+        }
+        if changes:
+            changes[UserStats.last_updated] = now
+            UserStats.query.filter_by(user_id=user_id).update(changes, synchronize_session=False)
+    changed_users = [user_id for user_id, deltas in user_deltas.items() if any(deltas.values())]
+    if changed_users:
+        bump_versions(changed_users)
+
+def record_file_added(file_record):
+    """Count an uploaded file."""
+    increment_many(file_added_deltas(file_record))
+    increment_users(user_file_deltas(file_record))
+
+def record_file_removed(file_record):
+    """Uncount a deleted file."""
+    increment_many({
+        name: -delta for name, delta in file_added_deltas(file_record).items()
+    })
+    increment_users(user_file_deltas(file_record, sign=-1))
+
+def record_user_registered():
+    """Count a newly registered (active) user."""
+    increment_many({ACTIVE_USERS: 1})
+
+@event.listens_for(Session, 'before_flush')
+def _track_active_users(session, flush_context, instances):
+    """Note activations, deactivations and deletions of existing users for the next commit."""
+    delta = 0
+    for user in session.dirty:
+        if isinstance(user, User):
+            history = db.inspect(user).attrs.is_active.history
+            if history.has_changes():
+                if history.deleted:
+                    was_active = bool(history.deleted[0])
+                else:
+                    # The old value was never loaded; the row still holds it until this flush
+                    was_active = bool(session.query(User.is_active).filter(User.id == user.id).scalar())
+                delta += int(bool(user.is_active)) - int(was_active)
+    for user in session.deleted:
+        if isinstance(user, User) and user.is_active:
+            delta -= 1
+    if delta:
+        session.info['active_users_delta'] = session.info.get('active_users_delta', 0) + delta
+
+@event.listens_for(Session, 'before_commit')
+def _count_active_users(session):
+    session.flush()
+    delta = session.info.pop('active_users_delta', 0)
+    if delta:
+        increment_many({ACTIVE_USERS: delta})
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _forget_active_users(session, previous_transaction):
+    if not previous_transaction.nested:
+        session.info.pop('active_users_delta', None)
+
+def reconcile_stats():
+    """Recompute every counter from the source tables and overwrite the rollups."""
+    now = datetime.utcnow()
+    window_start = (now - timedelta(days=2 * GROWTH_WINDOW_DAYS)).date()
+
+    values = {
+        TOTAL_FILES: FileRecord.query.count(),
+        TOTAL_SIZE: db.session.query(func.sum(FileRecord.file_size)).scalar() or 0,
+        TOTAL_VERIFICATIONS: VerificationLog.query.count(),
+        SUCCESSFUL_VERIFICATIONS: VerificationLog.query.filter_by(verification_result=True).count(),
+        ACTIVE_USERS: User.query.filter_by(is_active=True).count()
+    }
+
+    for day_offset in range(2 * GROWTH_WINDOW_DAYS + 1):
+        day = window_start + timedelta(days=day_offset)
+        day_start = datetime.combine(day, datetime.min.time())
+        values[daily_files_stat(day)] = FileRecord.query.filter(
+            and_(FileRecord.created_at >= day_start, FileRecord.created_at < day_start + timedelta(days=1))
+        ).count()
+
+    existing = {
+        stat.stat_name: stat
+        for stat in SystemStats.query.filter(SystemStats.stat_name.in_(values)).all()
+    }
+    for name, value in values.items():
+        stat = existing.get(name)
+        if stat:
+            stat.stat_value = value
+            stat.last_updated = now
+        else:
+            db.session.add(SystemStats(stat_name=name, stat_value=value, last_updated=now))
+
+    # The recomputed value lives in shard 0; the other shards start again from zero
+    SystemStats.query.filter(
+        SystemStats.stat_name.in_([shard for name in values for shard in counter_stat_names(name)[1:]])
+    ).delete(synchronize_session=False)
+
+    # Daily counters older than both growth windows are never read again
+    SystemStats.query.filter(
+        SystemStats.stat_name.like('files_on:%'),
+        SystemStats.stat_name < daily_files_stat(window_start)
+    ).delete(synchronize_session=False)
+
+    reconcile_user_stats()
+    increment_many({DATA_EPOCH: 1})
+
+    db.session.commit()
+    return values
+
+def _file_totals():
+    return db.session.query(
+        FileRecord.user_id.label('user_id'),
+        func.count(FileRecord.id).label('total_files'),
+        func.coalesce(func.sum(FileRecord.file_size), 0).label('total_size')
+    )
+
+def _verification_totals():
+    return db.session.query(
+        VerificationLog.user_id.label('user_id'),
+        func.count(VerificationLog.id).label('total_verifications'),
+        func.coalesce(
+            func.sum(case((VerificationLog.verification_result.is_(True), 1), else_=0)), 0
+        ).label('successful_verifications')
+    )
+
+def compute_user_stats(user_id):
+    """Compute a user's counters from the source tables in one round trip."""
+    files = _file_totals().filter(FileRecord.user_id == user_id).group_by(FileRecord.user_id).subquery()
+    verifications = _verification_totals().filter(
+        VerificationLog.user_id == user_id
+    ).group_by(VerificationLog.user_id).subquery()
+
+    # Both sides are at most one row; outer-join them onto the user so missing sides read as zero
+    row = db.session.query(
+        func.coalesce(files.c.total_files, 0),
+        func.coalesce(files.c.total_size, 0),
+        func.coalesce(verifications.c.total_verifications, 0),
+        func.coalesce(verifications.c.successful_verifications, 0)
+    ).select_from(User).outerjoin(
+        files, files.c.user_id == User.id
+    ).outerjoin(
+        verifications, verifications.c.user_id == User.id
+    ).filter(User.id == user_id).first()
+
+    total_files, total_size, total_verifications, successful_verifications = row or (0, 0, 0, 0)
+    return {
+        'total_files': total_files,
+        'total_size': total_size,
+        'total_verifications': total_verifications,
+        'successful_verifications': successful_verifications
+    }
+
+def reconcile_user_stats():
+    """Recompute every existing per-user counters row (caller commits)."""
+    values = {}
+    for row in _file_totals().filter(FileRecord.user_id.isnot(None)).group_by(FileRecord.user_id):
+        values.setdefault(row.user_id, {}).update(total_files=row.total_files, total_size=row.total_size)
+    for row in _verification_totals().filter(VerificationLog.user_id.isnot(None)).group_by(VerificationLog.user_id):
+        values.setdefault(row.user_id, {}).update(
+            total_verifications=row.total_verifications,
+            successful_verifications=row.successful_verifications
+        )
+
+    now = datetime.utcnow()
+    for stats in UserStats.query.all():
+        user_values = values.get(stats.user_id, {})
+        stats.total_files = user_values.get('total_files', 0)
+        stats.total_size = user_values.get('total_size', 0)
+        stats.total_verifications = user_values.get('total_verifications', 0)
+        stats.successful_verifications = user_values.get('successful_verifications', 0)
+        stats.last_updated = now
+
+def get_user_counters(user_id):
+    """Get a user's counters row, computing and storing it on first use."""
+    user_id = int(user_id)
+    stats = db.session.get(UserStats, user_id)
+    if stats is not None:
+        return stats
+
+    stats = UserStats(user_id=user_id, last_updated=datetime.utcnow(), **compute_user_stats(user_id))
+    try:
+        with db.session.begin_nested():
+            db.session.add(stats)
+        db.session.commit()
+    except IntegrityError:
+        # A concurrent request created the row first
+        stats = db.session.get(UserStats, user_id)
+    return stats
+
+def get_overview_stats():
+    """Read overview counters from the rollup rows (zero until flask reconcile-stats first runs)."""
+    today = datetime.utcnow().date()
+    days = [today - timedelta(days=offset) for offset in range(2 * GROWTH_WINDOW_DAYS)]
+    values = read_counters(COUNTERS + [daily_files_stat(day) for day in days])
+
+    recent_files = sum(values.get(daily_files_stat(day), 0) for day in days[:GROWTH_WINDOW_DAYS])
+    previous_files = sum(values.get(daily_files_stat(day), 0) for day in days[GROWTH_WINDOW_DAYS:])
+
+    return {
+        'total_files': values.get(TOTAL_FILES, 0),
+        'total_size': values.get(TOTAL_SIZE, 0),
+        'total_verifications': values.get(TOTAL_VERIFICATIONS, 0),
+        'successful_verifications': values.get(SUCCESSFUL_VERIFICATIONS, 0),
+        'total_users': values.get(ACTIVE_USERS, 0),
+        'recent_files': recent_files,
+        'previous_files': previous_files
+    }
@@ -0,0 +1,164 @@
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from sqlalchemy import func, desc
+from models import db, FileRecord, VerificationLog, HourlyTrend, DailyTrend, DailyFileTypeTrend
+from services.stats import increment_row
+
+# Range of the widest trend chart (90d); hourly buckets are kept this long for the heatmap
+MAX_TREND_DAYS = 90
+
+def hour_bucket(timestamp):
+    """Truncate a timestamp to the start of its hour."""
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+def day_bucket(timestamp):
+    """Truncate a timestamp to midnight."""
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+class TrendDeltas:
+    """Collects bucket changes for a write and applies them in the caller's transaction."""
+
+    def __init__(self):
+        self.hourly = defaultdict(Counter)
+        self.daily = defaultdict(Counter)
+        self.file_types = Counter()
+
+    def add_file(self, created_at, file_type, sign=1):
+        """Count (or with sign=-1, uncount) an upload."""
+        created_at = created_at or datetime.utcnow()
+        self.hourly[hour_bucket(created_at)]['uploads'] += sign
+        self.daily[day_bucket(created_at)]['uploads'] += sign
+        self.file_types[(day_bucket(created_at), file_type or '')] += sign
+        return self
+
+    def add_verification(self, verified_at, verification_result, sign=1):
+        """Count (or with sign=-1, uncount) a verification attempt."""
+        verified_at = verified_at or datetime.utcnow()
+        for bucket in (self.hourly[hour_bucket(verified_at)], self.daily[day_bucket(verified_at)]):
+            bucket['verifications'] += sign
+            if verification_result:
+                bucket['successful_verifications'] += sign
+        return self
+
+    def apply(self):
+        """Write the accumulated deltas; buckets are visited in time order to keep lock order stable."""
+        now = datetime.utcnow()
+        for bucket_start, deltas in sorted(self.hourly.items()):
+            deltas = {column: delta for column, delta in deltas.items() if delta}
+            if deltas:
+                increment_row(HourlyTrend, {'bucket_start': bucket_start}, deltas, {
+                    'hour_of_day': bucket_start.hour,
+                    'last_updated': now
+                })
+
+        for bucket_start, deltas in sorted(self.daily.items()):
+            deltas = {column: delta for column, delta in deltas.items() if delta}
+            if deltas:
+                increment_row(DailyTrend, {'bucket_start': bucket_start}, deltas, {'last_updated': now})
+
+        for (bucket_start, file_type), delta in sorted(self.file_types.items()):
+            if delta:
+                increment_row(
+                    DailyFileTypeTrend,
+                    {'bucket_start': bucket_start, 'file_type': file_type},
+                    {'uploads': delta},
+                    {'last_updated': now}
+                )
+
+def record_upload_trend(file_record, sign=1):
+    """Bucket an uploaded (or with sign=-1, deleted) file."""
+    TrendDeltas().add_file(file_record.created_at, file_record.file_type, sign).apply()
+
+def rebuild_trends(days=MAX_TREND_DAYS):
+    """Recompute the buckets of the last `days` days from the source tables."""
+    start = day_bucket(datetime.utcnow() - timedelta(days=days))
+
+    for model in (HourlyTrend, DailyTrend, DailyFileTypeTrend):
+        model.query.filter(model.bucket_start >= start).delete(synchronize_session=False)
+
+    # Bucketing happens in Python so it is identical on every database
+    deltas = TrendDeltas()
+    files = db.session.query(FileRecord.created_at, FileRecord.file_type).filter(
+        FileRecord.created_at >= start
+    ).yield_per(1000)
+    for created_at, file_type in files:
+        deltas.add_file(created_at, file_type)
+
+    verifications = db.session.query(VerificationLog.verified_at, VerificationLog.verification_result).filter(
+        VerificationLog.verified_at >= start
+    ).yield_per(1000)
+    for verified_at, verification_result in verifications:
+        deltas.add_verification(verified_at, verification_result)
+
+    deltas.apply()
+    db.session.commit()
+    return len(deltas.hourly), len(deltas.daily)
+
+def compact_trends(hourly_retention_days=MAX_TREND_DAYS, daily_retention_days=400):
+    """Drop buckets past retention and rows that deletes have brought back to zero."""
+    now = datetime.utcnow()
+    removed = HourlyTrend.query.filter(
+        db.or_(
+            HourlyTrend.bucket_start < hour_bucket(now - timedelta(days=hourly_retention_days)),
+            db.and_(HourlyTrend.uploads == 0, HourlyTrend.verifications == 0)
+        )
+    ).delete(synchronize_session=False)
+
+    daily_cutoff = day_bucket(now - timedelta(days=daily_retention_days))
+    removed += DailyTrend.query.filter(
+        db.or_(
+            DailyTrend.bucket_start < daily_cutoff,
+            db.and_(DailyTrend.uploads == 0, DailyTrend.verifications == 0)
+        )
+    ).delete(synchronize_session=False)
+    removed += DailyFileTypeTrend.query.filter(
+        db.or_(DailyFileTypeTrend.bucket_start < daily_cutoff, DailyFileTypeTrend.uploads == 0)
+    ).delete(synchronize_session=False)
+
+    db.session.commit()
+    return removed
+
+def get_trend_series(start_date, hourly=False):
+    """Assemble the trend chart series from bucket rows starting at start_date."""
+    if DailyTrend.query.first() is None:
+        rebuild_trends()
+
+    if hourly:
+        upload_buckets = HourlyTrend.query.filter(
+            HourlyTrend.bucket_start >= hour_bucket(start_date),
+            HourlyTrend.uploads > 0
+        ).order_by(HourlyTrend.bucket_start).all()
+    else:
+        upload_buckets = DailyTrend.query.filter(
+            DailyTrend.bucket_start >= day_bucket(start_date),
+            DailyTrend.uploads > 0
+        ).order_by(DailyTrend.bucket_start).all()
+
+    verification_buckets = DailyTrend.query.filter(
+        DailyTrend.bucket_start >= day_bucket(start_date),
+        DailyTrend.verifications > 0
+    ).order_by(DailyTrend.bucket_start).all()
+
+    file_type_count = func.sum(DailyFileTypeTrend.uploads).label('count')
+    file_types = db.session.query(DailyFileTypeTrend.file_type, file_type_count).filter(
+        DailyFileTypeTrend.bucket_start >= day_bucket(start_date)
+    ).group_by(
+        DailyFileTypeTrend.file_type
+    ).having(file_type_count > 0).order_by(desc('count')).limit(10).all()
+
+    activity = func.sum(HourlyTrend.uploads).label('activity')
+    user_activity = db.session.query(HourlyTrend.hour_of_day, activity).filter(
+        HourlyTrend.bucket_start >= hour_bucket(start_date)
+    ).group_by(
+        HourlyTrend.hour_of_day
+    ).having(activity > 0).order_by(HourlyTrend.hour_of_day).all()
+
+    return {
+        'uploads': [(bucket.bucket_start, bucket.uploads) for bucket in upload_buckets],
+        'verifications': [
+            (bucket.bucket_start, bucket.verifications, bucket.successful_verifications)
+            for bucket in verification_buckets
+        ],
+        'file_types': [(file_type or None, count) for file_type, count in file_types],
+        'user_activity': [(hour, count) for hour, count in user_activity]
+    }
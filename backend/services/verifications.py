@@ -0,0 +1,90 @@
+import os
+import threading
+from datetime import datetime
+from flask import current_app
+from models import db, FileRecord, VerificationLog
+from services.stats import increment_many, verification_deltas, increment_users, user_verification_deltas
+from services.trends import TrendDeltas
+from services.write_behind import WriteBehindQueue
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def persist_verifications(rows):
+    """Bulk-insert queued verification logs and their counter updates in one transaction."""
+    # Files deleted after the verification was answered no longer satisfy the foreign key
+    file_ids = {row['file_record_id'] for row in rows if row.get('file_record_id')}
+    if file_ids:
+        live_ids = {
+            file_id for (file_id,) in db.session.query(FileRecord.id).filter(FileRecord.id.in_(file_ids))
+        }
+        for row in rows:
+            if row.get('file_record_id') and row['file_record_id'] not in live_ids:
+                row['file_record_id'] = None
+
+    stat_deltas = {}
+    user_deltas = {}
+    trend_deltas = TrendDeltas()
+    for row in rows:
+        verification_deltas(row['verification_result'], stat_deltas)
+        user_verification_deltas(row.get('user_id'), row['verification_result'], user_deltas)
+        trend_deltas.add_verification(row['verified_at'], row['verification_result'])
+
+    try:
+        db.session.bulk_insert_mappings(VerificationLog, rows)
+        increment_many(stat_deltas)
+        increment_users(user_deltas)
+        trend_deltas.apply()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+def get_verification_writer():
+    """Get the write-behind verification log queue for this worker process."""
+    global _writer
+
+    if _writer is None or _writer.pid != os.getpid():
+        with _writer_lock:
+            if _writer is None or _writer.pid != os.getpid():
+                config = current_app.config
+                _writer = WriteBehindQueue(
+                    current_app._get_current_object(),
+                    persist_verifications,
+                    max_batch=config['VERIFICATION_LOG_BATCH_SIZE'],
+                    flush_interval=config['VERIFICATION_LOG_FLUSH_INTERVAL'],
+                    max_queue=config['VERIFICATION_LOG_QUEUE_SIZE'],
+                    name='verification-log-writer'
+                )
+
+    return _writer
+
+def verification_row(file_hash, verification_result, verification_method, user_id=None,
+                     file_record_id=None, blockchain_data=None):
+    """Build a queued verification log row timestamped now."""
+    return {
+        'file_hash': file_hash,
+        'verification_result': verification_result,
+        'verification_method': verification_method,
+        'user_id': user_id,
+        'file_record_id': file_record_id,
+        'blockchain_data': blockchain_data or None,
+        'verified_at': datetime.utcnow()
+    }
+
+def log_verifications(rows):
+    """Record verification attempts without waiting for the database.
+
+    Rows are persisted by the write-behind queue within
+    VERIFICATION_LOG_FLUSH_INTERVAL seconds; with
+    VERIFICATION_LOG_WRITE_BEHIND=false they are bulk-written before returning.
+    """
+    if current_app.config['VERIFICATION_LOG_WRITE_BEHIND']:
+        # Queued together; rows the queue has no room for are written now in one transaction
+        get_verification_writer().submit_many(rows)
+    elif rows:
+        persist_verifications(rows)
+
+def log_verification(*args, **kwargs):
+    """Record one verification attempt (see verification_row for arguments)."""
+    log_verifications([verification_row(*args, **kwargs)])
@@ -0,0 +1,467 @@
+import os
+import math
+import mmap
+import time
+import fcntl
+import struct
+import hashlib
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import any_, bindparam, String
+from sqlalchemy.dialects.postgresql import ARRAY
+from models import db, FileRecord
+
+# magic, hash count, retired flag, counter count, items, delete epoch, building flag, build start
+# (filters written before the build start field read it from the zero padding as 0)
+HEADER = struct.Struct('<8sIIQQQQQ')
+HEADER_SIZE = 64
+MAGIC = b'HASHBF01'
+MAX_COUNTER = 255
+
+# Bound parameters per IN (...) query on databases without array parameters
+IN_QUERY_CHUNK = 500
+
+# A process rebuilds a filter built before it started (each worker, flask index-chain)
+PROCESS_STARTED_AT = int(time.time())
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def filter_dimensions(capacity, error_rate):
+    """Get (counters, hash count) for a Bloom filter of capacity items at error_rate."""
+    size = int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+    hashes = max(1, int(round(size / capacity * math.log(2))))
+    return size, hashes
+
+class HashFilter:
+    """Counting Bloom filter over file hashes in a memory-mapped file shared by all workers.
+
+    Counters are single bytes so deletes can be applied in place. Writers
+    serialize on an flock; readers never lock. Every error the filter can
+    make is a false "maybe present", which only costs a database lookup.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'r+b')
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        magic, self.hashes, _, self.size, _, _, _, _ = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f'{path} is not a file hash filter')
+
+    @classmethod
+    def create(cls, path, capacity, error_rate):
+        """Write an empty filter file at path."""
+        size, hashes = filter_dimensions(capacity, error_rate)
+        with open(path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, hashes, 0, size, 0, 0, 0, int(time.time())).ljust(HEADER_SIZE, b'\0'))
+            f.truncate(HEADER_SIZE + size)
+        return cls(path)
+
+    def _positions(self, file_hash):
+        digest = hashlib.blake2b(file_hash.encode(), digest_size=16).digest()
+        h1, h2 = struct.unpack('<QQ', digest)
+        return [HEADER_SIZE + (h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def _header(self):
+        return HEADER.unpack_from(self._map, 0)
+
+    def _write_header(self, items, epoch, retired=0, building=0):
+        built_at = self._header()[7]
+        HEADER.pack_into(self._map, 0, MAGIC, self.hashes, retired, self.size, items, epoch, building, built_at)
+
+    @property
+    def items(self):
+        return self._header()[4]
+
+    @property
+    def epoch(self):
+        """Counter bumped on every delete or change, used to expire cached lookups."""
+        return self._header()[5]
+
+    @property
+    def built_at(self):
+        """Unix time the scan that filled this filter started."""
+        return self._header()[7]
+
+    @property
+    def retired(self):
+        """True once a rebuilt filter has replaced this file."""
+        return bool(self._header()[2])
+
+    @contextmanager
+    def locked(self):
+        """Hold the cross-process write lock."""
+        fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+
+    def might_contain(self, file_hash):
+        """Check membership: False means the hash is definitely not registered."""
+        counters = self._map
+        return all(counters[position] for position in self._positions(file_hash))
+
+    def add(self, file_hash):
+        """Count a registered hash; returns False if the file was retired meanwhile."""
+        positions = self._positions(file_hash)
+        with self.locked():
+            _, _, retired, _, items, epoch, building, _ = self._header()
+            if retired:
+                return False
+            for position in positions:
+                if self._map[position] < MAX_COUNTER:
+                    self._map[position] += 1
+            self._write_header(items + 1, epoch, building=building)
+
+            if building:
+                # A rebuild is scanning the database; journal adds it may miss
+                with open(f'{self.path}.journal', 'a') as journal:
+                    journal.write(file_hash + '\n')
+        return True
+
+    def remove(self, file_hash):
+        """Uncount a deleted hash; hashes the filter never saw are left alone."""
+        positions = self._positions(file_hash)
+        with self.locked():
+            _, _, retired, _, items, epoch, building, _ = self._header()
+            if all(self._map[position] for position in positions):
+                for position in positions:
+                    # Saturated counters stay put; they may be shared with other hashes
+                    if self._map[position] < MAX_COUNTER:
+                        self._map[position] -= 1
+                items = max(items - 1, 0)
+            self._write_header(items, epoch + 1, retired, building)
+
+    def touch(self):
+        """Bump the epoch so cached lookups are re-read after a record changes."""
+        with self.locked():
+            _, _, retired, _, items, epoch, building, _ = self._header()
+            self._write_header(items, epoch + 1, retired, building)
+
+    def set_building(self, building):
+        """Start or stop journaling adds for a rebuild in progress."""
+        with self.locked():
+            _, _, retired, _, items, epoch, _, _ = self._header()
+            self._write_header(items, epoch, retired, int(building))
+
+    def retire(self):
+        """Flag this file as replaced so workers reopen the filter path (caller holds the lock)."""
+        _, _, _, _, items, epoch, _, _ = self._header()
+        self._write_header(items, epoch + 1, retired=1)
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+@contextmanager
+def journal_lock(path):
+    """Hold the lock ordering journaled adds (while no filter exists) against the first swap."""
+    with open(f'{path}.journal.lock', 'w') as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+def build_filter(path, capacity, error_rate, old_filter=None):
+    """Build a filter from every registered hash and atomically swap it in at path.
+
+    While the scan runs new hashes are journaled: by the old filter, or by
+    file_added itself when there is no filter yet. The journal and files
+    created since shortly before the scan are replayed under the old
+    filter's lock (the journal lock for a first build), and the old file
+    is retired in the same critical section.
+    """
+    started_at = datetime.utcnow()
+    journal_path = f'{path}.journal'
+    if old_filter is not None:
+        old_filter.set_building(True)
+
+    total = FileRecord.query.count()
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    new_filter = HashFilter.create(temp_path, max(capacity, 2 * total), error_rate)
+
+    try:
+        for (file_hash,) in db.session.query(FileRecord.file_hash).yield_per(10000):
+            new_filter.add(file_hash)
+
+        with old_filter.locked() if old_filter is not None else journal_lock(path):
+            replay = {
+                file_hash for (file_hash,) in db.session.query(FileRecord.file_hash).filter(
+                    FileRecord.created_at >= started_at - timedelta(minutes=1)
+                )
+            }
+            if os.path.exists(journal_path):
+                with open(journal_path) as journal:
+                    replay.update(line.strip() for line in journal if line.strip())
+
+            # Counting a hash twice is safe (a stale "maybe"); missing one is not
+            for file_hash in replay:
+                new_filter.add(file_hash)
+
+            items = new_filter.items
+            new_filter.close()
+            os.replace(temp_path, path)
+            if old_filter is not None:
+                old_filter.retire()
+            if os.path.exists(journal_path):
+                os.remove(journal_path)
+    except Exception:
+        if old_filter is not None and not old_filter.retired:
+            old_filter.set_building(False)
+        if os.path.exists(temp_path):
+            new_filter.close()
+            os.remove(temp_path)
+        raise
+
+    return items
+
+def cache_entry(file_record):
+    """Get the cached form of a file record: its id and public verification details."""
+    return {
+        'file_record_id': file_record.id,
+        'details': {
+            'file_name': file_record.file_name,
+            'file_size': file_record.file_size,
+            'upload_time': file_record.uploaded_at.isoformat() if file_record.uploaded_at else None,
+            'uploader_address': file_record.wallet_address,
+            'transaction_hash': file_record.transaction_hash,
+            'block_number': file_record.block_number,
+            'ipfs_hash': file_record.ipfs_hash
+        }
+    }
+
+def find_file_records(file_hashes):
+    """Fetch the file records for many hashes with set-based queries."""
+    if db.session.get_bind().dialect.name == 'postgresql':
+        # One query with a single array parameter: file_hash = ANY(:hashes)
+        hashes = bindparam('hashes', list(file_hashes), type_=ARRAY(String))
+        return FileRecord.query.filter(FileRecord.file_hash == any_(hashes)).all()
+
+    file_hashes = list(file_hashes)
+    records = []
+    for start in range(0, len(file_hashes), IN_QUERY_CHUNK):
+        records.extend(FileRecord.query.filter(
+            FileRecord.file_hash.in_(file_hashes[start:start + IN_QUERY_CHUNK])
+        ).all())
+    return records
+
+class VerifyCache:
+    """Two-tier verify-by-hash lookup: a per-worker LRU of known files in
+    front of the shared hash filter.
+
+    The filter only sees hashes registered through processes sharing its
+    filter_path on this host. Other replicas, and records written outside
+    the app, never reach it, so by default a filter miss is confirmed in
+    the database. Set trust_misses only when every process that writes
+    FileRecords runs on this host with the same filter_path; then a miss
+    is answered from the filter alone. Each process rebuilds a filter
+    built before it started, in the background, so restarts reconcile
+    the filter with the database.
+    """
+
+    def __init__(self, filter_path, capacity=1000000, error_rate=0.01, max_entries=10000, trust_misses=False):
+        self.filter_path = filter_path
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.max_entries = max_entries
+        self.trust_misses = trust_misses
+        self.pid = os.getpid()
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._filter = None
+        self._build_failed_at = 0
+        self._refresh_started = False
+
+    def _open_filter(self):
+        """Open the shared filter, building it first if no worker has yet."""
+        if self._filter is not None and not self._filter.retired:
+            return self._filter
+
+        with self._lock:
+            if self._filter is not None and self._filter.retired:
+                self._filter.close()
+                self._filter = None
+                self._entries.clear()
+
+            if self._filter is None:
+                if not os.path.exists(self.filter_path):
+                    # Retry a failed build at most once a minute
+                    if time.monotonic() - self._build_failed_at < 60:
+                        return None
+                    if not self._build_exclusively():
+                        return None
+                self._filter = HashFilter(self.filter_path)
+
+                if self._filter.built_at < PROCESS_STARTED_AT and not self._refresh_started:
+                    self._refresh_started = True
+                    threading.Thread(
+                        target=self._refresh, args=(current_app._get_current_object(),),
+                        name='verify-filter-refresh', daemon=True
+                    ).start()
+
+        return self._filter
+
+    def _refresh(self, app):
+        """Rebuild a filter left over from before this process started, unless another process is."""
+        with app.app_context(), open(f'{self.filter_path}.lock', 'w') as lock_file:
+            try:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return
+            try:
+                hash_filter = self._open_filter()
+                # Another process may have finished a rebuild since this one opened the file
+                if hash_filter is not None and hash_filter.built_at < PROCESS_STARTED_AT:
+                    items = build_filter(self.filter_path, self.capacity, self.error_rate, hash_filter)
+                    print(f"Hash filter rebuilt on startup with {items} file hashes")
+            except Exception as e:
+                print(f"Hash filter rebuild error: {e}")
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+                db.session.remove()
+
+    def _build_exclusively(self):
+        """Build the filter unless another worker already is; returns whether it exists."""
+        with open(f'{self.filter_path}.lock', 'w') as lock_file:
+            try:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return False
+            try:
+                if not os.path.exists(self.filter_path):
+                    build_filter(self.filter_path, self.capacity, self.error_rate)
+                return True
+            except Exception as e:
+                print(f"Hash filter build error: {e}")
+                self._build_failed_at = time.monotonic()
+                return False
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def get(self, file_hash):
+        """Get cached verification details for a known file, or None."""
+        hash_filter = self._open_filter()
+        entry = self._entries.get(file_hash)
+        if entry is None:
+            return None
+
+        epoch, details = entry
+        if hash_filter is None or epoch != hash_filter.epoch:
+            # A file was deleted or changed somewhere since this was cached
+            self._entries.pop(file_hash, None)
+            return None
+
+        self._entries.move_to_end(file_hash)
+        return details
+
+    def epoch(self):
+        """Get the shared change epoch; read it before the database lookup you will remember."""
+        hash_filter = self._open_filter()
+        return hash_filter.epoch if hash_filter is not None else None
+
+    def remember(self, file_hash, details, epoch):
+        """Cache verification details for a file that existed as of epoch."""
+        if epoch is None:
+            return
+        self._entries[file_hash] = (epoch, details)
+        self._entries.move_to_end(file_hash)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def lookup(self, file_hash):
+        """Resolve one hash to its cache entry, or None if it is not registered."""
+        return self.lookup_many([file_hash]).get(file_hash)
+
+    def lookup_many(self, file_hashes):
+        """Resolve hashes to cache entries; only filter candidates missing from the LRU hit the database."""
+        found = {}
+        candidates = set()
+        for file_hash in file_hashes:
+            entry = self.get(file_hash)
+            if entry is not None:
+                found[file_hash] = entry
+            elif not self.trust_misses or self.might_exist(file_hash):
+                candidates.add(file_hash)
+
+        if candidates:
+            epoch = self.epoch()
+            for file_record in find_file_records(candidates):
+                entry = cache_entry(file_record)
+                self.remember(file_record.file_hash, entry, epoch)
+                found[file_record.file_hash] = entry
+
+        return found
+
+    def might_exist(self, file_hash):
+        """Check the shared filter; True when it is unavailable.
+
+        False is final only for hashes registered on this host (see trust_misses).
+        """
+        hash_filter = self._open_filter()
+        return hash_filter is None or hash_filter.might_contain(file_hash)
+
+    def file_added(self, file_hash):
+        """Register a hash before the upload commits (a rollback only leaves a false positive)."""
+        hash_filter = self._open_filter()
+        while True:
+            if hash_filter is None:
+                with journal_lock(self.filter_path):
+                    if not os.path.exists(self.filter_path):
+                        # No filter yet (being built elsewhere, or the build failed): the next build replays this
+                        with open(f'{self.filter_path}.journal', 'a') as journal:
+                            journal.write(file_hash + '\n')
+                        return
+                hash_filter = self._open_filter()
+            elif hash_filter.add(file_hash):
+                break
+            else:
+                # A rebuild retired the file under us; retry against its replacement
+                hash_filter = self._open_filter()
+
+        # Warn once when the filter fills past the size its error rate was planned for
+        bits_per_item = -math.log(self.error_rate) / (math.log(2) ** 2)
+        if hash_filter is not None and hash_filter.items == int(hash_filter.size / bits_per_item) + 1:
+            print("Hash filter over capacity; run flask build-verify-filter")
+
+    def file_removed(self, file_hash):
+        """Unregister a hash after its delete commits."""
+        self._entries.pop(file_hash, None)
+        hash_filter = self._open_filter()
+        if hash_filter is not None:
+            hash_filter.remove(file_hash)
+
+    def file_changed(self):
+        """Expire every worker's cached details after records were updated."""
+        hash_filter = self._open_filter()
+        if hash_filter is not None:
+            hash_filter.touch()
+
+    def rebuild(self):
+        """Rebuild the shared filter from the database and retire the old file."""
+        return build_filter(self.filter_path, self.capacity, self.error_rate, self._open_filter())
+
+def get_verify_cache():
+    """Get the verify-by-hash cache for this worker process, creating it on first use."""
+    global _cache
+
+    if _cache is None or _cache.pid != os.getpid():
+        with _cache_lock:
+            if _cache is None or _cache.pid != os.getpid():
+                config = current_app.config
+                _cache = VerifyCache(
+                    filter_path=config['VERIFY_FILTER_PATH'],
+                    capacity=config['VERIFY_FILTER_CAPACITY'],
+                    error_rate=config['VERIFY_FILTER_ERROR_RATE'],
+                    max_entries=config['VERIFY_CACHE_SIZE'],
+                    trust_misses=config['VERIFY_FILTER_TRUST_MISSES']
+                )
+
+    return _cache
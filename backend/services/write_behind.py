@@ -0,0 +1,213 @@
+import os
+import time
+import queue
+import atexit
+import threading
+from sqlalchemy.exc import OperationalError, InterfaceError, DisconnectionError, TimeoutError as PoolTimeoutError
+
+try:
+    import psycopg2
+except ImportError:  # only needed to classify errors raised by raw psycopg2 cursors (COPY)
+    psycopg2 = None
+
+# Errors that say nothing about the rows themselves (database down, locked, connection lost)
+TRANSIENT_ERRORS = (OperationalError, InterfaceError, DisconnectionError, PoolTimeoutError)
+if psycopg2 is not None:
+    TRANSIENT_ERRORS += (psycopg2.OperationalError, psycopg2.InterfaceError)
+
+# Queues started in this process, drained by close_write_behind_queues()
+_queues = []
+
+# Queued by close() to wake the background thread
+_STOP = object()
+
+def drop_rows(name):
+    """Default reject handler: log and discard rows that cannot be written."""
+    def reject(rows, error):
+        print(f"{name} dropped {len(rows)} rows: {error}")
+    return reject
+
+class WriteBehindQueue:
+    """Queues rows in-process and persists them in bulk on a background thread.
+
+    Rows are flushed when max_batch rows are waiting or flush_interval
+    seconds after the first one arrived, whichever comes first. A batch
+    failing with a transient error (database unavailable) is retried with
+    backoff; any other failure is retried one row at a time, and rows the
+    database still refuses go to reject(rows, error) instead of holding
+    back the rest. At most max_retry rows wait for a retry; beyond that
+    the oldest are rejected. Rows still queued when the worker exits
+    normally are drained by gunicorn's worker_exit hook (gunicorn.conf.py)
+    or, outside gunicorn, an atexit hook; a worker killed outright loses
+    at most its queued rows (max_queue, and in steady state about
+    flush_interval seconds of traffic).
+    """
+
+    def __init__(self, app, persist, max_batch=500, flush_interval=1.0, max_queue=10000,
+                 put_timeout=0.5, name='write-behind', reject=None, max_retry=None):
+        self.app = app
+        self.persist = persist
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.name = name
+        self.reject = reject or drop_rows(name)
+        self.max_retry = max_retry if max_retry is not None else max_queue
+        self.pid = os.getpid()
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._flush_lock = threading.Lock()
+        self._retry = []
+        self._thread = None
+        self._stopping = False
+
+    def _start(self):
+        if self._thread is None:
+            with self._flush_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                    self._thread.start()
+                    _queues.append(self)
+                    atexit.register(self.close)
+
+    def submit(self, row):
+        """Queue a row; when the queue stays full the caller writes it inline."""
+        self._start()
+        try:
+            self._queue.put(row, timeout=self.put_timeout)
+        except queue.Full:
+            # Backpressure: the database is not keeping up, so pay for this write now
+            print(f"{self.name} queue full, writing synchronously")
+            self._write_now([row])
+
+    def submit_many(self, rows):
+        """Queue rows without waiting; whatever does not fit is written inline as one batch."""
+        self._start()
+        for index, row in enumerate(rows):
+            try:
+                self._queue.put_nowait(row)
+            except queue.Full:
+                print(f"{self.name} queue full, writing {len(rows) - index} rows synchronously")
+                self._write_now(rows[index:])
+                return
+
+    def _take_batch(self, timeout):
+        """Collect up to max_batch rows, waiting at most timeout for the first."""
+        try:
+            rows = [self._queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        if rows[0] is _STOP:
+            return []
+
+        deadline = time.monotonic() + self.flush_interval
+        while len(rows) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                row = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if row is _STOP:
+                break
+            rows.append(row)
+        return rows
+
+    def _persist(self, rows):
+        with self.app.app_context():
+            self.persist(rows)
+
+    def _reject(self, rows, error):
+        try:
+            self.reject(rows, error)
+        except Exception as e:
+            print(f"{self.name} could not reject {len(rows)} rows ({error}): {e}")
+
+    def _write(self, rows):
+        """Persist rows, rejecting the ones the database refuses; returns the rows to retry later."""
+        try:
+            self._persist(rows)
+            return []
+        except TRANSIENT_ERRORS as e:
+            print(f"{self.name} flush error ({len(rows)} rows kept for retry): {e}")
+            return rows
+        except Exception as e:
+            if len(rows) == 1:
+                self._reject(rows, e)
+                return []
+            print(f"{self.name} batch of {len(rows)} rows failed, writing them one by one: {e}")
+
+        # One bad row (too long, broken foreign key...) must not hold back the others
+        retry = []
+        for row in rows:
+            try:
+                self._persist([row])
+            except TRANSIENT_ERRORS:
+                retry.append(row)
+            except Exception as e:
+                self._reject([row], e)
+        return retry
+
+    def _keep(self, retry):
+        """Hold rows for the next flush, rejecting the oldest beyond max_retry (caller holds _flush_lock)."""
+        overflow = len(retry) - self.max_retry
+        if overflow > 0:
+            self._reject(retry[:overflow], f'{self.name} retry buffer full')
+            retry = retry[overflow:]
+        self._retry = retry
+
+    def _write_now(self, rows):
+        with self._flush_lock:
+            retry = self._write(rows)
+            if retry:
+                self._keep(self._retry + retry)
+
+    def _flush(self, rows):
+        """Persist rows plus any earlier failed batch; returns False if some are still waiting for a retry."""
+        with self._flush_lock:
+            rows = self._retry + rows
+            if not rows:
+                return True
+            self._keep(self._write(rows))
+            return not self._retry
+
+    def _run(self):
+        backoff = self.flush_interval
+        while not self._stopping:
+            rows = self._take_batch(timeout=self.flush_interval)
+            if self._flush(rows):
+                backoff = self.flush_interval
+            else:
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+
+    def flush(self):
+        """Persist everything queued so far on the calling thread."""
+        rows = []
+        while True:
+            try:
+                row = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if row is not _STOP:
+                rows.append(row)
+        return self._flush(rows)
+
+    def close(self):
+        """Stop the background thread and drain the queue; returns False if rows could not be written."""
+        self._stopping = True
+        if self._thread is not None and self._thread.is_alive():
+            try:
+                self._queue.put_nowait(_STOP)
+            except queue.Full:
+                pass  # the thread is busy with a batch and sees _stopping when done
+            self._thread.join(timeout=self.flush_interval + 1)
+        return self.flush()
+
+def close_write_behind_queues():
+    """Drain every queue started in this process; returns False if rows could not be written."""
+    drained = True
+    for writer in [writer for writer in _queues if writer.pid == os.getpid()]:
+        drained = writer.close() and drained
+    return drained
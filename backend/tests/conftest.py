@@ -0,0 +1,57 @@
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from flask_jwt_extended import create_access_token
+from config import config
+from models import db, User
+from services import verify_cache
+
+def _testing_app(app, tmp_path, monkeypatch):
+    app.config.update(
+        VERIFY_FILTER_PATH=str(tmp_path / 'file-hash-filter.bin'),
+        AUDIT_LOG_SPOOL_DIR=str(tmp_path / 'audit-spool'),
+        AUDIT_LOG_WRITE_BEHIND=False,
+        VERIFICATION_LOG_WRITE_BEHIND=False
+    )
+    # Per-process singletons would otherwise keep an earlier test's configuration
+    monkeypatch.setattr(verify_cache, '_cache', None)
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """Testing-config app bound to the models' SQLAlchemy instance, on a fresh in-memory database."""
+    app = Flask(__name__)
+    app.config.from_object(config['testing'])
+    db.init_app(app)
+    yield from _testing_app(app, tmp_path, monkeypatch)
+
+@pytest.fixture
+def api_app(tmp_path, monkeypatch):
+    """The full application (blueprints, JWT, compression) in testing config, on a fresh in-memory database."""
+    from app import create_app
+    yield from _testing_app(create_app('testing'), tmp_path, monkeypatch)
+
+@pytest.fixture
+def client(api_app):
+    return api_app.test_client()
+
+@pytest.fixture
+def user(api_app):
+    user = User(email='alice@example.com', name='alice')
+    user.set_password('password')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+@pytest.fixture
+def auth_headers(user):
+    return {'Authorization': f'Bearer {create_access_token(identity=str(user.id))}'}
@@ -0,0 +1,32 @@
+from models import db, User, AuditLog
+from services.audit import AuditSpool, audit_row, persist_audit_logs
+
+def test_sync_audit_write_leaves_the_request_session_alone(app):
+    user = User(email='alice@example.com', name='alice')
+    user.set_password('password')
+    db.session.add(user)
+
+    persist_audit_logs([audit_row('login', 'user', details={'ok': True}), audit_row('logout', 'user')])
+    db.session.rollback()
+
+    assert User.query.count() == 0
+    assert [log.action for log in AuditLog.query.order_by(AuditLog.id)] == ['login', 'logout']
+    assert AuditLog.query.filter_by(action='login').one().details == {'ok': True}
+
+def test_only_segments_without_a_live_writer_are_adopted(tmp_path):
+    live = AuditSpool(str(tmp_path))
+    live_segment = live.append(audit_row('upload', 'file', 1))
+
+    dead = AuditSpool(str(tmp_path))
+    dead.append(audit_row('verify', 'file', 2))
+    # A crashed writer's locks go away with its open files
+    for handle in dead._handles.values():
+        handle.close()
+
+    adopter = AuditSpool(str(tmp_path))
+    entries = adopter.adopt_orphans()
+    assert [row['action'] for _, row in entries] == ['verify']
+    assert adopter.adopt_orphans() == []
+
+    adopter.release(segment for segment, _ in entries)
+    assert [str(path) for path in tmp_path.iterdir()] == [live_segment]
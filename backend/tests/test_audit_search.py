@@ -0,0 +1,51 @@
+from sqlalchemy import inspect
+from models import db, AuditLog
+from services.audit import audit_row, persist_audit_logs
+
+FILE_HASH = 'ab' * 32
+TX_HASH = '0x' + 'cd' * 32
+
+def add_logs():
+    persist_audit_logs([
+        audit_row('file_uploaded', 'file', 1, details={'file_name': 'Quarterly report.pdf', 'file_hash': FILE_HASH,
+                                                       'transaction_hash': TX_HASH}),
+        audit_row('user_registered', 'user', 2, details={'email': 'Alice@Example.com', 'name': 'Alice'}),
+        audit_row('file_verified', 'file', 3, details={'file_hash': 'ef' * 32, 'note': 'reporting tool'})
+    ])
+
+def search(client, auth_headers, value):
+    response = client.get('/api/analytics/audit-logs', query_string={'search': value}, headers=auth_headers)
+    assert response.status_code == 200
+    return sorted(log['resource_id'] for log in response.get_json()['logs'])
+
+def test_details_are_indexed_for_search(client, auth_headers, user):
+    user.is_admin = True
+    db.session.commit()
+    add_logs()
+
+    assert {'audit_logs_fts', 'audit_logs'} <= set(inspect(db.engine).get_table_names())
+    with db.engine.connect() as connection:
+        indexes = connection.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'index'").scalars().all()
+    assert {'idx_audit_file_hash', 'idx_audit_email', 'idx_audit_transaction_hash'} <= set(indexes)
+
+    # Whole words anywhere in the action, resource id or detail values
+    assert search(client, auth_headers, 'report') == ['1']
+    assert search(client, auth_headers, 'alice') == ['2']
+    assert search(client, auth_headers, 'file_verified') == ['3']
+    assert search(client, auth_headers, 'nothing') == []
+
+def test_emails_and_hashes_match_their_detail_fields_exactly(client, auth_headers, user):
+    user.is_admin = True
+    db.session.commit()
+    add_logs()
+
+    assert search(client, auth_headers, 'alice@example.com') == ['2']
+    assert search(client, auth_headers, '0x' + FILE_HASH.upper()) == ['1']
+    assert search(client, auth_headers, TX_HASH[2:]) == ['1']
+
+def test_search_is_limited_to_the_callers_logs(client, auth_headers, user):
+    add_logs()
+    persist_audit_logs([audit_row('login', 'user', user.id, user_id=user.id, details={'note': 'report viewer'})])
+
+    assert search(client, auth_headers, 'report') == [str(user.id)]
+    assert AuditLog.query.count() == 4
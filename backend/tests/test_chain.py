@@ -0,0 +1,131 @@
+import json
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import pytest
+from web3.datastructures import AttributeDict
+from services import cache
+from services.chain import RPCBatch, ChainClient
+
+TX_HASH = '0x' + '0c' * 32
+CONTRACT = '0x' + '42' * 20
+BLOCK = {
+    'number': '0x1a', 'hash': '0x' + 'b1' * 32, 'parentHash': '0x' + 'b0' * 32, 'timestamp': '0x65000000',
+    'gasLimit': '0x1c9c380', 'gasUsed': '0x5208', 'transactions': []
+}
+
+class FakeChain:
+    """Answers a batch in reverse order, as nodes are allowed to."""
+
+    def __init__(self, results):
+        self.results = results
+
+    def post(self, payload):
+        return [{'jsonrpc': '2.0', 'id': call['id'], 'result': self.results[call['method']]}
+                for call in reversed(payload)]
+
+def test_batch_results_get_web3s_pythonic_formatting():
+    chain = FakeChain({
+        'eth_blockNumber': '0x1a',
+        'eth_getBalance': '0xde0b6b3a7640000',
+        'eth_getTransactionReceipt': {
+            'transactionHash': TX_HASH, 'blockNumber': '0x1a', 'gasUsed': '0x5208', 'status': '0x1', 'logs': []
+        }
+    })
+
+    block_number, balance, receipt = RPCBatch(chain).block_number().get_balance('0x' + '11' * 20) \
+        .get_transaction_receipt(TX_HASH).execute()
+
+    assert block_number == 26
+    assert balance == 10 ** 18
+    assert isinstance(receipt, AttributeDict)
+    assert (receipt.blockNumber, receipt.gasUsed, receipt.status) == (26, 21000, 1)
+    assert receipt.transactionHash.hex().removeprefix('0x') == '0c' * 32
+
+class FakeNode:
+    """JSON-RPC node over keep-alive HTTP that counts calls per method and client connection."""
+
+    RESULTS = {
+        'eth_chainId': '0x539',
+        'eth_accounts': ['0x' + '11' * 20, '0x' + '22' * 20],
+        'eth_gasPrice': '0x3b9aca00',
+        'eth_getBlockByNumber': BLOCK
+    }
+
+    def __init__(self):
+        self.calls = []
+        self.connections = set()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                fake.connections.add(self.client_address)
+                payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                calls = payload if isinstance(payload, list) else [payload]
+                replies = [fake.answer(call) for call in calls]
+                data = json.dumps(replies if isinstance(payload, list) else replies[0]).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.uri = f'http://127.0.0.1:{self.server.server_address[1]}'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def answer(self, call):
+        self.calls.append(call['method'])
+        if call['method'] == 'eth_getCode':
+            result = '0x6080' if call['params'][0].lower() == CONTRACT else '0x'
+        else:
+            result = self.RESULTS[call['method']]
+        return {'jsonrpc': '2.0', 'id': call['id'], 'result': result}
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+@pytest.fixture
+def node():
+    fake = FakeNode()
+    yield fake
+    fake.stop()
+
+def test_chain_facts_are_fetched_once_over_one_connection(node):
+    chain = ChainClient(node.uri)
+
+    assert [chain.chain_id for _ in range(3)] == [1337] * 3
+    assert [chain.accounts_count for _ in range(3)] == [2] * 3
+    assert chain.get_code(CONTRACT) == chain.get_code(CONTRACT) == b'\x60\x80'
+    # An empty account may still get a contract deployed, so it is asked again
+    assert chain.get_code('0x' + '33' * 20) == b''
+    assert chain.get_code('0x' + '33' * 20) == b''
+
+    assert [node.calls.count(method) for method in ('eth_chainId', 'eth_accounts', 'eth_getCode')] == [1, 1, 3]
+    assert len(node.connections) == 1
+
+def test_head_is_one_batch_cached_for_a_block(app, node, monkeypatch):
+    monkeypatch.setattr(cache, '_cache', None)
+    chain = ChainClient(node.uri, head_ttl=60)
+
+    head = chain.head()
+    assert chain.head() == head
+    assert (head['number'], head['gas_used'], head['gas_price']) == (26, 21000, 10 ** 9)
+    assert head['hash'].removeprefix('0x') == 'b1' * 32
+    assert [node.calls.count(method) for method in ('eth_getBlockByNumber', 'eth_gasPrice')] == [1, 1]
+
+def test_reset_reconnects_and_forgets_facts(node):
+    chain = ChainClient(node.uri)
+    chain.chain_id
+    w3 = chain.w3
+
+    chain.reset()
+
+    assert chain.chain_id == 1337
+    assert chain.w3 is not w3
+    assert node.calls.count('eth_chainId') == 2
@@ -0,0 +1,88 @@
+import gzip
+import json
+import pytest
+from flask import Response, jsonify, send_file
+
+ROWS = [{'id': index, 'file_name': f'report-{index}.pdf'} for index in range(200)]
+
+@pytest.fixture
+def compressed_client(api_app, tmp_path):
+    body_file = tmp_path / 'body.json'
+    body_file.write_text(json.dumps(ROWS))
+
+    def rows():
+        return jsonify({'files': ROWS})
+
+    def rows_etag(weak):
+        def view():
+            response = jsonify({'files': ROWS})
+            response.set_etag('v1', weak=weak)
+            return response
+        return view
+
+    def stream():
+        return Response((json.dumps(row) + '\n' for row in ROWS), mimetype='application/x-ndjson')
+
+    api_app.add_url_rule('/api/test/rows', 'rows', rows, methods=['GET', 'HEAD'])
+    api_app.add_url_rule('/api/test/strong', 'strong', rows_etag(False))
+    api_app.add_url_rule('/api/test/weak', 'weak', rows_etag(True))
+    api_app.add_url_rule('/api/test/missing', 'missing', lambda: (jsonify({'files': ROWS}), 404))
+    api_app.add_url_rule('/api/test/stream', 'stream', stream)
+    api_app.add_url_rule('/api/test/file', 'file', lambda: send_file(body_file, mimetype='application/json'))
+    api_app.add_url_rule('/api/auth/test-rows', 'auth_rows', rows)
+    return api_app.test_client()
+
+def decode(encoding, data):
+    if encoding == 'br':
+        return pytest.importorskip('brotli').decompress(data)
+    if encoding == 'zstd':
+        return pytest.importorskip('zstandard').ZstdDecompressor().decompressobj().decompress(data)
+    return gzip.decompress(data)
+
+@pytest.mark.parametrize('accept, encoding', [
+    ('gzip', 'gzip'),
+    ('br, gzip', 'br'),
+    ('gzip, br, zstd', 'zstd'),
+    ('zstd;q=0.5, br;q=0.8, gzip;q=0.9', 'gzip')
+])
+def test_negotiates_the_best_accepted_encoding(compressed_client, accept, encoding):
+    pytest.importorskip({'br': 'brotli', 'zstd': 'zstandard'}.get(encoding, 'gzip'))
+    response = compressed_client.get('/api/test/rows', headers={'Accept-Encoding': accept})
+
+    assert response.headers['Content-Encoding'] == encoding
+    assert 'Accept-Encoding' in response.vary
+    assert json.loads(decode(encoding, response.get_data())) == {'files': ROWS}
+
+def test_identity_when_nothing_acceptable(compressed_client):
+    response = compressed_client.get('/api/test/rows', headers={'Accept-Encoding': 'deflate'})
+
+    assert 'Content-Encoding' not in response.headers
+    assert 'Accept-Encoding' in response.vary
+    assert response.get_json() == {'files': ROWS}
+
+def test_streamed_bodies_are_compressed_incrementally(compressed_client):
+    response = compressed_client.get('/api/test/stream', headers={'Accept-Encoding': 'gzip'})
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Length' not in response.headers
+    lines = gzip.decompress(response.get_data()).decode().splitlines()
+    assert [json.loads(line) for line in lines] == ROWS
+
+@pytest.mark.parametrize('method, path', [
+    ('HEAD', '/api/test/rows'),
+    ('GET', '/api/test/missing'),
+    ('GET', '/api/test/file'),
+    ('GET', '/api/auth/test-rows')
+])
+def test_skipped_responses_go_out_as_is(compressed_client, method, path):
+    response = compressed_client.open(path, method=method, headers={'Accept-Encoding': 'gzip, br, zstd'})
+
+    assert 'Content-Encoding' not in response.headers
+    if method == 'GET':
+        assert ROWS[-1]['file_name'] in response.get_data(as_text=True)
+
+def test_strong_etag_is_suffixed_per_encoding(compressed_client):
+    headers = {'Accept-Encoding': 'gzip'}
+    assert compressed_client.get('/api/test/strong', headers=headers).get_etag() == ('v1-gzip', False)
+    assert compressed_client.get('/api/test/weak', headers=headers).get_etag() == ('v1', True)
+    assert compressed_client.get('/api/test/strong').get_etag() == ('v1', False)
@@ -0,0 +1,55 @@
+import io
+import os
+import time
+import sqlite3
+import hashlib
+import pytest
+
+@pytest.fixture
+def app_dev(tmp_path, monkeypatch):
+    """app_dev with its relative uploads/ and development.db under tmp_path."""
+    monkeypatch.chdir(tmp_path)
+    import app_dev
+    app_dev.BLOB_DIR.mkdir(parents=True, exist_ok=True)
+    app_dev.BLOB_TMP_DIR.mkdir(parents=True, exist_ok=True)
+    app_dev.init_db()
+    return app_dev
+
+def age(path, seconds):
+    stamp = time.time() - seconds
+    os.utime(path, (stamp, stamp))
+
+def test_identical_uploads_share_one_sharded_blob(app_dev):
+    content = b'quarterly report' * 10000
+    digest = hashlib.sha256(content).hexdigest()
+
+    assert app_dev.store_blob(io.BytesIO(content)) == (digest, len(content))
+    path = app_dev.blob_path(digest)
+    age(path, 7200)
+    assert app_dev.store_blob(io.BytesIO(content)) == (digest, len(content))
+
+    assert path.parts[-4:] == ('blobs', digest[:2], digest[2:4], digest)
+    assert path.read_bytes() == content
+    assert list(app_dev.BLOB_DIR.glob('*/*/*')) == [path]
+    assert list(app_dev.BLOB_TMP_DIR.iterdir()) == []
+    # The second upload refreshed the blob's age, so garbage collection keeps it a while
+    assert time.time() - path.stat().st_mtime < 60
+
+def test_gc_removes_only_old_unreferenced_blobs_and_temp_files(app_dev):
+    referenced, orphan, fresh = (app_dev.store_blob(io.BytesIO(data))[0] for data in (b'kept', b'orphan', b'fresh'))
+    conn = sqlite3.connect(app_dev.DB_PATH)
+    conn.execute('INSERT INTO files (user_id, filename, file_hash, file_size) VALUES (1, ?, ?, 4)',
+                 ('kept.txt', referenced))
+    conn.commit()
+    conn.close()
+    abandoned = app_dev.BLOB_TMP_DIR / 'tmpupload'
+    abandoned.write_bytes(b'half')
+    for path in (app_dev.blob_path(referenced), app_dev.blob_path(orphan), abandoned):
+        age(path, 7200)
+
+    assert app_dev.collect_blob_garbage(grace_seconds=3600) == 2
+
+    assert app_dev.blob_path(referenced).exists()
+    assert not app_dev.blob_path(orphan).exists()
+    assert app_dev.blob_path(fresh).exists()
+    assert not abandoned.exists()
@@ -0,0 +1,45 @@
+from models import db, User, FileRecord
+from services.stats import record_file_added
+
+def add_file(user, index):
+    file_record = FileRecord(file_name=f'{index}.txt', file_hash=f'{index:064x}', file_size=1,
+                             wallet_address='0x' + '11' * 20, user_id=user.id)
+    db.session.add(file_record)
+    db.session.flush()
+    record_file_added(file_record)
+    db.session.commit()
+
+def test_unchanged_data_revalidates_with_304(client, auth_headers):
+    response = client.get('/api/files/my-files', headers=auth_headers)
+    etag, weak = response.get_etag()
+    assert response.status_code == 200 and weak
+    assert response.headers['Cache-Control'] == 'private, no-cache'
+
+    response = client.get('/api/files/my-files', headers={**auth_headers, 'If-None-Match': f'W/"{etag}"'})
+    assert response.status_code == 304
+    assert response.get_data() == b''
+    assert response.get_etag() == (etag, True)
+
+def test_etag_follows_the_callers_writes_and_the_url(client, auth_headers, user):
+    etag, _ = client.get('/api/files/my-files', headers=auth_headers).get_etag()
+    assert client.get('/api/files/my-files?per_page=5', headers=auth_headers).get_etag()[0] != etag
+
+    add_file(user, 1)
+    response = client.get('/api/files/my-files', headers={**auth_headers, 'If-None-Match': f'W/"{etag}"'})
+    assert response.status_code == 200
+    assert response.get_etag()[0] != etag
+    assert [file['file_name'] for file in response.get_json()['files']] == ['1.txt']
+
+def test_user_scoped_etag_ignores_other_users_writes(client, auth_headers, user):
+    other = User(email='bob@example.com', name='bob')
+    other.set_password('password')
+    db.session.add(other)
+    db.session.commit()
+    user_etag, _ = client.get('/api/files/my-files', headers=auth_headers).get_etag()
+    global_etag, _ = client.get('/api/analytics/trends', headers=auth_headers).get_etag()
+
+    add_file(other, 2)
+
+    headers = {**auth_headers, 'If-None-Match': f'W/"{user_etag}", W/"{global_etag}"'}
+    assert client.get('/api/files/my-files', headers=headers).status_code == 304
+    assert client.get('/api/analytics/trends', headers=headers).status_code == 200
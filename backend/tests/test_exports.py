@@ -0,0 +1,32 @@
+import os
+import json
+import zipfile
+from models import db, User, FileRecord, ExportJob
+from services.exports import create_export, claim_export, run_export
+
+def test_json_exports_are_written_as_ndjson_to_the_export_dir(app, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    app.config['EXPORT_DIR'] = str(tmp_path / 'shared' / 'exports')
+    user = User(email='alice@example.com', name='alice')
+    user.set_password('password')
+    db.session.add(user)
+    db.session.commit()
+    db.session.add(FileRecord(file_name='report.pdf', file_hash='ab' * 32, file_size=10,
+                              wallet_address='0x' + '11' * 20, user_id=user.id))
+    db.session.commit()
+
+    job = create_export(user, 'json', 'all', ['files'])
+    assert job.export_format == 'ndjson'
+
+    assert claim_export(job.id) == job.id
+    run_export(job.id)
+    job = db.session.get(ExportJob, job.id)
+
+    assert job.status == 'completed'
+    assert os.path.isabs(job.file_path)
+    assert os.path.dirname(job.file_path) == app.config['EXPORT_DIR']
+    with zipfile.ZipFile(job.file_path) as archive:
+        [name] = archive.namelist()
+        rows = [json.loads(line) for line in archive.read(name).decode().splitlines()]
+    assert name.endswith('.ndjson')
+    assert [row['file_name'] for row in rows] == ['report.pdf']
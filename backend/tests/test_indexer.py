@@ -0,0 +1,255 @@
+import os
+import json
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import pytest
+from eth_abi import encode
+from models import db, FileRecord, VerificationLog, FileRegistration, SystemStats, DailyTrend
+from services.chain import ChainClient
+from services.indexer import ChainIndexer, CHECKPOINT_STAT
+from services.stats import TOTAL_FILES, TOTAL_SIZE, TOTAL_VERIFICATIONS, SUCCESSFUL_VERIFICATIONS, read_counters
+from services.verify_cache import get_verify_cache
+
+FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'file_registry_logs.json')
+
+with open(FIXTURE) as fixture:
+    RECORDED = json.load(fixture)
+
+class FakeNode:
+    """JSON-RPC node replaying the recorded FileRegistry logs of a chain whose head the test moves."""
+
+    def __init__(self, head):
+        self.head = head
+        self.logs = list(RECORDED['logs'])
+        self.fork = {}
+        self.get_logs_ranges = []
+        self.fail_get_logs_from = None
+
+        node = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                if isinstance(payload, list):
+                    body = [node.answer(call) for call in payload]
+                else:
+                    body = node.answer(payload)
+                data = json.dumps(body).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.uri = f'http://127.0.0.1:{self.server.server_address[1]}'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def block_hash(self, number):
+        return self.fork.get(number, '0x' + f'{number:064x}')
+
+    def reorg(self, from_block, logs):
+        """Replace every block from from_block on with a competing branch carrying logs."""
+        for number in range(from_block, self.head + 1):
+            self.fork[number] = '0x' + 'ee' * 24 + f'{number:016x}'
+        self.logs = [log for log in self.logs if int(log['blockNumber'], 16) < from_block] + logs
+
+    def answer(self, call):
+        method, params = call['method'], call.get('params') or []
+        if method == 'eth_getLogs':
+            from_block, to_block = int(params[0]['fromBlock'], 16), int(params[0]['toBlock'], 16)
+            self.get_logs_ranges.append((from_block, to_block))
+            if self.fail_get_logs_from == from_block:
+                self.fail_get_logs_from = None
+                return {'jsonrpc': '2.0', 'id': call['id'], 'error': {'code': -32000, 'message': 'node overloaded'}}
+            result = [
+                dict(log, blockHash=self.block_hash(int(log['blockNumber'], 16)))
+                for log in self.logs if from_block <= int(log['blockNumber'], 16) <= to_block
+            ]
+        elif method == 'eth_blockNumber':
+            result = hex(self.head)
+        elif method == 'eth_getBlockByNumber':
+            result = self.block(int(params[0], 16))
+        elif method == 'eth_call':
+            result = self.file_info('0x' + params[0]['data'][-64:])
+        elif method == 'eth_chainId':
+            result = '0x539'
+        else:
+            return {'jsonrpc': '2.0', 'id': call['id'], 'error': {'code': -32601, 'message': f'{method} not recorded'}}
+        return {'jsonrpc': '2.0', 'id': call['id'], 'result': result}
+
+    def block(self, number):
+        zero = '0x' + '00' * 32
+        return {
+            'number': hex(number), 'hash': self.block_hash(number), 'parentHash': self.block_hash(number - 1),
+            'timestamp': hex(1700000000 + number * 12), 'gasLimit': '0x1c9c380', 'gasUsed': '0x0',
+            'miner': '0x' + '00' * 20, 'difficulty': '0x0', 'totalDifficulty': '0x0', 'extraData': '0x',
+            'size': '0x1', 'nonce': '0x0000000000000000', 'sha3Uncles': zero, 'logsBloom': '0x' + '00' * 256,
+            'transactionsRoot': zero, 'stateRoot': zero, 'receiptsRoot': zero, 'mixHash': zero,
+            'baseFeePerGas': '0x1', 'transactions': [], 'uncles': []
+        }
+
+    def file_info(self, file_hash):
+        info = RECORDED['file_info'][file_hash]
+        record = (bytes.fromhex(file_hash[2:]), 'file', info['file_size'], info['ipfs_hash'],
+                  '0x' + '11' * 20, 1700000000, True)
+        return '0x' + encode(['(bytes32,string,uint256,string,address,uint256,bool)'], [record]).hex()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+@pytest.fixture
+def node():
+    node = FakeNode(head=30)
+    yield node
+    node.stop()
+
+@pytest.fixture
+def indexer(app, node):
+    chain = ChainClient(node.uri)
+    yield ChainIndexer(chain, RECORDED['contract_address'], batch_size=4, confirmations=3, start_block=5)
+    chain.reset()
+
+def checkpoint():
+    return SystemStats.query.filter_by(stat_name=CHECKPOINT_STAT).one().stat_value
+
+def stat(name):
+    return read_counters([name]).get(name, 0)
+
+def verification_keys():
+    return sorted(db.session.query(VerificationLog.transaction_hash, VerificationLog.log_index).all())
+
+def test_indexes_recorded_logs_up_to_the_confirmed_head(indexer, node):
+    result = indexer.run_once()
+
+    assert result['to_block'] == 27
+    assert result['new_files'] == 3
+    assert result['new_verifications'] == 4
+    assert checkpoint() == 27
+    # Pages of batch_size blocks from start_block to head - confirmations, none skipped or repeated
+    assert node.get_logs_ranges == [(5, 8), (9, 12), (13, 16), (17, 20), (21, 24), (25, 27)]
+
+    report = FileRecord.query.filter_by(file_hash='a1' * 32).one()
+    assert (report.file_name, report.file_size, report.ipfs_hash) == ('report.pdf', 2048, 'QmReport')
+    assert report.block_number == 10
+    assert FileRegistration.query.count() == 3
+    assert stat(TOTAL_FILES) == 3
+    assert stat(TOTAL_VERIFICATIONS) == 4
+    assert stat(SUCCESSFUL_VERIFICATIONS) == 3
+
+def test_resumes_from_checkpoint_without_rescanning(indexer, node):
+    indexer.run_once()
+    node.get_logs_ranges.clear()
+
+    # Nothing new is confirmed yet
+    result = indexer.run_once()
+    assert node.get_logs_ranges == []
+    assert result['new_files'] == result['new_verifications'] == 0
+
+    node.head = 36
+    indexer.run_once()
+    assert node.get_logs_ranges == [(28, 31), (32, 33)]
+    assert checkpoint() == 33
+    assert VerificationLog.query.count() == 4
+
+def test_failed_page_resumes_after_last_committed_page(indexer, node):
+    node.fail_get_logs_from = 13
+    with pytest.raises(Exception):
+        indexer.run_once()
+    assert checkpoint() == 12
+    assert FileRecord.query.count() == 1
+
+    node.get_logs_ranges.clear()
+    indexer.run_once()
+    assert node.get_logs_ranges[0] == (13, 16)
+    assert checkpoint() == 27
+    assert FileRecord.query.count() == 3
+    assert VerificationLog.query.count() == 4
+
+def test_reorg_rewinds_checkpoint_by_confirmations(indexer, node):
+    indexer.run_once()
+    assert ('0x' + '0d' * 32, 0) in verification_keys()
+    assert get_verify_cache().might_exist('c3' * 32)
+
+    node.reorg(25, RECORDED['reorged_logs'])
+    node.get_logs_ranges.clear()
+    result = indexer.run_once()
+
+    assert result['rewound'] is True
+    # The checkpoint block's hash changed, so 27 - confirmations onward is scanned again
+    assert node.get_logs_ranges == [(25, 27)]
+    assert checkpoint() == 27
+
+    keys = verification_keys()
+    assert ('0x' + '0d' * 32, 0) not in keys
+    assert ('0x' + '0e' * 32, 0) in keys
+    assert len(keys) == 4
+    # The orphaned success was subtracted and the replacement failure counted
+    assert stat(TOTAL_VERIFICATIONS) == 4
+    assert stat(SUCCESSFUL_VERIFICATIONS) == 2
+    # Verifications below the rewind point are untouched
+    assert VerificationLog.query.filter(VerificationLog.block_number <= 24).count() == 3
+
+    # The file uploaded in orphaned block 26 is rolled back with its counters and filter entry
+    assert FileRecord.query.filter_by(file_hash='c3' * 32).first() is None
+    assert FileRegistration.query.filter_by(file_hash='c3' * 32).first() is None
+    assert stat(TOTAL_FILES) == 2
+    assert stat(TOTAL_SIZE) == 2048 + 512
+    assert db.session.query(db.func.sum(DailyTrend.uploads)).scalar() == 2
+    assert not get_verify_cache().might_exist('c3' * 32)
+
+def test_each_page_rereads_the_checkpoint_under_its_lock(indexer, node, monkeypatch):
+    lock_checkpoint = indexer._lock_checkpoint
+    calls = []
+
+    def other_runner_advances(*args):
+        calls.append(1)
+        if len(calls) == 3:
+            # Between our first and second page another runner indexes up to block 20
+            SystemStats.query.filter_by(stat_name=CHECKPOINT_STAT).update({SystemStats.stat_value: 20})
+            db.session.commit()
+        return lock_checkpoint(*args)
+
+    monkeypatch.setattr(indexer, '_lock_checkpoint', other_runner_advances)
+    result = indexer.run_once()
+
+    assert node.get_logs_ranges == [(5, 8), (21, 24), (25, 27)]
+    assert result['to_block'] == 27
+
+def test_reingesting_the_same_logs_is_idempotent(indexer, node):
+    indexer.run_once()
+    before = verification_keys()
+    counters = [stat(name) for name in (TOTAL_FILES, TOTAL_VERIFICATIONS, SUCCESSFUL_VERIFICATIONS)]
+
+    # Rescan everything from the start block, as after a manual checkpoint reset
+    SystemStats.query.filter_by(stat_name=CHECKPOINT_STAT).one().stat_value = 4
+    db.session.commit()
+    result = indexer.run_once()
+
+    assert result['new_files'] == 0
+    assert result['new_verifications'] == 0
+    # Two verifications share transaction 0x0c.. and are told apart by log index
+    assert [key for key in before if key[0] == '0x' + '0c' * 32] == [('0x' + '0c' * 32, 1), ('0x' + '0c' * 32, 2)]
+    assert verification_keys() == before
+    assert FileRecord.query.count() == 3
+    assert FileRegistration.query.count() == 3
+    assert [stat(name) for name in (TOTAL_FILES, TOTAL_VERIFICATIONS, SUCCESSFUL_VERIFICATIONS)] == counters
+
+def test_events_default_to_the_latest_indexed_rows(indexer):
+    from routes.blockchain import indexed_events
+    indexer.run_once()
+
+    events = indexed_events(None, 50)
+    assert len(events) == 7
+    assert [event['block_number'] for event in events] == sorted((event['block_number'] for event in events), reverse=True)
+    assert events[0]['block_number'] == 26
+
+    uploads = indexed_events(['FileUploaded'], 2)
+    assert [(event['event_type'], event['block_number']) for event in uploads] == [('file_uploaded', 26), ('file_uploaded', 15)]
+    assert uploads[1]['details'] == {'file_name': FileRegistration.query.filter_by(block_number=15).one().file_name}
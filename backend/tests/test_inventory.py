@@ -0,0 +1,59 @@
+import json
+from models import db, User, FileRecord
+
+WALLETS = ('0x' + '11' * 20, '0x' + '22' * 20)
+
+def add_files(user, count, offset=0, **kwargs):
+    files = [
+        FileRecord(file_name=f'{index}.txt', file_hash=f'{index:064x}', file_size=index, user_id=user.id,
+                   wallet_address=WALLETS[index % 2], **kwargs)
+        for index in range(offset, offset + count)
+    ]
+    db.session.add_all(files)
+    db.session.commit()
+    return files
+
+def inventory(client, auth_headers, **params):
+    response = client.get('/api/files/inventory', query_string=params, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+def add_other_user():
+    other = User(email='bob@example.com', name='bob')
+    other.set_password('password')
+    db.session.add(other)
+    db.session.commit()
+    return other
+
+def test_streams_every_own_file_across_fetch_batches(api_app, client, auth_headers, user):
+    api_app.config['INVENTORY_STREAM_BATCH_SIZE'] = 2
+    files = add_files(user, 5)
+    other = add_other_user()
+    add_files(other, 2, offset=10)
+
+    # A non-admin's user_id is ignored
+    lines = inventory(client, auth_headers, user_id=other.id)
+
+    assert lines == [file.to_dict() for file in files]
+
+def test_fields_status_and_bad_fields(client, auth_headers, user):
+    add_files(user, 2, upload_status='uploaded')
+    add_files(user, 1, offset=5, upload_status='failed')
+
+    assert inventory(client, auth_headers, status='uploaded', fields='id,file_hash') == [
+        {'file_hash': f'{index:064x}', 'id': index + 1} for index in range(2)
+    ]
+    response = client.get('/api/files/inventory?fields=id,secret', headers=auth_headers)
+    assert response.status_code == 400
+
+def test_admins_can_stream_a_wallet_across_users(client, auth_headers, user):
+    user.is_admin = True
+    db.session.commit()
+    other = add_other_user()
+    add_files(user, 2)
+    add_files(other, 2, offset=10)
+
+    lines = inventory(client, auth_headers, wallet=WALLETS[0], fields='file_name,user_id')
+    assert lines == [{'file_name': '0.txt', 'user_id': user.id}, {'file_name': '10.txt', 'user_id': other.id}]
+    assert [line['user_id'] for line in inventory(client, auth_headers, user_id=other.id)] == [other.id] * 2
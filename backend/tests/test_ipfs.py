@@ -0,0 +1,237 @@
+import io
+import json
+import hashlib
+import socket
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import pytest
+from services import ipfs
+from services.ipfs import IPFSPool, IPFSUnavailableError, IPFSConnectionError
+
+FAKE_HASH = 'QmfM2r8seH2GiRaC4esTjeraXEachRt8ZsSeGaWTPLyMoG'
+
+class FakeIPFS:
+    """Just enough of the IPFS HTTP API (/api/v0/version and /api/v0/add) to drive a pool."""
+
+    def __init__(self, port=0):
+        self.connections = set()
+        self.calls = []
+        self.bodies = []
+        self.failing_versions = 0
+
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                fake.connections.add(self.client_address)
+                fake.calls.append(self.path.split('?')[0])
+                fake.bodies.append(self._read_body())
+
+                if self.path.startswith('/api/v0/version'):
+                    if fake.failing_versions:
+                        fake.failing_versions -= 1
+                        return self._reply(500, {'Message': 'unhealthy', 'Code': 0, 'Type': 'error'})
+                    return self._reply(200, {'Version': '0.8.0'})
+                if self.path.startswith('/api/v0/add'):
+                    return self._reply(200, {'Name': 'file', 'Hash': FAKE_HASH, 'Size': '1'})
+                self._reply(404, {'Message': 'not found', 'Code': 0, 'Type': 'error'})
+
+            def _read_body(self):
+                if self.headers.get('Transfer-Encoding') != 'chunked':
+                    return self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                chunks = []
+                while True:
+                    size = int(self.rfile.readline().strip(), 16)
+                    chunks.append(self.rfile.read(size))
+                    self.rfile.readline()
+                    if size == 0:
+                        return b''.join(chunks)
+
+            def _reply(self, status, body):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def count(self, path):
+        return self.calls.count(path)
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+@pytest.fixture
+def fake_ipfs():
+    fake = FakeIPFS()
+    yield fake
+    fake.stop()
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Replace the pool's monotonic clock with one the test advances by hand."""
+    now = [1000.0]
+    monkeypatch.setattr(ipfs.time, 'monotonic', lambda: now[0])
+    return now
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def make_pool(port, **kwargs):
+    return IPFSPool('127.0.0.1', port, timeout=5, **kwargs)
+
+def test_pooled_client_reuses_one_connection(fake_ipfs):
+    pool = make_pool(fake_ipfs.port, health_check_interval=60)
+    try:
+        for size in (10, 20, 30):
+            with pool.client() as client:
+                assert client.add_bytes(b'x' * size) == FAKE_HASH
+    finally:
+        pool.close()
+
+    assert fake_ipfs.count('/api/v0/add') == 3
+    # One version check when the client connected, then keep-alive for every add
+    assert fake_ipfs.count('/api/v0/version') == 1
+    assert len(fake_ipfs.connections) == 1
+
+def test_idle_client_failing_health_check_is_replaced(fake_ipfs, clock):
+    pool = make_pool(fake_ipfs.port, health_check_interval=30)
+    try:
+        first = pool.acquire()
+        pool.release(first)
+
+        clock[0] += 31
+        fake_ipfs.failing_versions = 1
+        second = pool.acquire()
+
+        assert second is not first
+        # The failed ping, then the replacement's version check on connect
+        assert fake_ipfs.count('/api/v0/version') == 3
+        pool.release(second)
+    finally:
+        pool.close()
+
+def test_recently_used_client_skips_health_check(fake_ipfs, clock):
+    pool = make_pool(fake_ipfs.port, health_check_interval=30)
+    try:
+        first = pool.acquire()
+        pool.release(first)
+        clock[0] += 5
+
+        assert pool.acquire() is first
+        assert fake_ipfs.count('/api/v0/version') == 1
+        pool.release(first)
+    finally:
+        pool.close()
+
+def test_reconnect_backs_off_until_the_daemon_returns(clock):
+    port = free_port()
+    pool = make_pool(port, max_backoff=3)
+
+    with pytest.raises(IPFSConnectionError):
+        pool.acquire()
+    # Within the 1s backoff the pool fails fast without dialing
+    with pytest.raises(IPFSUnavailableError):
+        pool.acquire()
+
+    clock[0] += 1
+    with pytest.raises(IPFSConnectionError):
+        pool.acquire()
+    clock[0] += 1.5
+    with pytest.raises(IPFSUnavailableError):
+        pool.acquire()
+
+    # Backoff doubles per failure up to max_backoff
+    clock[0] += 0.5
+    with pytest.raises(IPFSConnectionError):
+        pool.acquire()
+    clock[0] += 3
+    with pytest.raises(IPFSConnectionError):
+        pool.acquire()
+    clock[0] += 2.9
+    with pytest.raises(IPFSUnavailableError):
+        pool.acquire()
+
+    fake = FakeIPFS(port)
+    try:
+        clock[0] += 0.1
+        with pool.client() as client:
+            assert client.add_bytes(b'back') == FAKE_HASH
+
+        # A successful connect resets the backoff
+        assert pool._failures == 0
+        assert pool._retry_at == 0
+    finally:
+        pool.close()
+        fake.stop()
+
+@pytest.fixture
+def ipfs_client(api_app, fake_ipfs, monkeypatch):
+    """Test client whose /upload-ipfs talks to the fake daemon."""
+    monkeypatch.setattr(ipfs, '_pool', None)
+    api_app.config.update(IPFS_API_HOST='127.0.0.1', IPFS_API_PORT=fake_ipfs.port)
+    return api_app.test_client()
+
+def test_raw_upload_is_hashed_while_streamed_to_ipfs(ipfs_client, fake_ipfs, auth_headers):
+    content = bytes(range(256)) * 4096
+
+    response = ipfs_client.post('/api/files/upload-ipfs', data=content, headers={
+        **auth_headers, 'Content-Type': 'application/octet-stream', 'X-File-Name': 'scan.pdf'
+    })
+
+    assert response.status_code == 200
+    assert response.get_json() == {
+        'message': 'File uploaded to IPFS successfully',
+        'ipfsHash': FAKE_HASH,
+        'fileHash': hashlib.sha256(content).hexdigest(),
+        'fileSize': len(content),
+        'fileName': 'scan.pdf'
+    }
+    assert content in fake_ipfs.bodies[fake_ipfs.calls.index('/api/v0/add')]
+
+def test_multipart_upload_is_hashed_too(ipfs_client, auth_headers):
+    content = b'minutes of the meeting\n' * 1000
+
+    response = ipfs_client.post('/api/files/upload-ipfs', headers=auth_headers,
+                                data={'file': (io.BytesIO(content), 'minutes.txt')})
+
+    assert response.status_code == 200
+    assert response.get_json()['fileHash'] == hashlib.sha256(content).hexdigest()
+    assert response.get_json()['fileSize'] == len(content)
+
+def test_upload_over_the_size_limit_is_refused(api_app, ipfs_client, auth_headers):
+    api_app.config['MAX_CONTENT_LENGTH'] = 1024
+
+    response = ipfs_client.post('/api/files/upload-ipfs', data=b'x' * 4096, headers={
+        **auth_headers, 'Content-Type': 'application/octet-stream', 'X-File-Name': 'big.txt'
+    })
+
+    assert response.status_code == 413
+
+    # Chunked bodies have no length up front and are cut off while being read
+    response = ipfs_client.post('/api/files/upload-ipfs', input_stream=io.BytesIO(b'x' * 4096),
+                                environ_overrides={'wsgi.input_terminated': True}, headers={
+        **auth_headers, 'Content-Type': 'application/octet-stream', 'X-File-Name': 'big.txt'
+    })
+
+    assert response.status_code == 413
+
+def test_upload_of_a_disallowed_type_is_refused(ipfs_client, fake_ipfs, auth_headers):
+    response = ipfs_client.post('/api/files/upload-ipfs', data=b'MZ', headers={
+        **auth_headers, 'Content-Type': 'application/octet-stream', 'X-File-Name': 'setup.exe'
+    })
+
+    assert response.status_code == 400
+    assert fake_ipfs.count('/api/v0/add') == 0
@@ -0,0 +1,63 @@
+import os
+from flask import Flask
+from flask_migrate import Migrate, upgrade
+from config import config
+from models import db, FileRecord, VerificationLog
+
+MIGRATIONS = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'migrations')
+BEFORE_JSON_COLUMNS = '35716a3ae5b1'
+
+def add_file(index, metadata, user_id=None):
+    record = FileRecord(file_name=f'{index}.txt', file_hash=f'{index:064x}', file_size=1,
+                        wallet_address='0x' + '11' * 20, user_id=user_id)
+    record.set_metadata(metadata)
+    db.session.add(record)
+    db.session.commit()
+    return record
+
+def test_values_round_trip_and_unset_is_sql_null(app):
+    add_file(1, {'upload_method': 'blockchain', 'tags': ['a', 'b'], 'size': {'pages': 3}})
+    add_file(2, {})
+    db.session.add(VerificationLog(file_hash='0' * 64, verification_result=True, verification_method='api',
+                                   blockchain_data={'block': 7}))
+    db.session.commit()
+    db.session.expire_all()
+
+    first, second = FileRecord.query.order_by(FileRecord.id)
+    assert first.get_metadata() == {'upload_method': 'blockchain', 'tags': ['a', 'b'], 'size': {'pages': 3}}
+    assert second.get_metadata() == {}
+    assert FileRecord.query.filter(FileRecord.file_metadata.is_(None)).one() is second
+    assert VerificationLog.query.one().get_blockchain_data() == {'block': 7}
+
+def test_list_endpoints_can_omit_metadata(client, auth_headers, user):
+    add_file(1, {'note': 'x' * 500}, user_id=user.id)
+
+    [full] = client.get('/api/files/my-files', headers=auth_headers).get_json()['files']
+    [slim] = client.get('/api/files/my-files?omit=metadata', headers=auth_headers).get_json()['files']
+
+    assert full['metadata'] == {'note': 'x' * 500}
+    assert 'metadata' not in slim
+    assert {key: value for key, value in full.items() if key != 'metadata'} == slim
+
+def test_migration_keeps_legacy_text_values(tmp_path):
+    app = Flask(__name__)
+    app.config.from_object(config['testing'])
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{tmp_path / "legacy.db"}'
+    db.init_app(app)
+    Migrate(app, db, directory=MIGRATIONS, render_as_batch=True)
+
+    with app.app_context():
+        upgrade(revision=BEFORE_JSON_COLUMNS)
+        with db.engine.begin() as connection:
+            for index, metadata in enumerate(['{"upload_method": "blockchain"}', '', None], start=1):
+                connection.exec_driver_sql(
+                    "INSERT INTO file_records (file_name, file_hash, file_size, wallet_address, file_metadata, "
+                    "created_at, updated_at) VALUES (?, ?, 1, ?, ?, '2026-01-01', '2026-01-01')",
+                    (f'{index}.txt', f'{index:064x}', '0x' + '11' * 20, metadata)
+                )
+        upgrade()
+
+        records = FileRecord.query.order_by(FileRecord.id).all()
+        assert [record.get_metadata() for record in records] == [{'upload_method': 'blockchain'}, {}, {}]
+        assert FileRecord.query.filter(FileRecord.file_metadata.is_(None)).count() == 2
+        db.session.remove()
@@ -0,0 +1,33 @@
+import os
+from flask import Flask
+from flask_migrate import Migrate, upgrade, downgrade
+from alembic.migration import MigrationContext
+from alembic.autogenerate import compare_metadata
+from sqlalchemy import inspect
+from config import config
+from models import db
+from services.search import SQLITE_TRIGRAM
+
+MIGRATIONS = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'migrations')
+
+def test_migrations_build_the_models_schema(tmp_path):
+    app = Flask(__name__)
+    app.config.from_object(config['testing'])
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{tmp_path / "migrated.db"}'
+    db.init_app(app)
+    Migrate(app, db, directory=MIGRATIONS, render_as_batch=True)
+
+    with app.app_context():
+        upgrade()
+        with db.engine.connect() as connection:
+            context = MigrationContext.configure(connection, opts={'compare_type': True})
+            # Search tables and triggers are not part of the models
+            diff = [change for change in compare_metadata(context, db.metadata) if '_fts' not in str(change)]
+            triggers = {name for name, in connection.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'trigger'")}
+        assert diff == []
+        assert 'audit_logs_fts_insert' in triggers
+        if SQLITE_TRIGRAM:
+            assert {'file_records_fts_insert', 'file_records_fts_update'} <= triggers
+
+        downgrade(revision='base')
+        assert inspect(db.engine).get_table_names() == ['alembic_version']
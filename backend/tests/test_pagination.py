@@ -0,0 +1,59 @@
+from datetime import datetime, timedelta
+from models import db, FileRecord
+
+def add_files(user, count):
+    start = datetime(2026, 1, 1)
+    # Pairs share a created_at, so the id tie-break is part of every cursor
+    files = [
+        FileRecord(file_name=f'file-{index}.txt', file_hash=f'{index:064x}', file_size=index,
+                   wallet_address='0x' + '11' * 20, user_id=user.id, created_at=start + timedelta(hours=index // 2))
+        for index in range(count)
+    ]
+    db.session.add_all(files)
+    db.session.commit()
+    return sorted(files, key=lambda file: (file.created_at, file.id), reverse=True)
+
+def walk(client, auth_headers, url):
+    ids, cursor, pages = [], None, 0
+    while True:
+        body = client.get(url + (f'&cursor={cursor}' if cursor else ''), headers=auth_headers).get_json()
+        ids.extend(file['id'] for file in body['files'])
+        pages += 1
+        cursor = body['next_cursor']
+        if not cursor:
+            return ids, pages
+
+def test_cursor_pages_round_trip_every_row_once(client, auth_headers, user):
+    files = add_files(user, 11)
+
+    ids, pages = walk(client, auth_headers, '/api/files/my-files?per_page=3')
+
+    assert ids == [file.id for file in files]
+    assert pages == 4
+
+def test_per_page_is_clamped(api_app, client, auth_headers, user):
+    api_app.config['MAX_PER_PAGE'] = 5
+    add_files(user, 7)
+
+    body = client.get('/api/files/my-files?per_page=1000', headers=auth_headers).get_json()
+    assert (body['per_page'], len(body['files'])) == (5, 5)
+
+    body = client.get('/api/files/my-files?per_page=0', headers=auth_headers).get_json()
+    assert (body['per_page'], len(body['files'])) == (1, 1)
+
+def test_totals_and_legacy_pages(client, auth_headers, user):
+    files = add_files(user, 5)
+
+    body = client.get('/api/files/my-files?per_page=2&total=exact', headers=auth_headers).get_json()
+    assert (body['total'], body['pages'], body['total_estimated']) == (5, 3, False)
+    assert 'total' not in client.get('/api/files/my-files?per_page=2', headers=auth_headers).get_json()
+
+    body = client.get('/api/files/my-files?per_page=2&page=2', headers=auth_headers).get_json()
+    assert [file['id'] for file in body['files']] == [file.id for file in files[2:4]]
+    assert (body['current_page'], body['total']) == (2, 5)
+
+def test_foreign_cursor_is_rejected(client, auth_headers, user):
+    response = client.get('/api/files/my-files?cursor=not-a-cursor', headers=auth_headers)
+
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Invalid cursor'}
@@ -0,0 +1,39 @@
+from sqlalchemy import inspect
+from models import db, FileRecord
+from services import search
+from services.search import search_file_records, rebuild_search_index
+
+def add_files(*names):
+    for index, name in enumerate(names):
+        db.session.add(FileRecord(file_name=name, file_hash=f'{index:064x}', file_size=1,
+                                  wallet_address='0x' + '11' * 20))
+    db.session.commit()
+
+def matching_names(value):
+    query, rank = search_file_records(FileRecord.query, value)
+    return sorted(record.file_name for record in query), rank
+
+def test_trigram_index_serves_name_search(app):
+    if not search.SQLITE_TRIGRAM:
+        return
+    add_files('Quarterly Report.pdf', 'invoice_2024.pdf', 'notes.txt')
+
+    assert 'file_records_fts' in inspect(db.engine).get_table_names()
+    names, rank = matching_names('report')
+    assert names == ['Quarterly Report.pdf']
+    assert rank is not None
+
+def test_old_sqlite_falls_back_to_like(app, monkeypatch):
+    monkeypatch.setattr(search, 'SQLITE_TRIGRAM', False)
+    db.drop_all()
+    with db.engine.begin() as connection:
+        connection.exec_driver_sql("DROP TABLE file_records_fts")
+    db.create_all()
+    add_files('Quarterly Report.pdf', 'invoice_2024.pdf', 'notes_100%.txt')
+
+    # No trigram table is created, and the LIKE fallback still escapes wildcards
+    assert 'file_records_fts' not in inspect(db.engine).get_table_names()
+    assert rebuild_search_index() == 'sqlite'
+    assert matching_names('REPORT') == (['Quarterly Report.pdf'], None)
+    assert matching_names('100%') == (['notes_100%.txt'], None)
+    assert matching_names('_2') == (['invoice_2024.pdf'], None)
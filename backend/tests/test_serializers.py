@@ -0,0 +1,62 @@
+import json
+from datetime import datetime, timedelta
+from flask import jsonify
+from models import db, User, FileRecord, AuditLog
+
+def same_as_jsonify(api_app, response, key, rows):
+    """The fast-path body must be byte-for-byte jsonify() of the rows' to_dict()."""
+    body = response.get_json()
+    assert [item['id'] for item in body[key]] == [row.id for row in rows]
+    with api_app.test_request_context():
+        expected = jsonify({**body, key: [row.to_dict() for row in rows]}).get_data()
+    assert response.status_code == 200
+    assert response.get_data() == expected
+
+def add_files(user, count=3):
+    start = datetime(2026, 1, 1)
+    files = [
+        FileRecord(file_name=f'résumé "{index}".pdf', file_hash=f'{index:064x}', file_size=index * 10,
+                   file_type='application/pdf', wallet_address='0x' + '11' * 20, user_id=user.id,
+                   upload_status='uploaded', created_at=start + timedelta(days=index),
+                   uploaded_at=start if index % 2 else None)
+        for index in range(1, count + 1)
+    ]
+    files[0].set_metadata({'tags': ['a', 'b'], 'note': 'café'})
+    db.session.add_all(files)
+    db.session.commit()
+    return files
+
+def test_my_files_matches_jsonify(api_app, client, auth_headers, user):
+    files = add_files(user)
+
+    response = client.get('/api/files/my-files?per_page=2', headers=auth_headers)
+    same_as_jsonify(api_app, response, 'files', files[::-1][:2])
+
+def test_search_matches_jsonify(api_app, client, auth_headers, user):
+    files = add_files(user)
+
+    response = client.get('/api/files/search?q=sum', headers=auth_headers)
+    same_as_jsonify(api_app, response, 'files', files[::-1])
+
+def test_audit_logs_match_jsonify(api_app, client, auth_headers, user):
+    user.is_admin = True
+    db.session.add_all([
+        AuditLog(action='login', resource_type='user', resource_id=str(user.id), user_id=user.id,
+                 ip_address='127.0.0.1', details={'ok': True, 'agent': 'curl ☃'},
+                 timestamp=datetime(2026, 1, 1)),
+        AuditLog(action='upload', resource_type='file', timestamp=datetime(2026, 1, 2))
+    ])
+    db.session.commit()
+
+    response = client.get('/api/analytics/audit-logs', headers=auth_headers)
+    same_as_jsonify(api_app, response, 'logs', AuditLog.query.order_by(AuditLog.timestamp.desc()).all())
+
+def test_users_match_jsonify(api_app, client, auth_headers, user):
+    user.is_admin = True
+    other = User(email='bob@example.com', name='Böb', wallet_address='0x' + '22' * 20)
+    other.set_password('password')
+    db.session.add(other)
+    db.session.commit()
+
+    response = client.get('/api/auth/users', headers=auth_headers)
+    same_as_jsonify(api_app, response, 'users', [user, other])
@@ -0,0 +1,128 @@
+from models import db, User, FileRecord, SystemStats
+from services.stats import (
+    TOTAL_FILES, TOTAL_SIZE, ACTIVE_USERS, user_version_stat,
+    read_counters, record_file_added, record_user_registered, reconcile_stats, get_overview_stats
+)
+
+def add_user(email, is_active=True):
+    user = User(email=email, name=email.split('@')[0], is_active=is_active)
+    user.set_password('password')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+def add_file(user, file_hash, file_size):
+    record = FileRecord(file_hash=file_hash, file_name=f'{file_hash[:4]}.txt', file_size=file_size,
+                        file_type='txt', ipfs_hash='Qm' + file_hash[:8], wallet_address='0x' + '11' * 20,
+                        user_id=user.id)
+    db.session.add(record)
+    record_file_added(record)
+    db.session.commit()
+    return record
+
+def test_counter_writes_are_spread_over_shards_and_summed_on_read(app):
+    app.config['STATS_COUNTER_SHARDS'] = 4
+    user = add_user('alice@example.com')
+    for index in range(20):
+        add_file(user, f'{index:064x}', 100)
+
+    rows = SystemStats.query.filter(SystemStats.stat_name.like(f'{TOTAL_FILES}%')).all()
+    assert 1 < len(rows) <= 4
+    assert sum(row.stat_value for row in rows) == 20
+    assert read_counters([TOTAL_FILES, TOTAL_SIZE]) == {TOTAL_FILES: 20, TOTAL_SIZE: 2000}
+    assert read_counters([user_version_stat(user.id)]) == {user_version_stat(user.id): 20}
+
+def test_reconcile_folds_shards_into_one_row(app):
+    app.config['STATS_COUNTER_SHARDS'] = 4
+    user = add_user('alice@example.com')
+    for index in range(10):
+        add_file(user, f'{index:064x}', 100)
+
+    reconcile_stats()
+
+    assert SystemStats.query.filter(SystemStats.stat_name.like(f'{TOTAL_FILES}%')).count() == 1
+    assert read_counters([TOTAL_FILES])[TOTAL_FILES] == 10
+
+def test_overview_reads_counters_without_reconciling(app):
+    add_user('alice@example.com')
+
+    # Nothing counted yet: zeros rather than a full recount inside the request
+    assert get_overview_stats()['total_files'] == 0
+    assert SystemStats.query.count() == 0
+
+def test_active_users_follow_is_active_changes(app):
+    user = add_user('alice@example.com')
+    record_user_registered()
+    db.session.commit()
+    assert read_counters([ACTIVE_USERS])[ACTIVE_USERS] == 1
+
+    user.is_active = False
+    db.session.commit()
+    assert read_counters([ACTIVE_USERS])[ACTIVE_USERS] == 0
+
+    # Reactivating a user whose old value was never loaded still counts once
+    db.session.expire_all()
+    user = db.session.get(User, user.id)
+    db.session.expire(user, ['is_active'])
+    user.is_active = True
+    db.session.commit()
+    assert read_counters([ACTIVE_USERS])[ACTIVE_USERS] == 1
+
+    db.session.delete(user)
+    db.session.commit()
+    assert read_counters([ACTIVE_USERS])[ACTIVE_USERS] == 0
+
+def test_rolled_back_deactivation_is_not_counted(app):
+    user = add_user('alice@example.com')
+    record_user_registered()
+    db.session.commit()
+
+    user.is_active = False
+    db.session.flush()
+    db.session.rollback()
+    db.session.commit()
+
+    assert read_counters([ACTIVE_USERS])[ACTIVE_USERS] == 1
+
+def test_user_counters_are_computed_once_then_kept_current(app):
+    from models import UserStats
+    from services.stats import get_user_counters, record_file_removed, reconcile_user_stats
+    from services.verifications import persist_verifications, verification_row
+
+    alice = add_user('alice@example.com')
+    first = add_file(alice, 'a1' * 32, 100)
+    add_file(alice, 'a2' * 32, 50)
+
+    stats = get_user_counters(alice.id)
+    assert (stats.total_files, stats.total_size, stats.total_verifications) == (2, 150, 0)
+
+    add_file(alice, 'a3' * 32, 7)
+    record_file_removed(first)
+    db.session.delete(first)
+    persist_verifications([
+        verification_row('a2' * 32, True, 'api', user_id=alice.id),
+        verification_row('ff' * 32, False, 'api', user_id=alice.id)
+    ])
+    db.session.expire_all()
+
+    stats = get_user_counters(alice.id)
+    assert (stats.total_files, stats.total_size) == (2, 57)
+    assert (stats.total_verifications, stats.successful_verifications) == (2, 1)
+
+    # Drift (a write that bypassed the counters) is repaired by reconciliation
+    UserStats.query.filter_by(user_id=alice.id).update({UserStats.total_files: 99})
+    reconcile_user_stats()
+    db.session.commit()
+    assert db.session.get(UserStats, alice.id).total_files == 2
+
+def test_stats_endpoints_read_the_users_counters(client, auth_headers, user):
+    add_file(user, 'b1' * 32, 10)
+    add_file(user, 'b2' * 32, 20)
+
+    files = client.get('/api/files/stats', headers=auth_headers).get_json()
+    assert (files['userFiles'], files['totalSize']) == (2, 30)
+    assert len(files['recentActivity']) == 2
+
+    stats = client.get('/api/analytics/user-stats', headers=auth_headers).get_json()
+    assert (stats['totalFiles'], stats['storageUsed'], stats['recentUploads']) == (2, 30, 2)
+    assert stats['fileTypes'] == [{'type': 'txt', 'count': 2}]
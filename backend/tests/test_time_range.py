@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta
+from models import db, FileRegistration
+
+START = datetime(2026, 3, 1)
+UPLOADERS = ('0x' + 'aa' * 20, '0x' + 'bb' * 20)
+
+def add_registrations(count):
+    db.session.add_all([
+        FileRegistration(file_hash=f'{index:064x}', file_name=f'file-{index}.txt', uploader_address=UPLOADERS[index % 2],
+                         block_timestamp=START + timedelta(minutes=index // 2), block_number=100 + index,
+                         transaction_hash='0x' + f'{index:064x}', log_index=0)
+        for index in range(count)
+    ])
+    db.session.commit()
+
+def get_range(client, auth_headers, **params):
+    return client.get('/api/blockchain/files-by-time-range', query_string=params, headers=auth_headers)
+
+def test_cursor_walks_the_range_in_time_order(client, auth_headers):
+    add_registrations(12)
+    expected = [
+        registration.id for registration in FileRegistration.query.filter(
+            FileRegistration.block_timestamp.between(START + timedelta(minutes=1), START + timedelta(minutes=4))
+        ).order_by(FileRegistration.block_timestamp, FileRegistration.id)
+    ]
+
+    ids, cursor = [], None
+    while True:
+        params = {'start': (START + timedelta(minutes=1)).isoformat() + 'Z',
+                  'end': int((START + timedelta(minutes=4) - datetime(1970, 1, 1)).total_seconds()), 'limit': 3}
+        body = get_range(client, auth_headers, **params, **({'cursor': cursor} if cursor else {})).get_json()
+        ids.extend(registration['id'] for registration in body['files'])
+        cursor = body['next_cursor']
+        if not cursor:
+            break
+
+    assert len(expected) == 8
+    assert ids == expected
+
+def test_uploader_filter_ignores_address_case(client, auth_headers):
+    add_registrations(6)
+
+    body = get_range(client, auth_headers, start=START.isoformat(), end=(START + timedelta(days=1)).isoformat(),
+                     uploader='0x' + 'BB' * 20).get_json()
+    assert {registration['uploader_address'] for registration in body['files']} == {UPLOADERS[1]}
+    assert body['count'] == 3
+
+def test_limit_is_clamped(client, auth_headers):
+    add_registrations(1002)
+    params = {'start': START.isoformat(), 'end': (START + timedelta(days=1)).isoformat()}
+
+    assert get_range(client, auth_headers, **params, limit=0).get_json()['count'] == 1
+    assert get_range(client, auth_headers, **params, limit=-5).get_json()['count'] == 1
+    assert get_range(client, auth_headers, **params, limit=5000).get_json()['count'] == 1000
+
+def test_bad_parameters_are_rejected(client, auth_headers):
+    assert get_range(client, auth_headers, start=START.isoformat()).status_code == 400
+    assert get_range(client, auth_headers, start='yesterday', end='today').status_code == 400
+    assert get_range(client, auth_headers, start=START.isoformat(), end=START.isoformat(),
+                     cursor='bogus').status_code == 400
@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta
+from models import db, FileRecord, VerificationLog, HourlyTrend, DailyTrend, DailyFileTypeTrend
+from services.trends import TrendDeltas, rebuild_trends, compact_trends, get_trend_series, hour_bucket, day_bucket
+
+NOW = datetime.utcnow()
+YESTERDAY = day_bucket(NOW - timedelta(days=1))
+
+def bucket_rows(model, *columns):
+    return sorted(tuple(getattr(row, column) for column in ('bucket_start',) + columns) for row in model.query)
+
+def test_writes_land_in_hourly_and_daily_buckets(app):
+    deltas = TrendDeltas()
+    deltas.add_file(YESTERDAY + timedelta(hours=9, minutes=5), 'application/pdf')
+    deltas.add_file(YESTERDAY + timedelta(hours=9, minutes=55), 'application/pdf')
+    deltas.add_file(YESTERDAY + timedelta(hours=14), None)
+    deltas.add_verification(YESTERDAY + timedelta(hours=9, minutes=30), True)
+    deltas.add_verification(YESTERDAY + timedelta(hours=14, minutes=1), False)
+    deltas.apply()
+    db.session.commit()
+
+    assert bucket_rows(HourlyTrend, 'hour_of_day', 'uploads', 'verifications', 'successful_verifications') == [
+        (YESTERDAY + timedelta(hours=9), 9, 2, 1, 1),
+        (YESTERDAY + timedelta(hours=14), 14, 1, 1, 0)
+    ]
+    assert bucket_rows(DailyTrend, 'uploads', 'verifications', 'successful_verifications') == [(YESTERDAY, 3, 2, 1)]
+
+    series = get_trend_series(NOW - timedelta(days=7))
+    assert series['uploads'] == [(YESTERDAY, 3)]
+    assert series['verifications'] == [(YESTERDAY, 2, 1)]
+    assert series['file_types'] == [('application/pdf', 2), (None, 1)]
+    assert series['user_activity'] == [(9, 2), (14, 1)]
+    assert get_trend_series(NOW - timedelta(days=7), hourly=True)['uploads'] == [
+        (YESTERDAY + timedelta(hours=9), 2), (YESTERDAY + timedelta(hours=14), 1)
+    ]
+
+def test_rebuild_matches_incremental_counts(app):
+    created = [YESTERDAY + timedelta(hours=hour) for hour in (1, 1, 5)]
+    files = [
+        FileRecord(file_name=f'{index}.txt', file_hash=f'{index:064x}', file_size=1, file_type='text/plain',
+                   wallet_address='0x' + '11' * 20, created_at=created_at)
+        for index, created_at in enumerate(created)
+    ]
+    db.session.add_all(files)
+    db.session.add(VerificationLog(file_hash='0' * 64, verification_result=True, verification_method='api',
+                                   verified_at=YESTERDAY + timedelta(hours=5)))
+    db.session.commit()
+
+    deltas = TrendDeltas()
+    for file in files:
+        deltas.add_file(file.created_at, file.file_type)
+    deltas.add_verification(YESTERDAY + timedelta(hours=5), True)
+    deltas.apply()
+    db.session.commit()
+    incremental = [bucket_rows(model, 'uploads') for model in (HourlyTrend, DailyTrend)]
+
+    assert rebuild_trends() == (2, 1)
+    assert [bucket_rows(model, 'uploads') for model in (HourlyTrend, DailyTrend)] == incremental
+    assert bucket_rows(DailyFileTypeTrend, 'file_type', 'uploads') == [(YESTERDAY, 'text/plain', 3)]
+
+def test_deletes_are_uncounted_and_compacted(app):
+    created_at = YESTERDAY + timedelta(hours=3)
+    TrendDeltas().add_file(created_at, 'image/png').add_file(NOW - timedelta(days=200), 'image/png').apply()
+    db.session.commit()
+    TrendDeltas().add_file(created_at, 'image/png', sign=-1).apply()
+    db.session.commit()
+
+    assert bucket_rows(HourlyTrend, 'uploads')[-1] == (hour_bucket(created_at), 0)
+    assert get_trend_series(NOW - timedelta(days=7))['file_types'] == []
+
+    # Emptied buckets and hourly buckets past retention go; the old daily bucket is still within 400 days
+    assert compact_trends(hourly_retention_days=90, daily_retention_days=400) == 4
+    assert HourlyTrend.query.count() == 0
+    assert bucket_rows(DailyTrend, 'uploads') == [(day_bucket(NOW - timedelta(days=200)), 1)]
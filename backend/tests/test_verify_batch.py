@@ -0,0 +1,55 @@
+import json
+from models import db, FileRecord, VerificationLog
+
+REGISTERED = 'ab' * 32
+
+def hashes(count):
+    return [f'{index:064x}' for index in range(1, count + 1)]
+
+def post_batch(client, auth_headers, lines, **kwargs):
+    return client.post('/api/files/verify-batch', data='\n'.join(lines) + '\n',
+                       headers={**auth_headers, 'Content-Type': 'application/x-ndjson'}, **kwargs)
+
+def test_results_stream_in_order_and_are_logged_per_chunk(api_app, client, auth_headers, user):
+    api_app.config['VERIFY_BATCH_CHUNK_SIZE'] = 2
+    db.session.add(FileRecord(file_name='report.pdf', file_hash=REGISTERED, file_size=10,
+                              wallet_address='0x' + '11' * 20, user_id=user.id))
+    db.session.commit()
+    batch = hashes(2) + ['0x' + REGISTERED, json.dumps({'hash': hashes(4)[3]}), json.dumps(hashes(5)[4])]
+
+    response = post_batch(client, auth_headers, batch)
+
+    assert response.status_code == 200
+    results = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [result['file_hash'] for result in results] == hashes(2) + [REGISTERED] + hashes(5)[3:]
+    assert [result['exists'] for result in results] == [False, False, True, False, False]
+    assert results[2]['file_name'] == 'report.pdf'
+    assert VerificationLog.query.filter_by(verification_method='api_batch').count() == 5
+
+def test_json_document_carries_count_and_found(client, auth_headers):
+    response = client.post('/api/files/verify-batch', json={'hashes': hashes(3)}, headers=auth_headers)
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert (body['count'], body['found'], len(body['results'])) == (3, 0, 3)
+
+def test_bad_first_chunk_is_rejected_before_streaming(api_app, client, auth_headers):
+    assert post_batch(client, auth_headers, hashes(1) + ['not-a-hash']).status_code == 400
+
+    api_app.config['VERIFY_BATCH_MAX_HASHES'] = 2
+    assert post_batch(client, auth_headers, hashes(3)).status_code == 413
+
+def test_errors_after_the_first_chunk_end_the_stream(api_app, client, auth_headers):
+    api_app.config['VERIFY_BATCH_CHUNK_SIZE'] = 2
+
+    response = post_batch(client, auth_headers, hashes(3) + ['not-a-hash'])
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert response.status_code == 200
+    assert [line.get('file_hash') for line in lines[:2]] == hashes(2)
+    assert lines[-1]['error'] == 'Invalid hash batch'
+
+    api_app.config['VERIFY_BATCH_MAX_HASHES'] = 3
+    response = client.post('/api/files/verify-batch', json=hashes(5), headers=auth_headers)
+    body = response.get_json()
+    assert (body['count'], body['error']) == (2, 'Invalid hash batch')
+    assert 'At most 3 hashes' in body['details']
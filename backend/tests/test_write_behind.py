@@ -0,0 +1,97 @@
+import time
+import pytest
+from flask import Flask
+from sqlalchemy.exc import OperationalError
+from services import write_behind
+from services.write_behind import WriteBehindQueue, close_write_behind_queues
+
+class Recorder:
+    """persist/reject callbacks that remember what they were given."""
+
+    def __init__(self, poison=(), transient_failures=0):
+        self.poison = set(poison)
+        self.transient_failures = transient_failures
+        self.batches = []
+        self.rejected = []
+
+    def persist(self, rows):
+        if self.transient_failures:
+            self.transient_failures -= 1
+            raise OperationalError('INSERT', {}, Exception('database is locked'))
+        if self.poison & set(rows):
+            raise ValueError('value too long')
+        self.batches.append(list(rows))
+
+    def reject(self, rows, error):
+        self.rejected.extend(rows)
+
+    @property
+    def persisted(self):
+        return [row for batch in self.batches for row in batch]
+
+@pytest.fixture
+def make_queue(monkeypatch):
+    monkeypatch.setattr(write_behind, '_queues', [])
+    queues = []
+
+    def make(recorder, **kwargs):
+        writer = WriteBehindQueue(Flask(__name__), recorder.persist, reject=recorder.reject, **kwargs)
+        queues.append(writer)
+        return writer
+
+    yield make
+    for writer in queues:
+        writer.close()
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+def test_full_batch_is_flushed_without_waiting_for_the_interval(make_queue):
+    recorder = Recorder()
+    writer = make_queue(recorder, max_batch=3, flush_interval=30)
+
+    writer.submit_many([1, 2, 3, 4])
+
+    assert wait_for(lambda: recorder.batches)
+    assert recorder.batches == [[1, 2, 3]]
+
+def test_partial_batch_is_flushed_after_the_interval(make_queue):
+    recorder = Recorder()
+    writer = make_queue(recorder, max_batch=100, flush_interval=0.2)
+
+    started = time.monotonic()
+    writer.submit_many([1, 2])
+
+    assert wait_for(lambda: recorder.batches)
+    assert recorder.batches == [[1, 2]]
+    assert time.monotonic() - started >= 0.2
+
+def test_poison_row_is_rejected_without_holding_back_the_batch(make_queue):
+    recorder = Recorder(poison={'bad'})
+    writer = make_queue(recorder, max_batch=4, flush_interval=30)
+
+    writer.submit_many(['a', 'bad', 'b', 'c'])
+
+    assert wait_for(lambda: len(recorder.persisted) == 3)
+    assert recorder.persisted == ['a', 'b', 'c']
+    assert recorder.rejected == ['bad']
+
+def test_transient_failure_keeps_rows_for_a_retry(make_queue):
+    recorder = Recorder(transient_failures=1)
+    writer = make_queue(recorder, max_batch=2, flush_interval=0.05)
+
+    writer.submit_many([1, 2])
+
+    assert wait_for(lambda: recorder.persisted == [1, 2])
+    assert recorder.rejected == []
+
+def test_worker_exit_drains_queued_rows(make_queue):
+    recorder = Recorder()
+    writer = make_queue(recorder, max_batch=100, flush_interval=30)
+    writer.submit_many([1, 2, 3])
+
+    assert close_write_behind_queues()
+    assert recorder.persisted == [1, 2, 3]
@@ -156,14 +156,11 @@ wait_for_services() {
 run_migrations() {
     print_status "Running database migrations..."
     
-    docker-compose exec -T app python -c "
-from app import create_app
-from models import db
-app = create_app()
-with app.app_context():
-    db.create_all()
-    print('Database tables created successfully')
-"
+    # Databases created before migrations existed: flask db stamp 672f04ea7e7c first (backend/migrations/README)
+    docker-compose exec -T app flask db upgrade
+    
+    # Statistics counters are only recomputed from the tables here and by the scheduled reconcile
+    docker-compose exec -T app flask reconcile-stats
     
     print_success "Database migrations completed"
 }